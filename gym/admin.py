@@ -1,14 +1,19 @@
 from django.contrib import admin
-from django.utils import timezone
 from .models import (
-    CustomUser, Client, Exercise, Workout, WorkoutSet, Routine, 
+    Gym, CustomUser, Client, Exercise, Workout, WorkoutSet, Routine, 
     ClientRoutine, RoutineProgress, ProgressMetrics, Goal
 )
 
+@admin.register(Gym)
+class GymAdmin(admin.ModelAdmin):
+    list_display = ['name', 'slug', 'domain', 'created_at']
+    search_fields = ['name', 'slug', 'domain']
+    prepopulated_fields = {'slug': ['name']}
+
 @admin.register(CustomUser)
 class CustomUserAdmin(admin.ModelAdmin):
-    list_display = ['user', 'role', 'user_email', 'user_full_name']
-    list_filter = ['role']
+    list_display = ['user', 'role', 'gym', 'user_email', 'user_full_name']
+    list_filter = ['role', 'gym']
     search_fields = ['user__username', 'user__email', 'user__first_name', 'user__last_name']
     
     def user_email(self, obj):
@@ -22,12 +27,12 @@ class CustomUserAdmin(admin.ModelAdmin):
 @admin.register(Client)
 class ClientAdmin(admin.ModelAdmin):
     list_display = ['name', 'email', 'age', 'subscription_type', 'join_date', 'is_active']
-    list_filter = ['subscription_type', 'join_date', 'birth_date']
+    list_filter = ['gym', 'subscription_type', 'subscription_status', 'join_date', 'birth_date']
     search_fields = ['name', 'email', 'phone']
     readonly_fields = ['join_date']
     
     def is_active(self, obj):
-        return obj.subscription_end is None or obj.subscription_end > timezone.now().date()
+        return obj.subscription_status != 'expired'
     is_active.boolean = True
     is_active.short_description = 'Activo'
 
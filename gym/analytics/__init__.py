@@ -0,0 +1,12 @@
+from .timeseries import progress_timeseries, METRIC_COLUMNS, BUCKETS
+from .cohorts import cohort_statistics, MetricsFrame, GROUP_BY_CHOICES, data_version, version_name
+from .adherence import refresh_adherence, compute_adherence
+from .goals import sync_goals
+from .leaderboards import record_completions, rebuild_leaderboards, leaderboard, LEADERBOARD_METRICS
+
+__all__ = [
+    'progress_timeseries', 'METRIC_COLUMNS', 'BUCKETS',
+    'cohort_statistics', 'MetricsFrame', 'GROUP_BY_CHOICES', 'data_version', 'version_name',
+    'refresh_adherence', 'compute_adherence', 'sync_goals',
+    'record_completions', 'rebuild_leaderboards', 'leaderboard', 'LEADERBOARD_METRICS'
+]
\ No newline at end of file
@@ -0,0 +1,135 @@
+from collections import defaultdict
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+from gym.models import ClientRoutine, RoutineProgress, RoutineAdherence, WEEKDAYS
+
+
+def weekmask(assigned_days_mask):
+    """Máscara de NumPy ('1010100') a partir de ClientRoutine.assigned_days_mask"""
+    return ''.join('1' if assigned_days_mask & (1 << index) else '0' for index in range(len(WEEKDAYS)))
+
+
+def scheduled_sessions(starts, ends, masks):
+    """
+    Número de sesiones programadas entre `starts` y `ends` (inclusive) para cada fila.
+
+    Se agrupan las filas por máscara de días para que cada grupo se resuelva con
+    una sola llamada vectorizada a np.busday_count. `starts`/`ends` pueden tener
+    cualquier forma cuya primera dimensión coincida con `masks`.
+    """
+    counts = np.zeros(starts.shape, dtype=np.int64)
+    ends = ends + np.timedelta64(1, 'D')
+    masks = np.asarray(masks)
+    for mask in np.unique(masks):
+        if '1' not in mask:
+            continue
+        rows = masks == mask
+        begin = starts[rows]
+        end = np.maximum(begin, ends[rows])
+        counts[rows] = np.busday_count(begin, end, weekmask=mask)
+    return counts
+
+
+def compute_adherence(assignments, today=None, weeks=None):
+    """
+    Calcular la adherencia de varias asignaciones en una sola pasada.
+
+    `assignments` es una lista de tuplas (id, start_date, end_date, assigned_days_mask).
+    Devuelve un dict id -> resumen con totales, tasa y desglose de las últimas semanas.
+    """
+    today = today or timezone.localdate()
+    weeks = weeks or settings.ADHERENCE_WEEKS
+    if not assignments:
+        return {}
+
+    ids = np.array([a[0] for a in assignments], dtype=np.int64)
+    starts = np.array([a[1] for a in assignments], dtype='datetime64[D]')
+    ends = np.array([min(a[2] or today, today) for a in assignments], dtype='datetime64[D]')
+    masks = np.array([weekmask(a[3]) for a in assignments])
+
+    totals = scheduled_sessions(starts, ends, masks)
+
+    # Matriz (asignación x semana) con las sesiones programadas de cada semana reciente
+    current_week = np.datetime64(today - timedelta(days=today.weekday()), 'D')
+    week_starts = current_week - np.arange(weeks - 1, -1, -1) * np.timedelta64(7, 'D')
+    week_begin = np.maximum(starts[:, None], week_starts[None, :])
+    week_end = np.minimum(ends[:, None], week_starts[None, :] + np.timedelta64(6, 'D'))
+    weekly_scheduled = scheduled_sessions(week_begin, week_end, masks)
+
+    # Sesiones completadas: dos consultas agregadas para todas las asignaciones
+    id_list = ids.tolist()
+    completed = {
+        row['client_routine_id']: row
+        for row in RoutineProgress.objects.filter(client_routine_id__in=id_list)
+        .values('client_routine_id')
+        .annotate(count=Count('id'), last=Max('completed_at'))
+    }
+    weekly_completed = defaultdict(dict)
+    first_week = week_starts[0].item()
+    recent = (
+        RoutineProgress.objects.filter(client_routine_id__in=id_list, completed_at__date__gte=first_week)
+        .annotate(week=TruncWeek('completed_at'))
+        .values('client_routine_id', 'week')
+        .annotate(count=Count('id'))
+    )
+    for row in recent:
+        week = row['week'].date() if hasattr(row['week'], 'date') else row['week']
+        weekly_completed[row['client_routine_id']][week] = row['count']
+
+    week_dates = [week.item() for week in week_starts]
+    summaries = {}
+    for index, assignment_id in enumerate(id_list):
+        scheduled = int(totals[index])
+        done = completed.get(assignment_id, {})
+        completed_count = done.get('count', 0)
+        summaries[assignment_id] = {
+            'scheduled_sessions': scheduled,
+            'completed_sessions': completed_count,
+            'adherence_rate': round(min(completed_count / scheduled, 1.0), 4) if scheduled else None,
+            'last_completed_at': done.get('last'),
+            'weekly': [
+                {
+                    'week_start': week.isoformat(),
+                    'scheduled': int(weekly_scheduled[index, column]),
+                    'completed': weekly_completed[assignment_id].get(week, 0),
+                }
+                for column, week in enumerate(week_dates)
+            ],
+        }
+    return summaries
+
+
+def refresh_adherence(client_routine_ids=None, today=None):
+    """
+    Recalcular y guardar la adherencia.
+
+    Con `client_routine_ids` solo se actualizan esas asignaciones (uso incremental
+    al completar un entrenamiento); sin ids se recalculan todas las activas.
+    """
+    today = today or timezone.localdate()
+    queryset = ClientRoutine.objects.all()
+    if client_routine_ids is None:
+        queryset = queryset.filter(is_active=True)
+    else:
+        queryset = queryset.filter(pk__in=client_routine_ids)
+
+    assignments = list(queryset.values_list('id', 'start_date', 'end_date', 'assigned_days_mask'))
+    summaries = compute_adherence(assignments, today=today)
+
+    RoutineAdherence.objects.bulk_create(
+        [
+            RoutineAdherence(client_routine_id=assignment_id, computed_on=today, **summary)
+            for assignment_id, summary in summaries.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['client_routine'],
+        update_fields=[
+            'scheduled_sessions', 'completed_sessions', 'adherence_rate',
+            'weekly', 'last_completed_at', 'computed_on'
+        ]
+    )
+    return len(summaries)
@@ -0,0 +1,223 @@
+from collections import defaultdict
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Sum
+from gym.models import Client, ClientRoutine, ProgressMetrics, DataVersion
+from gym.tenancy import scope_queryset
+
+METRIC_FIELDS = ('weight', 'body_fat', 'muscle_mass')
+GROUP_BY_CHOICES = ('subscription_type', 'join_month', 'routine')
+
+NO_COHORT = 'none'
+
+
+class MetricsFrame:
+    """
+    Métricas de progreso en formato columnar.
+
+    Cada fila es una medición ordenada por (cliente, fecha). Las columnas son
+    arrays de NumPy: `client_ids` y `days` (ordinal de la fecha) como enteros y
+    un array float64 por métrica, con NaN donde no hay valor.
+    """
+
+    def __init__(self, client_ids, days, columns):
+        order = np.lexsort((days, client_ids))
+        self.client_ids = client_ids[order]
+        self.days = days[order]
+        self.columns = {key: values[order] for key, values in columns.items()}
+
+    @classmethod
+    def load(cls, chunk_size=5000, gym_id=None):
+        """Cargar las métricas (de un gimnasio si se indica) en una sola pasada sobre un iterador por bloques"""
+        client_ids = []
+        days = []
+        fixed = {key: [] for key in METRIC_FIELDS}
+        measurements = defaultdict(dict)
+
+        rows = scope_queryset(ProgressMetrics.objects.all(), gym_id).values_list(
+            'client_id', 'date', 'weight', 'body_fat', 'muscle_mass', 'measurements'
+        ).iterator(chunk_size=chunk_size)
+
+        for index, (client_id, day, weight, body_fat, muscle_mass, extra) in enumerate(rows):
+            client_ids.append(client_id)
+            days.append(day.toordinal())
+            fixed['weight'].append(weight)
+            fixed['body_fat'].append(body_fat)
+            fixed['muscle_mass'].append(muscle_mass)
+            for key, value in (extra or {}).items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    measurements[key][index] = value
+
+        size = len(client_ids)
+        columns = {
+            key: np.array(values, dtype=np.float64) for key, values in fixed.items()
+        }
+        for key, values in measurements.items():
+            column = np.full(size, np.nan)
+            column[np.fromiter(values.keys(), dtype=np.int64, count=len(values))] = np.fromiter(
+                values.values(), dtype=np.float64, count=len(values)
+            )
+            columns[key] = column
+
+        return cls(
+            np.array(client_ids, dtype=np.int64),
+            np.array(days, dtype=np.int64),
+            columns
+        )
+
+    def change_after(self, metric, weeks):
+        """
+        Cambio por cliente entre su primera medición y la primera medición
+        tomada al menos `weeks` semanas después.
+
+        Devuelve (client_ids, baseline, change) solo para clientes con ambos puntos.
+        """
+        values = self.columns.get(metric)
+        if values is None:
+            empty = np.array([], dtype=np.float64)
+            return np.array([], dtype=np.int64), empty, empty
+
+        valid = ~np.isnan(values)
+        clients = self.client_ids[valid]
+        days = self.days[valid]
+        values = values[valid]
+
+        # Primera medición de cada cliente (las filas ya están ordenadas por cliente y fecha)
+        unique_clients, first_index = np.unique(clients, return_index=True)
+        baseline_day = days[first_index]
+        baseline = values[first_index]
+
+        # Para cada fila, el día objetivo de su cliente; nos quedamos con las que lo alcanzan
+        owner = np.searchsorted(unique_clients, clients)
+        reached = days >= baseline_day[owner] + weeks * 7
+        later_clients, later_index = np.unique(clients[reached], return_index=True)
+        later_values = values[reached][later_index]
+
+        position = np.searchsorted(unique_clients, later_clients)
+        return later_clients, baseline[position], later_values - baseline[position]
+
+
+def version_name(gym_id):
+    """Contador de DataVersion de las analíticas de un gimnasio ('analytics' sin gimnasio)"""
+    return f'analytics:{gym_id}' if gym_id is not None else 'analytics'
+
+
+def data_version(gym_id=None):
+    """
+    Versión de los datos analíticos de un gimnasio.
+
+    Sin gimnasio se suman los contadores de todos: la suma solo crece y cambia en
+    cuanto cambia cualquiera de ellos, sin un contador global que se actualice en
+    cada escritura.
+    """
+    if gym_id is not None:
+        return DataVersion.current(version_name(gym_id))
+    counters = DataVersion.objects.filter(Q(name='analytics') | Q(name__startswith='analytics:'))
+    return counters.aggregate(total=Sum('version'))['total'] or 0
+
+
+def client_cohorts(group_by, gym_id=None):
+    """Mapa client_id -> lista de cohortes a la que pertenece según la dimensión elegida"""
+    clients = scope_queryset(Client.objects.all(), gym_id)
+    if group_by == 'subscription_type':
+        return {
+            client_id: [subscription or NO_COHORT]
+            for client_id, subscription in clients.values_list('id', 'subscription_type').iterator()
+        }
+
+    if group_by == 'join_month':
+        return {
+            client_id: [join_date.strftime('%Y-%m')]
+            for client_id, join_date in clients.values_list('id', 'join_date').iterator()
+        }
+
+    if group_by == 'routine':
+        cohorts = defaultdict(list)
+        assignments = scope_queryset(ClientRoutine.objects.filter(is_active=True), gym_id).values_list(
+            'client_id', 'routine__name'
+        )
+        for client_id, routine_name in assignments.iterator():
+            cohorts[client_id].append(routine_name)
+        return cohorts
+
+    raise ValueError(f"group_by inválido: {group_by}")
+
+
+def cohort_statistics(metric='weight', weeks=12, group_by='subscription_type', gym_id=None):
+    """
+    Estadísticas por cohorte del cambio de una métrica tras `weeks` semanas.
+
+    El cálculo es vectorizado sobre las métricas del gimnasio `gym_id` (de todos
+    sin gimnasio). El resultado se cachea por gimnasio y versión de datos: los
+    cambios confirmados en métricas, asignaciones o en la cohorte de un cliente
+    generan una clave de caché nueva.
+    """
+    if group_by not in GROUP_BY_CHOICES:
+        raise ValueError(f"group_by inválido: {group_by}")
+
+    version = data_version(gym_id)
+    cache_key = f"analytics:cohorts:{gym_id or 'all'}:v{version}:{metric}:{weeks}:{group_by}"
+    result = cache.get(cache_key)
+    if result is not None:
+        return result
+
+    frame = MetricsFrame.load(gym_id=gym_id)
+    client_ids, baseline, change = frame.change_after(metric, weeks)
+
+    # Expandir a pares (cohorte, cliente): un cliente puede estar en varias rutinas
+    memberships = client_cohorts(group_by, gym_id=gym_id)
+    labels = []
+    rows = []
+    for row, client_id in enumerate(client_ids.tolist()):
+        for label in memberships.get(client_id) or [NO_COHORT]:
+            labels.append(label)
+            rows.append(row)
+
+    cohorts = []
+    if rows:
+        rows = np.array(rows, dtype=np.int64)
+        names, group = np.unique(np.array(labels, dtype=object), return_inverse=True)
+        changes = change[rows]
+        baselines = baseline[rows]
+        percent = np.divide(changes, baselines, out=np.full(changes.shape, np.nan), where=baselines != 0) * 100
+
+        counts = np.bincount(group)
+        mean_change = np.bincount(group, weights=changes) / counts
+        mean_baseline = np.bincount(group, weights=baselines) / counts
+        variance = np.bincount(group, weights=changes ** 2) / counts - mean_change ** 2
+        valid_percent = ~np.isnan(percent)
+        percent_counts = np.bincount(group[valid_percent], minlength=len(names))
+        percent_sums = np.bincount(group[valid_percent], weights=percent[valid_percent], minlength=len(names))
+
+        # Mediana, mínimo y máximo: ordenar por cohorte una vez y cortar por segmentos
+        order = np.lexsort((changes, group))
+        bounds = np.concatenate(([0], np.cumsum(counts)))
+        sorted_changes = changes[order]
+
+        for index, name in enumerate(names):
+            segment = sorted_changes[bounds[index]:bounds[index + 1]]
+            cohorts.append({
+                'cohort': name,
+                'clients': int(counts[index]),
+                'mean_baseline': round(float(mean_baseline[index]), 2),
+                'mean_change': round(float(mean_change[index]), 2),
+                'median_change': round(float(np.median(segment)), 2),
+                'std_change': round(float(np.sqrt(max(variance[index], 0.0))), 2),
+                'min_change': round(float(segment[0]), 2),
+                'max_change': round(float(segment[-1]), 2),
+                'mean_percent_change': (
+                    round(float(percent_sums[index] / percent_counts[index]), 2)
+                    if percent_counts[index] else None
+                ),
+            })
+
+    result = {
+        'metric': metric,
+        'weeks': weeks,
+        'group_by': group_by,
+        'data_version': version,
+        'cohorts': cohorts,
+    }
+    cache.set(cache_key, result, settings.ANALYTICS_CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,92 @@
+from django.db import connection, transaction
+from django.utils import timezone
+from gym.events import publish
+from gym.models import Goal, ProgressMetrics
+from .timeseries import METRIC_COLUMNS, NUMERIC_PATTERN
+
+
+def measurement_value_sql():
+    """Expresión SQL con el valor numérico de `measurements[g.metric]`, o NULL si no es un número"""
+    if connection.vendor == 'postgresql':
+        return (
+            "CASE WHEN (pm.measurements ->> g.metric) ~ %s "
+            "THEN (pm.measurements ->> g.metric)::double precision END"
+        ), [NUMERIC_PATTERN]
+    # SQLite (desarrollo y tests)
+    path = "'$.\"' || g.metric || '\"'"
+    return (
+        f"CASE WHEN json_type(pm.measurements, {path}) IN ('integer', 'real') "
+        f"THEN json_extract(pm.measurements, {path}) END"
+    ), []
+
+
+def sync_goals(client_ids=None, goal_ids=None):
+    """
+    Actualizar current_value e is_completed de los objetivos enlazados a una métrica.
+
+    Todo se resuelve en una sola sentencia UPDATE ... FROM: para cada objetivo se
+    toma la medición más reciente de su métrica (columna fija o clave de
+    `measurements`) y se recalcula si está cumplido en la misma sentencia. Solo se
+    escriben las filas que cambian; los objetivos recién cumplidos se publican como
+    eventos. Devuelve el número de objetivos actualizados.
+    """
+    measurement_sql, params = measurement_value_sql()
+    fixed_sql = ' '.join(f"WHEN '{column}' THEN pm.{column}" for column in METRIC_COLUMNS)
+
+    where = ['g.metric IS NOT NULL']
+    if client_ids is not None:
+        client_ids = list(client_ids)
+        if not client_ids:
+            return 0
+        where.append(f"g.client_id IN ({', '.join(['%s'] * len(client_ids))})")
+        params += client_ids
+    if goal_ids is not None:
+        goal_ids = list(goal_ids)
+        if not goal_ids:
+            return 0
+        where.append(f"g.id IN ({', '.join(['%s'] * len(goal_ids))})")
+        params += goal_ids
+
+    goal_table = Goal._meta.db_table
+    sql = f"""
+        UPDATE {goal_table}
+        SET current_value = latest.value, is_completed = latest.completed, updated_at = %s
+        FROM (
+            SELECT goal_id, value,
+                   CASE WHEN start_value > target_value THEN value <= target_value
+                        ELSE value >= target_value END AS completed
+            FROM (
+                SELECT goal_id, start_value, target_value, value,
+                       ROW_NUMBER() OVER (PARTITION BY goal_id ORDER BY "date" DESC, metrics_id DESC) AS position
+                FROM (
+                    SELECT g.id AS goal_id, g.start_value, g.target_value, pm."date", pm.id AS metrics_id,
+                           CASE g.metric {fixed_sql} ELSE {measurement_sql} END AS value
+                    FROM {goal_table} g
+                    JOIN {ProgressMetrics._meta.db_table} pm ON pm.client_id = g.client_id
+                    WHERE {' AND '.join(where)}
+                ) samples
+                WHERE value IS NOT NULL
+            ) ranked
+            WHERE position = 1
+        ) latest
+        WHERE {goal_table}.id = latest.goal_id
+          AND ({goal_table}.current_value <> latest.value OR {goal_table}.is_completed <> latest.completed)
+        RETURNING {goal_table}.id, {goal_table}.gym_id, {goal_table}.client_id, {goal_table}.title, {goal_table}.is_completed
+    """
+    with transaction.atomic():
+        # RETURNING solo ve los valores nuevos: guardar antes cuáles ya estaban cumplidos
+        already_completed = Goal.objects.filter(metric__isnull=False, is_completed=True)
+        if client_ids is not None:
+            already_completed = already_completed.filter(client_id__in=client_ids)
+        if goal_ids is not None:
+            already_completed = already_completed.filter(id__in=goal_ids)
+        already_completed = set(already_completed.values_list('id', flat=True))
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [timezone.now()] + params)
+            rows = cursor.fetchall()
+
+        for goal_id, gym_id, client_id, title, completed in rows:
+            if completed and goal_id not in already_completed:
+                publish('goal_completed', id=goal_id, gym_id=gym_id, client_id=client_id, title=title)
+    return len(rows)
@@ -0,0 +1,260 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Cast, NullIf, TruncWeek
+from django.utils import timezone
+from gym.models import ClientRoutine, ClientStreak, LeaderboardEntry, RoutineProgress
+
+LEADERBOARD_METRICS = ('workouts', 'rating', 'streak')
+
+ONE_WEEK = timedelta(weeks=1)
+
+
+def week_start(moment):
+    """Lunes de la semana (hora local) en la que cae `moment`"""
+    day = timezone.localtime(moment).date() if hasattr(moment, 'hour') else moment
+    return day - timedelta(days=day.weekday())
+
+
+def apply_counters(week, client_id, routine_id, workouts, rating_sum, rating_count, gym_id=None):
+    """Sumar deltas a una fila de LeaderboardEntry, creándola (en el gimnasio del cliente) si aún no existe"""
+    entries = LeaderboardEntry.objects.filter(week_start=week, client_id=client_id, routine_id=routine_id)
+    new_count = F('rating_count') + rating_count
+    changes = {
+        'workouts': F('workouts') + workouts,
+        'rating_sum': F('rating_sum') + rating_sum,
+        'rating_count': new_count,
+        # SET evalúa con los valores anteriores: la media ya incluye los deltas
+        'average_rating': Cast(F('rating_sum') + rating_sum, FloatField()) / NullIf(new_count, 0),
+    }
+    if entries.update(**changes) or workouts <= 0:
+        return
+    try:
+        with transaction.atomic():
+            LeaderboardEntry.objects.create(
+                week_start=week, client_id=client_id, routine_id=routine_id, gym_id=gym_id,
+                workouts=workouts, rating_sum=rating_sum, rating_count=rating_count,
+                average_rating=rating_sum / rating_count if rating_count else None
+            )
+    except IntegrityError:
+        # Otra petición creó la fila a la vez: basta con sumar sobre ella
+        entries.update(**changes)
+
+
+def streak_from_weeks(weeks):
+    """(racha actual, racha más larga, última semana) a partir de semanas ordenadas y sin repetir"""
+    current = longest = 0
+    previous = None
+    for week in weeks:
+        current = current + 1 if previous is not None and week - previous == ONE_WEEK else 1
+        longest = max(longest, current)
+        previous = week
+    return current, longest, previous
+
+
+def client_weeks(client_id):
+    """Semanas con entrenamientos completados de un cliente, en orden"""
+    return [
+        moment.date() for moment in RoutineProgress.objects.filter(client_routine__client_id=client_id)
+        .annotate(week=TruncWeek('completed_at')).values_list('week', flat=True).distinct().order_by('week')
+    ]
+
+
+def recompute_streak(client_id, create=True, gym_id=None):
+    current, longest, last_week = streak_from_weeks(client_weeks(client_id))
+    values = {'current_streak': current, 'longest_streak': longest, 'last_week': last_week}
+    if create:
+        ClientStreak.objects.update_or_create(
+            client_id=client_id, defaults=values, create_defaults={**values, 'gym_id': gym_id}
+        )
+    else:
+        ClientStreak.objects.filter(client_id=client_id).update(**values)
+
+
+def advance_streak(client_id, weeks, gym_id=None):
+    """
+    Avanzar la racha del cliente con las semanas recién completadas.
+
+    Lo habitual (misma semana o la siguiente a `last_week`) se resuelve en O(1);
+    solo un entrenamiento anterior a la última semana registrada (sincronización
+    atrasada de un dispositivo) obliga a recalcular desde el historial.
+    """
+    streak, _ = ClientStreak.objects.select_for_update().get_or_create(client_id=client_id, defaults={'gym_id': gym_id})
+    for week in sorted(weeks):
+        if streak.last_week is not None and week < streak.last_week:
+            recompute_streak(client_id, gym_id=gym_id)
+            return
+        if week == streak.last_week:
+            continue
+        if streak.last_week is not None and week - streak.last_week == ONE_WEEK:
+            streak.current_streak += 1
+        else:
+            streak.current_streak = 1
+        streak.longest_streak = max(streak.longest_streak, streak.current_streak)
+        streak.last_week = week
+    streak.save(update_fields=['current_streak', 'longest_streak', 'last_week'])
+
+
+def record_completions(progresses, sign=1, assignments=None, streaks=True):
+    """
+    Aplicar entrenamientos completados (o eliminados con sign=-1) a los rankings.
+
+    Cada entrenamiento suma a la fila global (sin rutina) y a la de su rutina en la
+    semana de `completed_at`; los deltas se agrupan para que una ingesta masiva
+    haga una actualización por fila afectada y no una por entrenamiento.
+    `assignments` ({client_routine_id: (client_id, routine_id)}) evita la consulta
+    si quien llama ya lo tiene. Con streaks=False no se tocan las rachas (p. ej.
+    al cambiar solo la valoración).
+    """
+    progresses = [progress for progress in progresses if progress.completed_at]
+    if not progresses:
+        return
+    if assignments is None:
+        assignments = {
+            pk: (client_id, routine_id) for pk, client_id, routine_id in ClientRoutine.objects.filter(
+                pk__in={progress.client_routine_id for progress in progresses}
+            ).values_list('id', 'client_id', 'routine_id')
+        }
+
+    deltas = defaultdict(lambda: [0, 0, 0])
+    client_weeks_done = defaultdict(set)
+    # El entrenamiento guarda el gimnasio de su asignación, que es el del cliente
+    client_gyms = {}
+    for progress in progresses:
+        if progress.client_routine_id not in assignments:
+            continue
+        client_id, routine_id = assignments[progress.client_routine_id]
+        client_gyms[client_id] = progress.gym_id
+        week = week_start(progress.completed_at)
+        client_weeks_done[client_id].add(week)
+        for key in ((week, client_id, None), (week, client_id, routine_id)):
+            deltas[key][0] += sign
+            if progress.rating is not None:
+                deltas[key][1] += sign * progress.rating
+                deltas[key][2] += sign
+
+    with transaction.atomic():
+        for (week, client_id, routine_id), (workouts, rating_sum, rating_count) in deltas.items():
+            apply_counters(week, client_id, routine_id, workouts, rating_sum, rating_count, gym_id=client_gyms[client_id])
+        if not streaks:
+            return
+        for client_id, weeks in client_weeks_done.items():
+            if sign > 0:
+                advance_streak(client_id, weeks, gym_id=client_gyms[client_id])
+            else:
+                # Quitar un entrenamiento puede cortar la racha: recalcular sin crear filas
+                recompute_streak(client_id, create=False)
+
+
+def rebuild_leaderboards(since=None):
+    """
+    Reconstruir contadores y rachas desde el historial de RoutineProgress.
+
+    Con `since` solo se rehacen las semanas a partir de esa fecha; las rachas se
+    recalculan siempre completas porque dependen de todo el historial. Devuelve
+    el número de filas de LeaderboardEntry escritas.
+    """
+    history = RoutineProgress.objects.all()
+    entries = LeaderboardEntry.objects.all()
+    if since is not None:
+        since = week_start(since)
+        history = history.filter(completed_at__date__gte=since)
+        entries = entries.filter(week_start__gte=since)
+
+    rows = history.annotate(week=TruncWeek('completed_at')).values(
+        'week', 'gym_id', client_id=F('client_routine__client_id'), routine_id=F('client_routine__routine_id')
+    ).annotate(
+        workouts=Count('id'), rating_sum=Sum('rating'), rating_count=Count('rating')
+    ).order_by()
+
+    totals = defaultdict(lambda: [0, 0, 0])
+    client_gyms = {}
+    for row in rows:
+        week = row['week'].date()
+        client_gyms[row['client_id']] = row['gym_id']
+        for key in ((week, row['client_id'], None), (week, row['client_id'], row['routine_id'])):
+            totals[key][0] += row['workouts']
+            totals[key][1] += row['rating_sum'] or 0
+            totals[key][2] += row['rating_count']
+
+    with transaction.atomic():
+        entries.delete()
+        LeaderboardEntry.objects.bulk_create([
+            LeaderboardEntry(
+                week_start=week, client_id=client_id, routine_id=routine_id, gym_id=client_gyms[client_id],
+                workouts=workouts, rating_sum=rating_sum, rating_count=rating_count,
+                average_rating=rating_sum / rating_count if rating_count else None
+            )
+            for (week, client_id, routine_id), (workouts, rating_sum, rating_count) in totals.items()
+        ], batch_size=2000)
+
+        weeks_by_client = defaultdict(list)
+        for client_id, week, gym_id in RoutineProgress.objects.annotate(
+            week=TruncWeek('completed_at')
+        ).values_list('client_routine__client_id', 'week', 'gym_id').distinct().order_by('client_routine__client_id', 'week'):
+            weeks_by_client[client_id].append(week.date())
+            client_gyms[client_id] = gym_id
+
+        ClientStreak.objects.exclude(client_id__in=list(weeks_by_client)).delete()
+        streaks = []
+        for client_id, weeks in weeks_by_client.items():
+            current, longest, last_week = streak_from_weeks(weeks)
+            streaks.append(ClientStreak(
+                client_id=client_id, gym_id=client_gyms[client_id],
+                current_streak=current, longest_streak=longest, last_week=last_week
+            ))
+        ClientStreak.objects.bulk_create(
+            streaks, batch_size=2000, update_conflicts=True, unique_fields=['client'],
+            update_fields=['current_streak', 'longest_streak', 'last_week', 'gym']
+        )
+    return len(totals)
+
+
+def leaderboard(metric='workouts', week=None, routine_id=None, limit=10, gym_id=None):
+    """
+    Top `limit` clientes de una semana para `metric`, solo del gimnasio `gym_id` si se indica.
+
+    Las consultas recorren directamente los índices (gimnasio, semana, rutina,
+    métrica) o (gimnasio, racha actual), así que el coste depende de `limit` y no del número de
+    clientes ni del historial.
+    """
+    week = week_start(week or timezone.localdate())
+    if metric == 'streak':
+        # Una racha sigue viva si hubo entrenamientos esta semana o la anterior
+        streaks = ClientStreak.objects.filter(
+            last_week__gte=week - ONE_WEEK, last_week__lte=week, current_streak__gt=0
+        ).select_related('client').order_by('-current_streak', 'client_id')
+        if gym_id is not None:
+            streaks = streaks.filter(gym_id=gym_id)
+        streaks = streaks[:limit]
+        return week, [
+            {
+                'rank': rank,
+                'client_id': streak.client_id,
+                'client_name': streak.client.name,
+                'current_streak': streak.current_streak,
+                'longest_streak': streak.longest_streak,
+            }
+            for rank, streak in enumerate(streaks, start=1)
+        ]
+
+    entries = LeaderboardEntry.objects.filter(
+        week_start=week, routine_id=routine_id, workouts__gt=0
+    ).select_related('client')
+    if gym_id is not None:
+        entries = entries.filter(gym_id=gym_id)
+    if metric == 'rating':
+        entries = entries.filter(average_rating__isnull=False).order_by('-average_rating', '-workouts', 'client_id')
+    else:
+        entries = entries.order_by('-workouts', 'client_id')
+    return week, [
+        {
+            'rank': rank,
+            'client_id': entry.client_id,
+            'client_name': entry.client.name,
+            'workouts': entry.workouts,
+            'average_rating': entry.average_rating,
+        }
+        for rank, entry in enumerate(entries[:limit], start=1)
+    ]
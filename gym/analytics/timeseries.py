@@ -0,0 +1,79 @@
+from django.db import connection
+from gym.models import ProgressMetrics
+
+METRIC_COLUMNS = ('weight', 'body_fat', 'muscle_mass')
+BUCKETS = ('day', 'week', 'month')
+
+# Solo se convierten a número los valores de `measurements` con formato numérico
+NUMERIC_PATTERN = r'^\s*-?[0-9]+(\.[0-9]+)?\s*$'
+
+
+def progress_timeseries(client_id, metric, bucket='week', start=None, end=None, window=3, gym_id=None):
+    """
+    Serie temporal agregada de una métrica de progreso calculada en PostgreSQL.
+
+    Agrupa por `date_trunc(bucket)` y calcula con funciones de ventana la media
+    móvil de `window` puntos, la variación respecto al punto anterior y la
+    variación acumulada desde el primer punto del rango. Con `gym_id` solo se
+    leen las métricas de ese gimnasio.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket inválido: {bucket}")
+
+    params = []
+    if metric in METRIC_COLUMNS:
+        value_sql = f'"{metric}"'
+    else:
+        # Clave arbitraria dentro del JSON de medidas (cintura, cadera, ...)
+        value_sql = (
+            "CASE WHEN (measurements ->> %s) ~ %s "
+            "THEN (measurements ->> %s)::double precision END"
+        )
+        params += [metric, NUMERIC_PATTERN, metric]
+
+    where = ['client_id = %s']
+    params.append(client_id)
+    if gym_id is not None:
+        where.append('gym_id = %s')
+        params.append(gym_id)
+    if start:
+        where.append('"date" >= %s')
+        params.append(start)
+    if end:
+        where.append('"date" <= %s')
+        params.append(end)
+
+    sql = f"""
+        WITH samples AS (
+            SELECT date_trunc(%s, "date"::timestamp)::date AS bucket, {value_sql} AS value
+            FROM {ProgressMetrics._meta.db_table}
+            WHERE {' AND '.join(where)}
+        ),
+        buckets AS (
+            SELECT bucket, AVG(value) AS value, MIN(value) AS min, MAX(value) AS max, COUNT(*) AS samples
+            FROM samples
+            WHERE value IS NOT NULL
+            GROUP BY bucket
+        )
+        SELECT bucket, value, min, max, samples,
+               AVG(value) OVER (ORDER BY bucket ROWS BETWEEN %s PRECEDING AND CURRENT ROW) AS moving_avg,
+               value - LAG(value) OVER (ORDER BY bucket) AS delta,
+               value - FIRST_VALUE(value) OVER (ORDER BY bucket) AS change
+        FROM buckets
+        ORDER BY bucket
+    """
+    params = [bucket] + params + [max(int(window), 1) - 1]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [col[0] for col in cursor.description]
+        rows = cursor.fetchall()
+
+    points = []
+    for row in rows:
+        point = dict(zip(columns, row))
+        for key in ('value', 'min', 'max', 'moving_avg', 'delta', 'change'):
+            if point[key] is not None:
+                point[key] = round(point[key], 2)
+        points.append(point)
+    return points
@@ -0,0 +1,9 @@
+from .seed import SCALES, BENCHMARK_GYM_SLUG, BENCHMARK_USERNAME, seed_benchmark_data, reset_benchmark_data
+from .runner import (
+    benchmark_targets, run_benchmark, compare_to_baseline, load_baseline, save_baseline, percentile
+)
+
+__all__ = [
+    'SCALES', 'BENCHMARK_GYM_SLUG', 'BENCHMARK_USERNAME', 'seed_benchmark_data', 'reset_benchmark_data',
+    'benchmark_targets', 'run_benchmark', 'compare_to_baseline', 'load_baseline', 'save_baseline', 'percentile'
+]
@@ -0,0 +1,241 @@
+import json
+import logging
+import math
+import time
+import uuid
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connection, connections
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from ..instrumentation import QueryRecorder
+from ..models import Client, ClientRoutine, Goal, Routine
+from ..serializers import GymTokenObtainPairSerializer
+from ..tenancy import scope_queryset
+
+# Parámetros de consulta de las acciones que los necesitan; reciben las muestras del gimnasio
+ACTION_PARAMS = {
+    'ClientViewSet.typeahead': lambda sample: {'q': 'ana'},
+    'ExerciseViewSet.search': lambda sample: {'q': 'press'},
+    'ExerciseViewSet.autocomplete': lambda sample: {'q': 'pre'},
+    'ExerciseViewSet.by_muscle_group': lambda sample: {'muscle_group': 'Pectorales'},
+    'ProgressMetricsViewSet.client_progress': lambda sample: {'client_id': sample['client'].pk},
+    'ProgressMetricsViewSet.timeseries': lambda sample: {'client_id': sample['client'].pk},
+}
+
+# Variantes de listados con filtros habituales, además del listado sin parámetros
+LIST_VARIANTS = {
+    'ClientViewSet.list[filtered]': ('clients', {'subscription_status': 'active', 'ordering': '-join_date', 'facets': '1'}),
+    'RoutineProgressViewSet.list[ordered]': ('routine-progress', {'ordering': '-completed_at'}),
+}
+
+# Vistas de función de solo lectura (client_login y el stream de eventos no se miden)
+FUNCTION_VIEWS = {
+    'user_profile': ('/api/user-profile/', lambda sample: {}),
+    'cohort_analytics': ('/api/analytics/cohorts/', lambda sample: {}),
+    'leaderboards': ('/api/leaderboards/', lambda sample: {}),
+    'sync': ('/api/sync/', lambda sample: {'client_id': sample['client'].pk}),
+}
+
+# Acciones POST que se miden con datos nuevos en cada repetición; las de subida de archivos se omiten
+WRITE_ACTIONS = {
+    'RoutineProgressViewSet.bulk': lambda sample: {'completions': [
+        {
+            'idempotency_key': str(uuid.uuid4()),
+            'client_routine_id': sample['assignment'].pk,
+            'workout_id': sample['workout_id'],
+            'rating': 4,
+        }
+        for _ in range(10)
+    ]},
+    'ClientRoutineViewSet.complete_workout': lambda sample: {'workout_id': sample['workout_id'], 'rating': 5},
+    'GoalViewSet.update_progress': lambda sample: {'current_value': sample['goal'].current_value},
+}
+SKIPPED_ACTIONS = {'ClientViewSet.upload_profile_image', 'ProgressMetricsViewSet.photos'}
+
+
+def gym_sample(gym):
+    """Objetos del gimnasio sobre los que se lanzan las peticiones de detalle y las acciones"""
+    assignment = ClientRoutine.objects.filter(gym=gym, is_active=True).order_by('pk').first()
+    return {
+        'client': assignment.client,
+        'assignment': assignment,
+        'workout_id': Routine.workouts.through.objects.filter(
+            routine_id=assignment.routine_id
+        ).values_list('workout_id', flat=True).order_by('pk').first(),
+        'goal': Goal.objects.filter(gym=gym, metric__isnull=True).order_by('pk').first(),
+    }
+
+
+def benchmark_targets(gym):
+    """
+    Peticiones a medir: nombre ('ClientViewSet.list', 'ExerciseViewSet.search'...),
+    método, ruta y una función que devuelve los parámetros o el cuerpo de cada
+    repetición. Se recorren todas las rutas del router (listado, detalle y
+    acciones extra) y las vistas de función de FUNCTION_VIEWS; las escrituras van
+    al final para que no cambien los datos que leen los demás endpoints.
+    """
+    from ..urls import router
+
+    sample = gym_sample(gym)
+    targets = []
+    writes = []
+    for prefix, viewset, basename in router.registry:
+        model = viewset.queryset.model
+        pk = scope_queryset(model.objects.order_by('pk'), gym.pk, viewset.gym_field).values_list('pk', flat=True).first()
+        if model is Client:
+            pk = sample['client'].pk
+        elif model is ClientRoutine:
+            pk = sample['assignment'].pk
+        elif model is Goal:
+            pk = sample['goal'].pk
+
+        name = viewset.__name__
+        targets.append((f'{name}.list', 'get', f'/api/{prefix}/', lambda sample: {}))
+        targets.append((f'{name}.retrieve', 'get', f'/api/{prefix}/{pk}/', lambda sample: {}))
+        for extra in viewset.get_extra_actions():
+            action_name = f'{name}.{extra.__name__}'
+            path = f'/api/{prefix}/{pk}/{extra.url_path}/' if extra.detail else f'/api/{prefix}/{extra.url_path}/'
+            if action_name in SKIPPED_ACTIONS:
+                continue
+            if 'get' in extra.mapping:
+                targets.append((action_name, 'get', path, ACTION_PARAMS.get(action_name, lambda sample: {})))
+            elif action_name in WRITE_ACTIONS:
+                writes.append((action_name, 'post', path, WRITE_ACTIONS[action_name]))
+
+    for variant, (prefix, params) in LIST_VARIANTS.items():
+        targets.append((variant, 'get', f'/api/{prefix}/', lambda sample, params=params: params))
+    for name, (path, params) in FUNCTION_VIEWS.items():
+        targets.append((name, 'get', path, params))
+    return sample, targets + writes
+
+
+def percentile(values, fraction):
+    """Percentil por el método del rango más cercano sobre una lista no vacía"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def run_benchmark(gym, user, iterations=20, warmup=2, only=None):
+    """
+    Medir cada endpoint `iterations` veces tras `warmup` peticiones de calentamiento.
+
+    Las peticiones pasan por toda la pila (middlewares, autenticación JWT con el
+    gimnasio de benchmark, permisos y renderizado). Por endpoint se guardan p50 y
+    p99 de la latencia en ms, la mediana de consultas SQL, el tamaño de la
+    respuesta en bytes y el código de estado; los errores 500 se registran sin
+    interrumpir la ejecución. `only` limita la ejecución a esos nombres.
+    """
+    client = APIClient(raise_request_exception=False)
+    token = GymTokenObtainPairSerializer.get_token(user).access_token
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    sample, targets = benchmark_targets(gym)
+    # Los 4xx y 5xx quedan en los resultados; sin esto cada repetición escribiría su traza
+    request_logger = logging.getLogger('django.request')
+    previous_level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+    try:
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            endpoints = _measure(targets, sample, client, iterations, warmup, only)
+    finally:
+        request_logger.setLevel(previous_level)
+    return {'vendor': connection.vendor, 'iterations': iterations, 'endpoints': endpoints}
+
+
+def _measure(targets, sample, client, iterations, warmup, only):
+    """Latencias, consultas, tamaño y estado de cada endpoint de `targets`"""
+    endpoints = {}
+    for name, method, path, payload in targets:
+        if only is not None and name not in only:
+            continue
+        timings = []
+        query_counts = []
+        for iteration in range(warmup + iterations):
+            recorder = QueryRecorder()
+            with ExitStack() as stack:
+                for database in connections.all():
+                    stack.enter_context(database.execute_wrapper(recorder))
+                start = time.perf_counter()
+                if method == 'get':
+                    response = client.get(path, payload(sample))
+                else:
+                    response = client.post(path, payload(sample), format='json')
+                # Las exportaciones en streaming consultan mientras se consume el cuerpo
+                body = b''.join(response.streaming_content) if response.streaming else response.content
+                elapsed = time.perf_counter() - start
+            if iteration >= warmup:
+                timings.append(elapsed * 1000)
+                query_counts.append(recorder.count)
+        endpoints[name] = {
+            'method': method.upper(),
+            'status': response.status_code,
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'queries': percentile(query_counts, 0.5),
+            'bytes': len(body),
+        }
+    return endpoints
+
+
+def compare_to_baseline(results, baseline, threshold=0.25, size_threshold=0.10, min_latency_ms=5.0):
+    """
+    Regresiones de `results` frente a la línea base de la misma escala.
+
+    Fallan: un endpoint que deja de medirse o pasa a responder con un error distinto,
+    cualquier consulta SQL de más, una respuesta más de `size_threshold` mayor, un
+    p50 más de `threshold` más lento y un p99 más del doble de `threshold` más lento
+    (el p99 de pocas repeticiones es casi el máximo y tiene mucho ruido). La latencia
+    tiene que crecer además al menos `min_latency_ms`, para no fallar por ruido en
+    endpoints de pocos milisegundos. Un endpoint que pasa de un error a responder no
+    es una regresión, pero sus cifras no se comparan. Las latencias solo se comparan
+    si la línea base se grabó con el mismo motor de base de datos. Los endpoints de
+    `excluded` (fallaban al grabar la línea base) no se comparan.
+    """
+    regressions = []
+    compare_latency = baseline.get('vendor') == results['vendor']
+    for name, expected in baseline['endpoints'].items():
+        current = results['endpoints'].get(name)
+        if current is None:
+            regressions.append(f'{name}: no se ha medido')
+            continue
+        if current['status'] != expected['status']:
+            if current['status'] >= 400:
+                regressions.append(f"{name}: estado {expected['status']} -> {current['status']}")
+            continue
+        if current['queries'] > expected['queries']:
+            regressions.append(f"{name}: consultas {expected['queries']} -> {current['queries']}")
+        if current['bytes'] > expected['bytes'] * (1 + size_threshold):
+            regressions.append(f"{name}: tamaño {expected['bytes']} -> {current['bytes']} bytes")
+        if compare_latency:
+            for key, allowed in (('p50_ms', threshold), ('p99_ms', 2 * threshold)):
+                limit = max(expected[key] * (1 + allowed), expected[key] + min_latency_ms)
+                if current[key] > limit:
+                    regressions.append(f'{name}: {key} {expected[key]} -> {current[key]}')
+    return regressions
+
+
+def load_baseline(path):
+    """Líneas base por escala ('1k', '10k', ...); vacío si el archivo no existe"""
+    try:
+        with open(path) as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, scale, results):
+    """
+    Guardar los resultados como línea base de `scale`, conservando las demás escalas.
+
+    Los endpoints que responden con un 5xx no se guardan: un error no es una cifra
+    de referencia. Se listan por nombre en `excluded` y se devuelven.
+    """
+    endpoints = {name: result for name, result in results['endpoints'].items() if result['status'] < 500}
+    excluded = sorted(set(results['endpoints']) - set(endpoints))
+    baselines = load_baseline(path)
+    baselines[scale] = {**results, 'endpoints': endpoints, 'excluded': excluded}
+    with open(path, 'w') as baseline_file:
+        json.dump(baselines, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write('\n')
+    return excluded
@@ -0,0 +1,218 @@
+import random
+from datetime import timedelta
+from itertools import islice
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from ..analytics import refresh_adherence, rebuild_leaderboards, version_name
+from ..models import (
+    Gym, CustomUser, Client, Exercise, Workout, WorkoutSet, Routine, ClientRoutine,
+    RoutineProgress, RoutineAdherence, LeaderboardEntry, ClientStreak, ProgressMetrics,
+    Goal, DataVersion, WEEKDAYS, normalize_search, weekday_mask
+)
+
+# Escalas disponibles: número de clientes del gimnasio de benchmark
+SCALES = {'1k': 1000, '10k': 10000, '100k': 100000}
+
+BENCHMARK_GYM_SLUG = 'benchmark'
+BENCHMARK_USERNAME = 'benchmark-runner'
+BATCH_SIZE = 2000
+
+EXERCISES = 60
+WORKOUTS = 30
+SETS_PER_WORKOUT = 4
+WORKOUTS_PER_ROUTINE = 3
+COMPLETIONS_PER_ASSIGNMENT = 6
+HISTORY_DAYS = 56
+METRICS_PER_CLIENT = 4
+
+FIRST_NAMES = ['Ana', 'Luis', 'María', 'José', 'Lucía', 'Carlos', 'Elena', 'Javier', 'Sofía', 'Pablo', 'Marta', 'Andrés']
+LAST_NAMES = ['García', 'Martínez', 'López', 'Sánchez', 'Pérez', 'Gómez', 'Fernández', 'Díaz', 'Ruiz', 'Moreno']
+MUSCLE_GROUPS = ['Pectorales', 'Espalda', 'Hombros', 'Bíceps', 'Tríceps', 'Cuádriceps', 'Isquiotibiales', 'Glúteos', 'Core']
+EQUIPMENT = ['Barra', 'Mancuernas', 'Polea', 'Máquina', 'Banco', 'Peso corporal']
+EXERCISE_NAMES = ['Press', 'Remo', 'Sentadilla', 'Peso muerto', 'Dominada', 'Curl', 'Extensión', 'Zancada', 'Plancha', 'Elevación']
+
+
+def _bulk_insert(model, objects):
+    """Insertar por lotes de BATCH_SIZE sin materializar el generador completo"""
+    objects = iter(objects)
+    inserted = []
+    while True:
+        batch = list(islice(objects, BATCH_SIZE))
+        if not batch:
+            return inserted
+        inserted.extend(model.objects.bulk_create(batch))
+
+
+def reset_benchmark_data():
+    """
+    Borrar el gimnasio de benchmark y todos sus datos.
+
+    Se borra con DELETE directos, sin señales: los datos sintéticos no necesitan
+    lápidas de sincronización ni descontarse uno a uno de los rankings, y borrar
+    100k clientes fila a fila tardaría horas.
+    """
+    gym = Gym.objects.filter(slug=BENCHMARK_GYM_SLUG).first()
+    with transaction.atomic():
+        if gym is not None:
+            assignments = ClientRoutine.objects.filter(gym=gym)
+            clients = Client.objects.filter(gym=gym)
+            workouts = Workout.objects.filter(gym=gym)
+            routines = Routine.objects.filter(gym=gym)
+            for queryset in (
+                RoutineAdherence.objects.filter(client_routine__in=assignments),
+                LeaderboardEntry.objects.filter(client__in=clients),
+                ClientStreak.objects.filter(client__in=clients),
+                RoutineProgress.objects.filter(client_routine__in=assignments),
+                Goal.objects.filter(client__in=clients),
+                ProgressMetrics.objects.filter(client__in=clients),
+                assignments,
+                Routine.workouts.through.objects.filter(routine__in=routines),
+                WorkoutSet.objects.filter(workout__in=workouts),
+                routines,
+                workouts,
+                Exercise.objects.filter(gym=gym),
+                clients,
+                Gym.objects.filter(pk=gym.pk),
+            ):
+                queryset._raw_delete(queryset.db)
+            DataVersion.bump(version_name(gym.pk))
+        User.objects.filter(username=BENCHMARK_USERNAME).delete()
+    DataVersion.bump('clients')
+
+
+def seed_benchmark_data(clients, seed=0):
+    """
+    Crear un gimnasio 'benchmark' con `clients` clientes y datos proporcionales.
+
+    Por cliente: una asignación activa (y una antigua cada cuatro clientes), unos
+    seis entrenamientos completados en las últimas ocho semanas, cuatro mediciones
+    y un objetivo; el catálogo de ejercicios y workouts es fijo y hay una rutina
+    por cada 200 clientes. Los datos se generan con `seed` para que dos ejecuciones
+    sean comparables. Se usa bulk_create, que no lanza señales: los campos
+    derivados (estado de suscripción, columnas de búsqueda, máscara de días y
+    gimnasio) se rellenan aquí y la adherencia y los rankings se recalculan al final.
+    Devuelve el gimnasio y el superusuario con el que se ejecutan las peticiones.
+    """
+    rng = random.Random(seed)
+    today = timezone.localdate()
+    now = timezone.now()
+    reset_benchmark_data()
+
+    with transaction.atomic():
+        gym = Gym.objects.create(name='Benchmark', slug=BENCHMARK_GYM_SLUG)
+        user = User.objects.create_superuser(BENCHMARK_USERNAME, f'{BENCHMARK_USERNAME}@bench.test', None)
+        CustomUser.objects.update_or_create(user=user, defaults={'role': 'owner', 'gym': gym})
+        # Recargar para que custom_profile (creado por la señal de User) tenga el gimnasio
+        user = User.objects.get(pk=user.pk)
+
+        exercises = []
+        for i in range(EXERCISES):
+            name = f'{EXERCISE_NAMES[i % len(EXERCISE_NAMES)]} {MUSCLE_GROUPS[i % len(MUSCLE_GROUPS)]} {i}'
+            description = f'Ejercicio de {MUSCLE_GROUPS[i % len(MUSCLE_GROUPS)].lower()} número {i}'
+            exercises.append(Exercise(
+                gym=gym, name=name, description=description,
+                search_name=normalize_search(name), search_description=normalize_search(description),
+                muscle_groups=rng.sample(MUSCLE_GROUPS, 2), equipment=rng.sample(EQUIPMENT, 1),
+                difficulty=rng.choice(['beginner', 'intermediate', 'advanced']),
+                instructions=['Colocarse en posición', 'Ejecutar el movimiento', 'Volver a la posición inicial'],
+            ))
+        exercises = _bulk_insert(Exercise, exercises)
+
+        workouts = _bulk_insert(Workout, (
+            Workout(
+                gym=gym, name=f'Workout {i}', description=f'Sesión de entrenamiento {i}',
+                estimated_duration=rng.choice([30, 45, 60, 75]),
+                difficulty=rng.choice(['beginner', 'intermediate', 'advanced']),
+                category=rng.choice(['strength', 'cardio', 'flexibility', 'mixed']),
+            )
+            for i in range(WORKOUTS)
+        ))
+        _bulk_insert(WorkoutSet, (
+            WorkoutSet(
+                workout=workout, exercise=rng.choice(exercises), reps=rng.randint(6, 15),
+                weight=rng.choice([0, 10, 20, 40, 60]), rest_time=rng.choice([60, 90, 120]),
+            )
+            for workout in workouts for _ in range(SETS_PER_WORKOUT)
+        ))
+
+        routines = _bulk_insert(Routine, (
+            Routine(
+                gym=gym, name=f'Rutina {i}', description=f'Rutina de benchmark {i}',
+                frequency=rng.choice(['daily', 'weekly', 'custom']), days_per_week=3,
+                duration=rng.choice([4, 8, 12]), scheduled_days=['monday', 'wednesday', 'friday'],
+            )
+            for i in range(max(10, clients // 200))
+        ))
+        routine_workouts = {routine.pk: rng.sample(workouts, WORKOUTS_PER_ROUTINE) for routine in routines}
+        _bulk_insert(Routine.workouts.through, (
+            Routine.workouts.through(routine_id=routine_id, workout_id=workout.pk)
+            for routine_id, chosen in routine_workouts.items() for workout in chosen
+        ))
+
+        def client_rows():
+            for i in range(clients):
+                name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}'
+                subscription_end = today + timedelta(days=rng.randint(-60, 300))
+                yield Client(
+                    gym=gym, name=name, email=f'bench{i}@bench.test', phone=f'+34 6{i:08d}',
+                    birth_date=today - timedelta(days=rng.randint(18 * 365, 65 * 365)),
+                    weight=round(rng.uniform(50, 110), 1), height=round(rng.uniform(150, 200), 1),
+                    goals=['Perder peso'], join_date=today - timedelta(days=rng.randint(0, 730)),
+                    subscription_type=rng.choice(['standard', 'premium', 'personalized']),
+                    subscription_start=subscription_end - timedelta(days=365),
+                    subscription_end=subscription_end,
+                    subscription_status=Client.compute_subscription_status(subscription_end, today),
+                )
+        client_objects = _bulk_insert(Client, client_rows())
+
+        def assignment_rows():
+            for i, client in enumerate(client_objects):
+                days = sorted(rng.sample(WEEKDAYS, 3), key=WEEKDAYS.index)
+                yield ClientRoutine(
+                    gym=gym, client=client, routine=rng.choice(routines),
+                    start_date=today - timedelta(days=rng.randint(HISTORY_DAYS, 180)),
+                    assigned_days=days, assigned_days_mask=weekday_mask(days),
+                )
+                if i % 4 == 0:
+                    yield ClientRoutine(
+                        gym=gym, client=client, routine=rng.choice(routines), is_active=False,
+                        start_date=today - timedelta(days=365), end_date=today - timedelta(days=200),
+                        assigned_days=['monday'], assigned_days_mask=weekday_mask(['monday']),
+                    )
+        assignments = [assignment for assignment in _bulk_insert(ClientRoutine, assignment_rows()) if assignment.is_active]
+
+        _bulk_insert(RoutineProgress, (
+            RoutineProgress(
+                gym=gym, client_routine=assignment,
+                workout=rng.choice(routine_workouts[assignment.routine_id]),
+                completed_at=now - timedelta(days=rng.randint(0, HISTORY_DAYS - 1), minutes=rng.randint(0, 600)),
+                rating=rng.choice([None, 3, 4, 5]),
+            )
+            for assignment in assignments for _ in range(COMPLETIONS_PER_ASSIGNMENT)
+        ))
+        _bulk_insert(ProgressMetrics, (
+            ProgressMetrics(
+                gym=gym, client=client, date=today - timedelta(weeks=week),
+                weight=round(client.weight + week * 0.4, 1), body_fat=round(rng.uniform(10, 30), 1),
+                muscle_mass=round(rng.uniform(25, 45), 1), measurements={'waist': round(rng.uniform(65, 100), 1)},
+            )
+            for client in client_objects for week in range(METRICS_PER_CLIENT)
+        ))
+        # La mitad de los objetivos enlazados a la métrica de peso y la otra mitad manuales
+        _bulk_insert(Goal, (
+            Goal(
+                gym=gym, client=client, title='Bajar peso', description='Objetivo de benchmark',
+                target_value=round(client.weight - 5, 1), current_value=client.weight,
+                start_value=round(client.weight + 1.2, 1), unit='kg', category='weight',
+                deadline=today + timedelta(days=rng.randint(30, 180)),
+                metric='weight' if i % 2 == 0 else None,
+            )
+            for i, client in enumerate(client_objects)
+        ))
+
+    refresh_adherence(ClientRoutine.objects.filter(gym=gym, is_active=True).values('pk'), today=today)
+    rebuild_leaderboards()
+    DataVersion.bump('clients')
+    DataVersion.bump(version_name(gym.pk))
+    return gym, user
@@ -0,0 +1,165 @@
+import asyncio
+import itertools
+import json
+import logging
+import select
+import threading
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('workout_completed', 'goal_completed', 'progress_metrics')
+
+
+class Subscription:
+    """
+    Cola acotada de eventos de un suscriptor (una conexión SSE).
+
+    Vive en el event loop del suscriptor; los eventos llegan desde otros hilos con
+    call_soon_threadsafe. Si el suscriptor no consume a tiempo se descartan los
+    eventos más antiguos y se cuenta cuántos se han perdido.
+    """
+
+    def __init__(self, loop, maxsize, event_types=None, client_id=None, gym_id=None):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.event_types = set(event_types) if event_types else None
+        self.client_id = client_id
+        self.gym_id = gym_id
+        self.dropped = 0
+
+    def accepts(self, event):
+        if self.event_types is not None and event['type'] not in self.event_types:
+            return False
+        if self.gym_id is not None and event.get('gym_id') != self.gym_id:
+            return False
+        return self.client_id is None or event.get('client_id') == self.client_id
+
+    def push(self, event):
+        # Se ejecuta siempre en el event loop del suscriptor
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class EventBroker:
+    """Pub/sub en memoria del proceso: reparte cada evento a los suscriptores que lo aceptan"""
+
+    def __init__(self):
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, event_types=None, client_id=None, gym_id=None, maxsize=None):
+        subscription = Subscription(
+            asyncio.get_running_loop(),
+            maxsize or settings.EVENTS_QUEUE_SIZE,
+            event_types=event_types,
+            client_id=client_id,
+            gym_id=gym_id
+        )
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def dispatch(self, event):
+        """Entregar un evento a los suscriptores de este proceso (seguro desde cualquier hilo)"""
+        event.setdefault('event_id', next(self._ids))
+        with self._lock:
+            subscriptions = [s for s in self._subscriptions if s.accepts(event)]
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:
+                # El event loop ya se cerró: la conexión terminó sin desuscribirse
+                self.unsubscribe(subscription)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+
+class PostgresBridge(threading.Thread):
+    """
+    Hilo que escucha LISTEN en PostgreSQL y entrega los eventos al broker local.
+
+    Con varios workers cada evento se publica con pg_notify y todos los procesos
+    (incluido el que lo generó) lo reciben por aquí.
+    """
+
+    def __init__(self, broker, channel):
+        super().__init__(name='gym-events-listener', daemon=True)
+        self.broker = broker
+        self.channel = channel
+
+    def run(self):
+        import psycopg2
+
+        params = connection.get_connection_params()
+        params.pop('cursor_factory', None)
+        while True:
+            listener = None
+            try:
+                listener = psycopg2.connect(**params)
+                listener.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with listener.cursor() as cursor:
+                    cursor.execute(f'LISTEN "{self.channel}"')
+                while True:
+                    if select.select([listener], [], [], 60) == ([], [], []):
+                        continue
+                    listener.poll()
+                    while listener.notifies:
+                        notify = listener.notifies.pop(0)
+                        try:
+                            self.broker.dispatch(json.loads(notify.payload))
+                        except ValueError:
+                            logger.warning(f"Evento con formato inválido en {self.channel}")
+            except Exception as e:
+                logger.error(f"Error en el listener de eventos, reconectando: {e}")
+                if listener is not None:
+                    listener.close()
+                threading.Event().wait(5)
+
+
+broker = EventBroker()
+_bridge = None
+_bridge_lock = threading.Lock()
+
+
+def use_postgres_bridge():
+    return connection.vendor == 'postgresql' and bool(settings.EVENTS_PG_CHANNEL)
+
+
+def ensure_listener():
+    """Arrancar el listener de PostgreSQL la primera vez que alguien se suscribe"""
+    global _bridge
+    if _bridge is None and use_postgres_bridge():
+        with _bridge_lock:
+            if _bridge is None:
+                _bridge = PostgresBridge(broker, settings.EVENTS_PG_CHANNEL)
+                _bridge.start()
+
+
+def send(event):
+    payload = json.dumps(event, cls=DjangoJSONEncoder)
+    if use_postgres_bridge():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [settings.EVENTS_PG_CHANNEL, payload])
+    else:
+        broker.dispatch(json.loads(payload))
+
+
+def publish(event_type, **data):
+    """Publicar un evento compacto cuando se confirme la transacción actual"""
+    event = {'type': event_type, **data}
+    transaction.on_commit(lambda: send(event))
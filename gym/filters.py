@@ -1,11 +1,56 @@
 import django_filters
 from django_filters import rest_framework as filters
-from django.db.models import Q, Count
+from django.db import connection
+from django.db.models import Q, Count, Exists, OuterRef, Subquery, IntegerField, Case, When, Value
+from django.db.models.functions import Coalesce
 from datetime import date
-from .models import Client, Routine, Exercise, Workout, Goal
+from .tenancy import GymScopedFilterSet
+from .models import Client, ClientRoutine, Routine, Exercise, Workout, WorkoutSet, Goal, normalize_search
 
 
-class ClientFilter(filters.FilterSet):
+def annotate_count(queryset, alias, related, outer_field, counted='pk', distinct=False):
+    """
+    Anotar `alias` con un COUNT correlacionado sobre `related` (una vez por queryset).
+
+    Varios filtros de conteo sobre la misma relación reutilizan la anotación y
+    cada relación se cuenta en su propia subconsulta, así que combinarlos no
+    multiplica JOINs ni infla los totales por el producto de relaciones.
+    """
+    if alias in queryset.query.annotations:
+        return queryset
+    counts = related.filter(**{outer_field: OuterRef('pk')}).order_by().values(outer_field).annotate(
+        total=Count(counted, distinct=distinct)
+    ).values('total')
+    return queryset.annotate(**{
+        alias: Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+    })
+
+
+def search_exercises(queryset, value):
+    """
+    Ejercicios cuyo nombre o descripción contiene `value`, sin distinguir acentos ni mayúsculas.
+
+    Se busca sobre las columnas normalizadas (índices de trigramas en PostgreSQL) y
+    se ordena primero por coincidencias al inicio del nombre, luego en el nombre y
+    por último solo en la descripción.
+    """
+    term = normalize_search(value).strip()
+    matches = queryset.filter(Q(search_name__contains=term) | Q(search_description__contains=term))
+    rank = Case(
+        When(search_name__startswith=term, then=Value(0)),
+        When(search_name__contains=term, then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField()
+    )
+    ordering = ['search_rank']
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramSimilarity
+        matches = matches.annotate(similarity=TrigramSimilarity('search_name', term))
+        ordering.append('-similarity')
+    return matches.annotate(search_rank=rank).order_by(*ordering, 'name')
+
+
+class ClientFilter(GymScopedFilterSet):
     # Filtros de búsqueda
     search = django_filters.CharFilter(method='search_filter', label='Buscar')
     
@@ -98,15 +143,10 @@ class ClientFilter(filters.FilterSet):
 
     def filter_subscription_status(self, queryset, name, value):
         """Filtro por estado de suscripción"""
-        from django.utils import timezone
-        
         if value == 'active':
-            return queryset.filter(
-                Q(subscription_end__isnull=True) | 
-                Q(subscription_end__gt=timezone.now().date())
-            )
+            return queryset.filter(subscription_status__in=['active', 'expiring'])
         elif value == 'expired':
-            return queryset.filter(subscription_end__lt=timezone.now().date())
+            return queryset.filter(subscription_status='expired')
         elif value == 'none':
             return queryset.filter(subscription_type__isnull=True)
         
@@ -120,66 +160,58 @@ class ClientFilter(filters.FilterSet):
 
     def filter_has_routines(self, queryset, name, value):
         """Filtro por si tiene rutinas asignadas"""
-        if value:
-            return queryset.filter(client_routines__is_active=True).distinct()
-        return queryset.exclude(client_routines__is_active=True)
+        condition = self.general_conditions()['with-routines']
+        return queryset.filter(condition if value else ~condition)
 
     def filter_routine_count(self, queryset, name, value):
         """Filtro por número de rutinas asignadas"""
-        return queryset.annotate(
-            routine_count=Count('client_routines', filter=Q(client_routines__is_active=True))
+        return annotate_count(
+            queryset, 'routine_count', ClientRoutine.objects.filter(is_active=True), 'client_id'
         ).filter(routine_count=value)
 
-    def filter_general(self, queryset, name, value):
-        """Filtro general para diferentes tipos de filtros predefinidos"""
+    @staticmethod
+    def general_conditions():
+        """Condición de cada opción de `filter`; la comparten el filtro y el conteo de facetas"""
         from django.utils import timezone
         from datetime import timedelta
         
-        if value == 'all':
-            return queryset
-        
-        elif value == 'active':
-            return queryset.filter(
-                Q(subscription_end__isnull=True) | 
-                Q(subscription_end__gt=timezone.now().date())
-            )
-        
-        elif value == 'premium':
-            return queryset.filter(subscription_type='premium')
-        
-        elif value == 'standard':
-            return queryset.filter(subscription_type='standard')
-        
-        elif value == 'personalized':
-            return queryset.filter(subscription_type='personalized')
-        
-        elif value == 'with-routines':
-            return queryset.filter(client_routines__is_active=True).distinct()
-        
-        elif value == 'without-routines':
-            return queryset.exclude(client_routines__is_active=True)
-        
-        elif value == 'expiring':
-            # Clientes con suscripción que expira en los próximos 30 días
-            thirty_days_from_now = timezone.now().date() + timedelta(days=30)
-            return queryset.filter(
-                subscription_end__isnull=False,
-                subscription_end__lte=thirty_days_from_now,
-                subscription_end__gt=timezone.now().date()
-            )
-        
-        elif value == 'expired':
-            return queryset.filter(subscription_end__lt=timezone.now().date())
-        
-        elif value == 'new':
+        today = timezone.now().date()
+        # EXISTS / NOT EXISTS sobre client_id: sin JOIN ni DISTINCT que dupliquen u ordenen filas
+        active_routines = Exists(ClientRoutine.objects.filter(client=OuterRef('pk'), is_active=True))
+        return {
+            # Estado precalculado (índice por subscription_status); 'expiring' sigue activa
+            'active': Q(subscription_status__in=['active', 'expiring']),
+            'premium': Q(subscription_type='premium'),
+            'standard': Q(subscription_type='standard'),
+            'personalized': Q(subscription_type='personalized'),
+            'with-routines': Q(active_routines),
+            'without-routines': ~Q(active_routines),
+            'expiring': Q(subscription_status='expiring'),
+            'expired': Q(subscription_status='expired'),
             # Clientes registrados en el último mes
-            one_month_ago = timezone.now().date() - timedelta(days=30)
-            return queryset.filter(join_date__gte=one_month_ago)
-        
-        return queryset
+            'new': Q(join_date__gte=today - timedelta(days=30)),
+        }
 
+    def filter_general(self, queryset, name, value):
+        """Filtro general para diferentes tipos de filtros predefinidos"""
+        condition = self.general_conditions().get(value)
+        return queryset if condition is None else queryset.filter(condition)
+
+    @classmethod
+    def facet_counts(cls, queryset):
+        """Número de clientes de cada opción de `filter` dentro de `queryset`, en una sola consulta"""
+        conditions = cls.general_conditions()
+        # Los alias SQL no admiten guiones: se usan posiciones y se traducen al final
+        totals = queryset.aggregate(
+            total=Count('pk'),
+            **{f'facet_{index}': Count('pk', filter=condition) for index, condition in enumerate(conditions.values())}
+        )
+        facets = {'all': totals['total']}
+        facets.update((choice, totals[f'facet_{index}']) for index, choice in enumerate(conditions))
+        return facets
 
-class RoutineFilter(filters.FilterSet):
+
+class RoutineFilter(GymScopedFilterSet):
     # Filtros de búsqueda
     search = django_filters.CharFilter(method='search_filter', label='Buscar')
     
@@ -223,37 +255,33 @@ class RoutineFilter(filters.FilterSet):
             Q(description__icontains=value)
         )
 
+    @staticmethod
+    def with_workout_count(queryset):
+        return annotate_count(queryset, 'workout_count', Routine.workouts.through.objects.all(), 'routine_id')
+
+    @staticmethod
+    def with_client_count(queryset):
+        return annotate_count(queryset, 'client_count', ClientRoutine.objects.filter(is_active=True), 'routine_id')
+
     def filter_workout_count(self, queryset, name, value):
         """Filtro por número exacto de workouts"""
-        if value == 0:
-            return queryset.filter(workouts__isnull=True)
-        return queryset.annotate(
-            workout_count=Count('workouts')
-        ).filter(workout_count=value)
+        return self.with_workout_count(queryset).filter(workout_count=value)
 
     def filter_min_workouts(self, queryset, name, value):
         """Filtro por mínimo de workouts"""
-        return queryset.annotate(
-            workout_count=Count('workouts')
-        ).filter(workout_count__gte=value)
+        return self.with_workout_count(queryset).filter(workout_count__gte=value)
 
     def filter_max_workouts(self, queryset, name, value):
         """Filtro por máximo de workouts"""
-        return queryset.annotate(
-            workout_count=Count('workouts')
-        ).filter(workout_count__lte=value)
+        return self.with_workout_count(queryset).filter(workout_count__lte=value)
 
     def filter_min_clients(self, queryset, name, value):
         """Filtro por mínimo de clientes asignados"""
-        return queryset.annotate(
-            client_count=Count('client_routines', filter=Q(client_routines__is_active=True))
-        ).filter(client_count__gte=value)
+        return self.with_client_count(queryset).filter(client_count__gte=value)
 
     def filter_max_clients(self, queryset, name, value):
         """Filtro por máximo de clientes asignados"""
-        return queryset.annotate(
-            client_count=Count('client_routines', filter=Q(client_routines__is_active=True))
-        ).filter(client_count__lte=value)
+        return self.with_client_count(queryset).filter(client_count__lte=value)
 
     def filter_estimated_difficulty(self, queryset, name, value):
         """Filtro por dificultad estimada basada en días por semana y duración"""
@@ -275,10 +303,13 @@ class RoutineFilter(filters.FilterSet):
     def filter_workout_categories(self, queryset, name, value):
         """Filtro por categorías de workouts en la rutina"""
         categories = [cat.strip() for cat in value.split(',')]
-        return queryset.filter(workouts__category__in=categories).distinct()
+        # Semi-join sobre la tabla intermedia en lugar de JOIN + DISTINCT
+        return queryset.filter(Exists(Routine.workouts.through.objects.filter(
+            routine_id=OuterRef('pk'), workout__category__in=categories
+        )))
 
 
-class ExerciseFilter(filters.FilterSet):
+class ExerciseFilter(GymScopedFilterSet):
     search = django_filters.CharFilter(method='search_filter', label='Buscar')
     muscle_groups = django_filters.CharFilter(method='filter_muscle_groups', label='Grupos musculares')
     equipment = django_filters.CharFilter(method='filter_equipment', label='Equipamiento')
@@ -292,10 +323,11 @@ class ExerciseFilter(filters.FilterSet):
         }
 
     def search_filter(self, queryset, name, value):
-        """Búsqueda en múltiples campos"""
+        """Búsqueda en nombre y descripción sin distinguir acentos"""
+        term = normalize_search(value).strip()
         return queryset.filter(
-            Q(name__icontains=value) |
-            Q(description__icontains=value)
+            Q(search_name__contains=term) |
+            Q(search_description__contains=term)
         )
 
     def filter_muscle_groups(self, queryset, name, value):
@@ -309,7 +341,7 @@ class ExerciseFilter(filters.FilterSet):
         return queryset.filter(equipment__overlap=equipment_list)
 
 
-class WorkoutFilter(filters.FilterSet):
+class WorkoutFilter(GymScopedFilterSet):
     search = django_filters.CharFilter(method='search_filter', label='Buscar')
     estimated_duration_range = django_filters.RangeFilter(field_name='estimated_duration', label='Rango de duración')
     exercise_count = django_filters.NumberFilter(method='filter_exercise_count', label='Número de ejercicios')
@@ -332,12 +364,12 @@ class WorkoutFilter(filters.FilterSet):
 
     def filter_exercise_count(self, queryset, name, value):
         """Filtro por número de ejercicios"""
-        return queryset.annotate(
-            exercise_count=Count('sets__exercise', distinct=True)
+        return annotate_count(
+            queryset, 'exercise_count', WorkoutSet.objects.all(), 'workout_id', counted='exercise', distinct=True
         ).filter(exercise_count=value)
 
 
-class GoalFilter(filters.FilterSet):
+class GoalFilter(GymScopedFilterSet):
     search = django_filters.CharFilter(method='search_filter', label='Buscar')
     
     class Meta:
@@ -0,0 +1,136 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('gym.sql')
+
+
+class QueryBudgetExceeded(Exception):
+    """Una petición superó el presupuesto de consultas configurado para su endpoint"""
+
+
+class QueryRecorder:
+    """execute_wrapper que cuenta las consultas, su tiempo total y la más lenta"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_sql = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.total += duration
+            if duration >= self.slowest:
+                self.slowest = duration
+                self.slowest_sql = sql
+
+
+def endpoint_name(view_func, method):
+    """
+    Nombre del endpoint para logs y presupuestos: 'ClientViewSet.list',
+    'ClientViewSet.statistics' o el nombre de una vista de función ('leaderboards').
+    """
+    view_class = getattr(view_func, 'cls', None)
+    if view_class is None:
+        return getattr(view_func, '__name__', repr(view_func)), None
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        action = actions.get(method.lower())
+        return f'{view_class.__name__}.{action}', action
+    # APIView de @api_view: la clase toma el nombre de la función
+    return view_class.__name__, None
+
+
+def budget_for(endpoint):
+    """Presupuesto del endpoint en SQL_QUERY_BUDGETS, o el genérico '*' si lo hay"""
+    budgets = settings.SQL_QUERY_BUDGETS
+    return budgets.get(endpoint, budgets.get('*'))
+
+
+def check_budget(budget, recorder):
+    """Lista de límites superados ('queries', 'db_ms') según el presupuesto"""
+    exceeded = []
+    if budget.get('queries') is not None and recorder.count > budget['queries']:
+        exceeded.append('queries')
+    if budget.get('db_ms') is not None and recorder.total * 1000 > budget['db_ms']:
+        exceeded.append('db_ms')
+    return exceeded
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Instrumentación SQL por petición, activa con SQL_INSTRUMENTATION.
+
+    Envuelve todas las conexiones con connection.execute_wrapper para medir el
+    número de consultas, el tiempo total en la base de datos y la consulta más
+    lenta. Los resultados se devuelven en la cabecera Server-Timing y como una
+    línea JSON en el logger 'gym.sql', etiquetada con el ViewSet y la acción.
+
+    SQL_QUERY_BUDGETS asigna a cada endpoint ('ClientViewSet.list', '*' para
+    el resto) límites de 'queries' y 'db_ms'; al superarlos se registra un aviso
+    o, con 'action': 'raise' (o SQL_BUDGET_ACTION), se lanza QueryBudgetExceeded.
+    Las consultas de respuestas en streaming se ejecutan después y no se cuentan.
+    Desactivada, Django la quita de la cadena y no añade ningún coste.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SQL_INSTRUMENTATION:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        endpoint, action = getattr(request, '_sql_endpoint', (request.path, None))
+        response['Server-Timing'] = ', '.join([
+            f'db;desc="{recorder.count} queries";dur={recorder.total * 1000:.2f}',
+            f'db-slowest;dur={recorder.slowest * 1000:.2f}',
+            f'app;dur={elapsed * 1000:.2f}',
+        ])
+
+        record = {
+            'endpoint': endpoint,
+            'action': action,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.total * 1000, 2),
+            'slowest_ms': round(recorder.slowest * 1000, 2),
+            'slowest_sql': recorder.slowest_sql[:500] if recorder.slowest_sql else None,
+            'total_ms': round(elapsed * 1000, 2),
+        }
+        logger.info(json.dumps(record))
+
+        budget = budget_for(endpoint)
+        if budget:
+            exceeded = check_budget(budget, recorder)
+            if exceeded:
+                message = (
+                    f"{endpoint} superó su presupuesto ({', '.join(exceeded)}): "
+                    f"{recorder.count} consultas, {record['db_ms']} ms"
+                )
+                if budget.get('action', settings.SQL_BUDGET_ACTION) == 'raise':
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._sql_endpoint = endpoint_name(view_func, request.method)
+        return None
@@ -0,0 +1,102 @@
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from gym.benchmarks import (
+    SCALES, seed_benchmark_data, reset_benchmark_data, run_benchmark,
+    compare_to_baseline, load_baseline, save_baseline
+)
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Puebla un gimnasio de benchmark a la escala indicada, mide latencia (p50/p99), consultas y '
+        'tamaño de respuesta de todos los endpoints y falla si hay regresiones frente a la línea base'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=list(SCALES), default='1k', help='Número de clientes a generar')
+        parser.add_argument('--iterations', type=int, default=20, help='Peticiones medidas por endpoint')
+        parser.add_argument('--warmup', type=int, default=2, help='Peticiones de calentamiento por endpoint')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Archivo JSON de líneas base')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.25,
+            help='Aumento relativo del p50 tolerado antes de fallar (0.25 = 25%%; el doble para el p99)'
+        )
+        parser.add_argument(
+            '--update-baseline',
+            action='store_true',
+            help='Guardar los resultados como nueva línea base de la escala en lugar de comparar'
+        )
+        parser.add_argument('--only', nargs='+', help='Medir solo estos endpoints (p. ej. ClientViewSet.list)')
+        parser.add_argument('--keep-data', action='store_true', help='No borrar el gimnasio de benchmark al terminar')
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Ejecutar aunque DEBUG esté desactivado (crea y borra datos en la base de datos)'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError(
+                'El benchmark crea y borra miles de filas: ejecútelo contra una base de datos de pruebas '
+                '(con DEBUG activo o --force)'
+            )
+        if options['iterations'] < 1:
+            raise CommandError('--iterations debe ser al menos 1')
+
+        scale = options['scale']
+        self.stdout.write(f'Generando datos de benchmark ({SCALES[scale]} clientes)...')
+        gym, user = seed_benchmark_data(SCALES[scale])
+        try:
+            self.stdout.write(f"Midiendo endpoints ({options['iterations']} repeticiones)...")
+            results = run_benchmark(
+                gym, user, iterations=options['iterations'], warmup=max(0, options['warmup']),
+                only=set(options['only']) if options['only'] else None
+            )
+        finally:
+            if not options['keep_data']:
+                reset_benchmark_data()
+
+        self.stdout.write(f"{'Endpoint':<50} {'Estado':>6} {'p50 ms':>9} {'p99 ms':>9} {'Consultas':>9} {'Bytes':>9}")
+        for name, result in sorted(results['endpoints'].items()):
+            self.stdout.write(
+                f"{name:<50} {result['status']:>6} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+                f"{result['queries']:>9} {result['bytes']:>9}"
+            )
+
+        if options['update_baseline']:
+            excluded = save_baseline(options['baseline'], scale, results)
+            if excluded:
+                self.stdout.write(self.style.WARNING(
+                    'Endpoints con error, excluidos de la línea base: ' + ', '.join(excluded)
+                ))
+            self.stdout.write(self.style.SUCCESS(f"Línea base de {scale} guardada en {options['baseline']}"))
+            return
+
+        baseline = load_baseline(options['baseline']).get(scale)
+        if baseline is None:
+            self.stdout.write(self.style.WARNING(f'No hay línea base para {scale}: use --update-baseline para crearla'))
+            return
+        if options['only']:
+            baseline = {**baseline, 'endpoints': {
+                name: expected for name, expected in baseline['endpoints'].items() if name in options['only']
+            }}
+        if baseline.get('vendor') != results['vendor']:
+            self.stdout.write(self.style.WARNING(
+                f"La línea base se grabó con {baseline.get('vendor')} y se ejecuta con {results['vendor']}: "
+                'solo se comparan consultas, estados y tamaños'
+            ))
+
+        if baseline.get('excluded'):
+            self.stdout.write(self.style.WARNING(
+                'Sin línea base (fallaban al grabarla): ' + ', '.join(baseline['excluded'])
+            ))
+
+        regressions = compare_to_baseline(results, baseline, threshold=options['threshold'])
+        if regressions:
+            raise CommandError('Regresiones frente a la línea base:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Sin regresiones frente a la línea base'))
@@ -0,0 +1,137 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from gym.models import Client, Exercise, ProgressMetrics
+from gym.services import S3Service
+
+# delete_objects admite como máximo 1000 claves por petición
+MAX_DELETE_BATCH = 1000
+
+
+class Command(BaseCommand):
+    help = 'Elimina de S3 los archivos de media que ya no están referenciados en la base de datos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo listar los archivos huérfanos, sin eliminarlos'
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=24,
+            help='Antigüedad mínima en horas para eliminar un archivo (protege subidas en curso). Por defecto: 24'
+        )
+        parser.add_argument(
+            '--prefix',
+            action='append',
+            dest='prefixes',
+            help='Prefijo a revisar; se puede repetir. Por defecto: profiles/, progress/ y uploads/'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=MAX_DELETE_BATCH,
+            help='Claves por petición delete_objects (máximo 1000)'
+        )
+        parser.add_argument(
+            '--max-deletes-per-second',
+            type=float,
+            default=0,
+            help='Límite de borrados por segundo (0 = sin límite)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Filas leídas por bloque al recorrer la base de datos'
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        prefixes = options['prefixes'] or ['profiles/', 'progress/', 'uploads/']
+        batch_size = max(1, min(options['batch_size'], MAX_DELETE_BATCH))
+        max_rate = options['max_deletes_per_second']
+        cutoff = timezone.now() - timedelta(hours=options['min_age'])
+
+        self.stdout.write('Recolectando claves referenciadas en la base de datos...')
+        referenced = self.referenced_keys(options['chunk_size'])
+        self.stdout.write(f'  - {len(referenced)} claves referenciadas')
+
+        s3_service = S3Service()
+        scanned = 0
+        orphans = 0
+        deleted = 0
+        failed = 0
+        batch = []
+
+        for prefix in prefixes:
+            self.stdout.write(f'Revisando {prefix}...')
+            for obj in s3_service.iter_objects(prefix):
+                scanned += 1
+                key = obj['Key']
+                if key in referenced or obj['LastModified'] > cutoff:
+                    continue
+
+                orphans += 1
+                if dry_run:
+                    self.stdout.write(f'  - Huérfano: {key}')
+                    continue
+
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    ok, errors = self.delete_batch(s3_service, batch, max_rate)
+                    deleted += ok
+                    failed += errors
+                    batch = []
+
+        if batch:
+            ok, errors = self.delete_batch(s3_service, batch, max_rate)
+            deleted += ok
+            failed += errors
+
+        summary = f'Objetos revisados: {scanned}. Huérfanos: {orphans}.'
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f'{summary} (dry-run, no se eliminó nada)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{summary} Eliminados: {deleted}. Con error: {failed}.'))
+
+    def referenced_keys(self, chunk_size):
+        """Conjunto de claves de S3 referenciadas por clientes, métricas y ejercicios"""
+        keys = set()
+
+        def add(url):
+            key = S3Service.get_key_from_url(url)
+            if key:
+                keys.add(key)
+
+        profile_images = Client.objects.exclude(profile_image__isnull=True).exclude(profile_image='')
+        for url in profile_images.values_list('profile_image', flat=True).iterator(chunk_size=chunk_size):
+            add(url)
+
+        photos = ProgressMetrics.objects.exclude(photos__isnull=True)
+        for urls in photos.values_list('photos', flat=True).iterator(chunk_size=chunk_size):
+            for url in urls or []:
+                add(url)
+
+        for image_url, video_url in Exercise.objects.values_list('image_url', 'video_url').iterator(chunk_size=chunk_size):
+            add(image_url)
+            add(video_url)
+
+        return keys
+
+    def delete_batch(self, s3_service, keys, max_rate):
+        """Eliminar un lote con delete_objects respetando el límite de borrados por segundo"""
+        started = time.monotonic()
+        failed_keys = s3_service.delete_files(keys)
+
+        if max_rate > 0:
+            # Dormir lo necesario para no superar max_rate borrados por segundo
+            remaining = len(keys) / max_rate - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+
+        self.stdout.write(f'  - Lote eliminado: {len(keys) - len(failed_keys)} ok, {len(failed_keys)} con error')
+        return len(keys) - len(failed_keys), len(failed_keys)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from gym.analytics import rebuild_leaderboards
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los rankings semanales y las rachas desde el historial de entrenamientos completados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Rehacer solo las semanas a partir de esta fecha (YYYY-MM-DD)'
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError('Formato de --since inválido. Use YYYY-MM-DD')
+
+        self.stdout.write('Reconstruyendo rankings y rachas...')
+        written = rebuild_leaderboards(since=since)
+        self.stdout.write(self.style.SUCCESS(f'Filas de ranking escritas: {written}'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from gym.analytics import refresh_adherence
+from gym.models import ClientRoutine
+
+
+class Command(BaseCommand):
+    help = 'Recalcula la adherencia de las asignaciones activas (ejecutar a diario: las sesiones programadas crecen con el tiempo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Asignaciones procesadas por bloque'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        today = timezone.localdate()
+
+        ids = list(ClientRoutine.objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+        self.stdout.write(f'Recalculando adherencia de {len(ids)} asignaciones activas...')
+
+        updated = 0
+        for start in range(0, len(ids), chunk_size):
+            updated += refresh_adherence(ids[start:start + chunk_size], today=today)
+
+        self.stdout.write(self.style.SUCCESS(f'Adherencia actualizada: {updated} asignaciones'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from gym.models import Client
+
+
+class Command(BaseCommand):
+    help = 'Actualiza subscription_status de los clientes que pasan a por expirar o expirados (ejecutar a diario)'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Actualizando el estado de las suscripciones...')
+        updated = Client.refresh_subscription_statuses()
+        self.stdout.write(self.style.SUCCESS(f'Clientes actualizados: {updated}'))
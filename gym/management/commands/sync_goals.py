@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from gym.analytics import sync_goals
+
+
+class Command(BaseCommand):
+    help = 'Sincroniza current_value e is_completed de los objetivos enlazados a métricas de progreso'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Sincronizando objetivos con la última medición de cada métrica...')
+        updated = sync_goals()
+        self.stdout.write(self.style.SUCCESS(f'Objetivos actualizados: {updated}'))
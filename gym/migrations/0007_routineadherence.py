@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0006_dataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoutineAdherence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scheduled_sessions', models.PositiveIntegerField(default=0)),
+                ('completed_sessions', models.PositiveIntegerField(default=0)),
+                ('adherence_rate', models.FloatField(blank=True, help_text='Completadas / programadas (máximo 1)', null=True)),
+                ('weekly', models.JSONField(default=list, help_text='Últimas semanas: week_start, scheduled, completed')),
+                ('last_completed_at', models.DateTimeField(blank=True, null=True)),
+                ('computed_on', models.DateField()),
+                ('client_routine', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='adherence', to='gym.clientroutine')),
+            ],
+        ),
+    ]
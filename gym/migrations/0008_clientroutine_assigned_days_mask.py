@@ -0,0 +1,43 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:01
+
+from django.db import migrations, models
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+def backfill_assigned_days_mask(apps, schema_editor):
+    ClientRoutine = apps.get_model('gym', 'ClientRoutine')
+    batch = []
+    for client_routine in ClientRoutine.objects.only('id', 'assigned_days').iterator(chunk_size=2000):
+        mask = 0
+        for day in client_routine.assigned_days or []:
+            if day in WEEKDAYS:
+                mask |= 1 << WEEKDAYS.index(day)
+        if mask:
+            client_routine.assigned_days_mask = mask
+            batch.append(client_routine)
+        if len(batch) >= 2000:
+            ClientRoutine.objects.bulk_update(batch, ['assigned_days_mask'])
+            batch = []
+    if batch:
+        ClientRoutine.objects.bulk_update(batch, ['assigned_days_mask'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0007_routineadherence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientroutine',
+            name='assigned_days_mask',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_assigned_days_mask, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='clientroutine',
+            index=models.Index(fields=['is_active', 'assigned_days_mask'], name='clientroutine_active_days_idx'),
+        ),
+    ]
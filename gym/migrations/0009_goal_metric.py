@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:04
+
+from django.db import migrations, models
+
+
+def backfill_start_value(apps, schema_editor):
+    Goal = apps.get_model('gym', 'Goal')
+    Goal.objects.filter(start_value__isnull=True).update(start_value=models.F('current_value'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0008_clientroutine_assigned_days_mask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goal',
+            name='metric',
+            field=models.CharField(blank=True, help_text='Métrica de progreso que actualiza current_value: weight, body_fat, muscle_mass o una clave de measurements', max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='goal',
+            name='start_value',
+            field=models.FloatField(blank=True, help_text='Valor al crear el objetivo; indica si se busca subir o bajar', null=True),
+        ),
+        migrations.RunPython(backfill_start_value, migrations.RunPython.noop),
+    ]
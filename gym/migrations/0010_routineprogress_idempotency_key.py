@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0009_goal_metric'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='routineprogress',
+            name='idempotency_key',
+            field=models.UUIDField(blank=True, null=True, unique=True),
+        ),
+    ]
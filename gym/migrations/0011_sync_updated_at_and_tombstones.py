@@ -0,0 +1,88 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0010_routineprogress_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(help_text='Colección de /api/sync/ (goals, progress_metrics, ...)', max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('client_id', models.BigIntegerField(blank=True, help_text='Cliente dueño del registro; vacío en el catálogo común', null=True)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='clientroutine',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='exercise',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='goal',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='progressmetrics',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='routine',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='routineprogress',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='workout',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddField(
+            model_name='workoutset',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='clientroutine',
+            index=models.Index(fields=['client', 'updated_at'], name='clientroutine_client_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(fields=['client', 'updated_at'], name='goal_client_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='progressmetrics',
+            index=models.Index(fields=['client', 'updated_at'], name='progressmetrics_client_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='routineprogress',
+            index=models.Index(fields=['client_routine', 'updated_at'], name='routineprogress_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['client_id', 'deleted_at'], name='synctombstone_client_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0011_sync_updated_at_and_tombstones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientStreak',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('current_streak', models.PositiveIntegerField(default=0)),
+                ('longest_streak', models.PositiveIntegerField(default=0)),
+                ('last_week', models.DateField(blank=True, help_text='Lunes de la última semana con entrenamientos', null=True)),
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='streak', to='gym.client')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-current_streak', 'last_week'], name='clientstreak_current_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField()),
+                ('workouts', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('average_rating', models.FloatField(blank=True, null=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to='gym.client')),
+                ('routine', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='gym.routine')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['week_start', 'routine', '-workouts'], name='leaderboard_workouts_idx'), models.Index(fields=['week_start', 'routine', '-average_rating'], name='leaderboard_rating_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('routine__isnull', True)), fields=('week_start', 'client'), name='leaderboard_global_unique'), models.UniqueConstraint(condition=models.Q(('routine__isnull', False)), fields=('week_start', 'routine', 'client'), name='leaderboard_routine_unique')],
+            },
+        ),
+    ]
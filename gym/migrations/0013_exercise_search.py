@@ -0,0 +1,71 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:27
+
+import unicodedata
+from django.db import migrations, models
+
+
+def normalize_search(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def backfill_search_columns(apps, schema_editor):
+    Exercise = apps.get_model('gym', 'Exercise')
+    batch = []
+    for exercise in Exercise.objects.only('id', 'name', 'description').iterator(chunk_size=2000):
+        exercise.search_name = normalize_search(exercise.name)
+        exercise.search_description = normalize_search(exercise.description)
+        batch.append(exercise)
+        if len(batch) >= 2000:
+            Exercise.objects.bulk_update(batch, ['search_name', 'search_description'])
+            batch = []
+    if batch:
+        Exercise.objects.bulk_update(batch, ['search_name', 'search_description'])
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # Índices GIN de trigramas para LIKE '%...%'; solo existen en PostgreSQL
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS exercise_search_name_trgm_idx '
+        'ON gym_exercise USING gin (search_name gin_trgm_ops)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS exercise_search_desc_trgm_idx '
+        'ON gym_exercise USING gin (search_description gin_trgm_ops)'
+    )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS exercise_search_name_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS exercise_search_desc_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0012_leaderboards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exercise',
+            name='search_description',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='exercise',
+            name='search_name',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(backfill_search_columns, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(fields=['search_name'], name='exercise_search_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
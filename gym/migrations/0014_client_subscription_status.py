@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:31
+
+from datetime import timedelta
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_subscription_status(apps, schema_editor):
+    Client = apps.get_model('gym', 'Client')
+    today = timezone.localdate()
+    expiring_until = today + timedelta(days=getattr(settings, 'SUBSCRIPTION_EXPIRING_DAYS', 30))
+    Client.objects.filter(subscription_end__lt=today).update(subscription_status='expired')
+    Client.objects.filter(
+        subscription_end__gte=today, subscription_end__lte=expiring_until
+    ).update(subscription_status='expiring')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0013_exercise_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='subscription_status',
+            field=models.CharField(choices=[('active', 'Activa'), ('expiring', 'Por expirar'), ('expired', 'Expirada')], db_index=True, default='active', editable=False, max_length=10),
+        ),
+        migrations.RunPython(backfill_subscription_status, migrations.RunPython.noop),
+    ]
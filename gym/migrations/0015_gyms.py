@@ -0,0 +1,141 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+TENANT_MODELS = [
+    'Client', 'Exercise', 'Workout', 'Routine', 'ClientRoutine', 'RoutineProgress', 'ProgressMetrics', 'Goal',
+]
+
+
+def assign_default_gym(apps, schema_editor):
+    # Los datos existentes pasan a un gimnasio por defecto con un UPDATE por tabla
+    Gym = apps.get_model('gym', 'Gym')
+    CustomUser = apps.get_model('gym', 'CustomUser')
+    models_with_rows = [apps.get_model('gym', name) for name in TENANT_MODELS]
+    if not any(model.objects.exists() for model in models_with_rows + [CustomUser]):
+        return
+    gym, _ = Gym.objects.get_or_create(slug='principal', defaults={'name': 'Principal'})
+    for model in models_with_rows + [CustomUser]:
+        model.objects.filter(gym__isnull=True).update(gym=gym)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0014_client_subscription_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Gym',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(unique=True)),
+                ('domain', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='gym',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gym.gym'),
+        ),
+        migrations.AddField(
+            model_name='clientroutine',
+            name='gym',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gym.gym'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='gym',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='staff', to='gym.gym'),
+        ),
+        migrations.AddField(
+            model_name='exercise',
+            name='gym',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gym.gym'),
+        ),
+        migrations.AddField(
+            model_name='goal',
+            name='gym',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gym.gym'),
+        ),
+        migrations.AddField(
+            model_name='progressmetrics',
+            name='gym',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gym.gym'),
+        ),
+        migrations.AddField(
+            model_name='routine',
+            name='gym',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gym.gym'),
+        ),
+        migrations.AddField(
+            model_name='routineprogress',
+            name='gym',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gym.gym'),
+        ),
+        migrations.AddField(
+            model_name='workout',
+            name='gym',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gym.gym'),
+        ),
+        migrations.RunPython(assign_default_gym, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['gym', 'subscription_status'], name='client_gym_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['gym', 'join_date'], name='client_gym_join_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['gym', 'name'], name='client_gym_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clientroutine',
+            index=models.Index(fields=['gym', 'is_active', 'assigned_days_mask'], name='clientroutine_gym_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(fields=['gym', 'search_name'], name='exercise_gym_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(fields=['gym', 'difficulty'], name='exercise_gym_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(fields=['gym', 'is_completed', 'deadline'], name='goal_gym_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='progressmetrics',
+            index=models.Index(fields=['gym', '-date'], name='progressmetrics_gym_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='routine',
+            index=models.Index(fields=['gym', 'frequency'], name='routine_gym_frequency_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='routine',
+            index=models.Index(fields=['gym', 'name'], name='routine_gym_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='routineprogress',
+            index=models.Index(fields=['gym', '-completed_at'], name='routineprogress_gym_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['gym', 'category'], name='workout_gym_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['gym', 'name'], name='workout_gym_name_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.9 on 2026-10-19 20:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_client_gym(apps, schema_editor):
+    # Un UPDATE por tabla con el gimnasio del cliente
+    Client = apps.get_model('gym', 'Client')
+    client_gym = models.Subquery(Client.objects.filter(pk=models.OuterRef('client_id')).values('gym_id')[:1])
+    for name in ('LeaderboardEntry', 'ClientStreak'):
+        apps.get_model('gym', name).objects.update(gym_id=client_gym)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0015_gyms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientstreak',
+            name='gym',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gym.gym'),
+        ),
+        migrations.AddField(
+            model_name='leaderboardentry',
+            name='gym',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gym.gym'),
+        ),
+        migrations.RunPython(copy_client_gym, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='clientstreak',
+            index=models.Index(fields=['gym', '-current_streak', 'last_week'], name='clientstreak_gym_current_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['gym', 'week_start', 'routine', '-workouts'], name='leaderboard_gym_workouts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['gym', 'week_start', 'routine', '-average_rating'], name='leaderboard_gym_rating_idx'),
+        ),
+    ]
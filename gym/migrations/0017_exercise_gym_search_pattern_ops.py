@@ -0,0 +1,21 @@
+# Generated by Django 5.2.9 on 2026-10-19 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gym', '0016_leaderboard_gym'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='exercise',
+            name='exercise_gym_search_idx',
+        ),
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(fields=['gym', 'search_name'], name='exercise_gym_search_idx', opclasses=['int8_ops', 'varchar_pattern_ops']),
+        ),
+    ]
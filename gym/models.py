@@ -1,11 +1,44 @@
-from django.db import models
+import unicodedata
+from django.db import connection, models, transaction
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from datetime import date
+from django.utils import timezone
+from datetime import date, timedelta
 
 # Create your models here.
 
+# Orden de los bits de ClientRoutine.assigned_days_mask (lunes = bit 0, como date.weekday())
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+def weekday_mask(days):
+    """Convertir una lista de días ('monday', ...) en una máscara de bits"""
+    mask = 0
+    for day in days or []:
+        if day in WEEKDAYS:
+            mask |= 1 << WEEKDAYS.index(day)
+    return mask
+
+def normalize_search(text):
+    """Texto en minúsculas y sin acentos para búsquedas ('Cuádriceps' -> 'cuadriceps')"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+class Gym(models.Model):
+    """Gimnasio (tenant): todos los datos de negocio pertenecen a uno"""
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=50, unique=True)
+    # Host propio del gimnasio (p. ej. 'centro.gymnow.app'); resuelve el tenant sin JWT
+    domain = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+def gym_field():
+    """FK al gimnasio de un modelo con tenant: sin índice propio, lo cubren los índices compuestos (gym, ...)"""
+    return models.ForeignKey(Gym, on_delete=models.CASCADE, null=True, blank=True, editable=False, db_index=False, related_name='+')
+
 class CustomUser(models.Model):
     """Modelo personalizado de usuario que extiende el User de Django"""
     ROLE_CHOICES = [
@@ -17,6 +50,8 @@ class CustomUser(models.Model):
     
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='custom_profile')
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='client')
+    # Gimnasio del usuario (None: personal de plataforma sin tenant)
+    gym = models.ForeignKey(Gym, on_delete=models.SET_NULL, null=True, blank=True, related_name='staff')
     
     def __str__(self):
         return f"{self.user.username} - {self.role}"
@@ -31,7 +66,13 @@ class Client(models.Model):
         ('premium', 'Premium'),
         ('personalized', 'Personalized'),
     ]
+    SUBSCRIPTION_STATUS_CHOICES = [
+        ('active', 'Activa'),
+        ('expiring', 'Por expirar'),
+        ('expired', 'Expirada'),
+    ]
     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True, related_name='client_profile')
+    gym = gym_field()
     name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=30)
@@ -44,9 +85,21 @@ class Client(models.Model):
     subscription_type = models.CharField(max_length=20, choices=SUBSCRIPTION_CHOICES, null=True, blank=True)
     subscription_start = models.DateField(null=True, blank=True)
     subscription_end = models.DateField(null=True, blank=True)
+    # Derivado de subscription_end: se actualiza al guardar y a diario con refresh_subscription_status
+    subscription_status = models.CharField(
+        max_length=10, choices=SUBSCRIPTION_STATUS_CHOICES, default='active', editable=False, db_index=True
+    )
     notes = models.TextField(null=True, blank=True)
     emergency_contact = models.CharField(max_length=100, null=True, blank=True)
     medical_conditions = models.CharField(max_length=255, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['gym', 'subscription_status'], name='client_gym_status_idx'),
+            models.Index(fields=['gym', 'join_date'], name='client_gym_join_idx'),
+            models.Index(fields=['gym', 'name'], name='client_gym_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -78,12 +131,63 @@ class Client(models.Model):
         if Client.objects.filter(phone=self.phone).exclude(pk=self.pk).exists():
             raise ValidationError({'phone': 'Este número de teléfono ya está registrado.'})
 
+    @staticmethod
+    def compute_subscription_status(subscription_end, today=None):
+        """Estado de la suscripción: expirada antes de hoy, por expirar dentro del margen configurado"""
+        from django.conf import settings
+        
+        today = today or timezone.localdate()
+        if subscription_end is None or subscription_end > today + timedelta(days=settings.SUBSCRIPTION_EXPIRING_DAYS):
+            return 'active'
+        if subscription_end < today:
+            return 'expired'
+        return 'expiring'
+
+    @classmethod
+    def refresh_subscription_statuses(cls, today=None):
+        """
+        Pasar a su estado actual los clientes cuyo estado ha cambiado con el paso de los días.
+        
+        Tres UPDATE por conjuntos (uno por estado destino), cada uno limitado a las
+        filas que cambian. Devuelve el número de clientes actualizados.
+        """
+        from django.conf import settings
+        
+        today = today or timezone.localdate()
+        expiring_until = today + timedelta(days=settings.SUBSCRIPTION_EXPIRING_DAYS)
+        targets = {
+            'expired': models.Q(subscription_end__lt=today),
+            'expiring': models.Q(subscription_end__gte=today, subscription_end__lte=expiring_until),
+            'active': models.Q(subscription_end__isnull=True) | models.Q(subscription_end__gt=expiring_until),
+        }
+        now = timezone.now()
+        updated = 0
+        with transaction.atomic():
+            for status, condition in targets.items():
+                updated += cls.objects.filter(condition).exclude(subscription_status=status).update(
+                    subscription_status=status, updated_at=now
+                )
+        return updated
+
     def save(self, *args, **kwargs):
         """Validar antes de guardar"""
         self.clean()
+        self.subscription_status = self.compute_subscription_status(self.subscription_end)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'subscription_end' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'subscription_status'}
         super().save(*args, **kwargs)
 
 
+@receiver([post_save, post_delete], sender=Gym)
+def clear_gym_host_cache(sender, instance, **kwargs):
+    """Olvidar la resolución cacheada del dominio (un dominio anterior caduca con TENANT_HOST_CACHE_TIMEOUT) y si hay un solo gimnasio"""
+    from django.core.cache import cache
+    from .tenancy import SINGLE_GYM_CACHE_KEY, host_cache_key
+    cache.delete(SINGLE_GYM_CACHE_KEY)
+    if instance.domain:
+        cache.delete(host_cache_key(instance.domain))
+
 @receiver(post_save, sender=User)
 def create_custom_user(sender, instance, created, **kwargs):
     """Crear automáticamente un CustomUser cuando se crea un User"""
@@ -118,10 +222,11 @@ def create_user_for_client(sender, instance, created, **kwargs):
         instance.user = user
         instance.save(update_fields=['user'])
         
-        # Asegurar que el CustomUser tenga el rol 'client'
+        # Asegurar que el CustomUser tenga el rol 'client' y el gimnasio del cliente
         custom_user, created = CustomUser.objects.get_or_create(user=user)
-        if custom_user.role != 'client':
+        if custom_user.role != 'client' or custom_user.gym_id != instance.gym_id:
             custom_user.role = 'client'
+            custom_user.gym_id = instance.gym_id
             custom_user.save()
 
 class Exercise(models.Model):
@@ -138,6 +243,34 @@ class Exercise(models.Model):
     instructions = models.JSONField(default=list)
     video_url = models.URLField(null=True, blank=True)
     image_url = models.URLField(null=True, blank=True)
+    gym = gym_field()
+    # Copias normalizadas con normalize_search para búsquedas sin acentos (índices de prefijo y trigramas)
+    search_name = models.CharField(max_length=100, default='', editable=False)
+    search_description = models.TextField(default='', editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # LIKE 'prefijo%' necesita varchar_pattern_ops si la base no usa la colación C
+            models.Index(fields=['gym', 'search_name'], name='exercise_gym_search_idx',
+                         opclasses=['int8_ops', 'varchar_pattern_ops']),
+            # Autocompletado sin gimnasio (superusuarios o instalación de un solo gimnasio)
+            models.Index(fields=['search_name'], name='exercise_search_prefix_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['gym', 'difficulty'], name='exercise_gym_difficulty_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_search(self.name)
+        self.search_description = normalize_search(self.description)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'name' in update_fields:
+                update_fields.add('search_name')
+            if 'description' in update_fields:
+                update_fields.add('search_description')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -159,6 +292,14 @@ class Workout(models.Model):
     estimated_duration = models.PositiveIntegerField()
     difficulty = models.CharField(max_length=20, choices=DIFFICULTY_CHOICES)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
+    gym = gym_field()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['gym', 'category'], name='workout_gym_category_idx'),
+            models.Index(fields=['gym', 'name'], name='workout_gym_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -170,6 +311,7 @@ class WorkoutSet(models.Model):
     weight = models.FloatField()
     rest_time = models.PositiveIntegerField()
     completed = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
 class Routine(models.Model):
     FREQUENCY_CHOICES = [
@@ -184,6 +326,14 @@ class Routine(models.Model):
     days_per_week = models.PositiveIntegerField()
     duration = models.PositiveIntegerField(help_text='Duration in weeks')
     scheduled_days = models.JSONField(default=list, null=True, blank=True)
+    gym = gym_field()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['gym', 'frequency'], name='routine_gym_frequency_idx'),
+            models.Index(fields=['gym', 'name'], name='routine_gym_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -195,6 +345,27 @@ class ClientRoutine(models.Model):
     end_date = models.DateField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
     assigned_days = models.JSONField(default=list)
+    # Copia de assigned_days como máscara de bits para filtrar por día con un predicado indexable
+    assigned_days_mask = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Copia del gimnasio del cliente para filtrar por tenant sin JOIN
+    gym = gym_field()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', 'assigned_days_mask'], name='clientroutine_active_days_idx'),
+            models.Index(fields=['gym', 'is_active', 'assigned_days_mask'], name='clientroutine_gym_active_idx'),
+            models.Index(fields=['client', 'updated_at'], name='clientroutine_client_upd_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.assigned_days_mask = weekday_mask(self.assigned_days)
+        if self.gym_id is None and self.client_id is not None:
+            self.gym_id = self.client.gym_id
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'assigned_days' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'assigned_days_mask', 'updated_at'}
+        super().save(*args, **kwargs)
 
 class RoutineProgress(models.Model):
     client_routine = models.ForeignKey(ClientRoutine, on_delete=models.CASCADE)
@@ -202,6 +373,135 @@ class RoutineProgress(models.Model):
     completed_at = models.DateTimeField()
     notes = models.TextField(null=True, blank=True)
     rating = models.PositiveIntegerField(null=True, blank=True)
+    # Clave generada por el dispositivo: reenviar la misma finalización no crea duplicados
+    idempotency_key = models.UUIDField(null=True, blank=True, unique=True)
+    # Copia del gimnasio de la asignación para filtrar por tenant sin JOIN
+    gym = gym_field()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['client_routine', 'updated_at'], name='routineprogress_upd_idx'),
+            models.Index(fields=['gym', '-completed_at'], name='routineprogress_gym_done_idx'),
+        ]
+
+    # Campos que cuentan en los rankings: al editarlos se descuentan los valores anteriores
+    LEADERBOARD_FIELDS = ('client_routine_id', 'completed_at', 'rating')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_leaderboard = tuple(instance.__dict__.get(name) for name in cls.LEADERBOARD_FIELDS)
+        return instance
+
+    def loaded_leaderboard_copy(self):
+        """Copia con los valores de los rankings tal como se cargaron (None si no se conocen)"""
+        loaded = getattr(self, '_loaded_leaderboard', None)
+        if loaded is None or loaded[1] is None:
+            return None
+        return RoutineProgress(pk=self.pk, gym_id=self.gym_id, **dict(zip(self.LEADERBOARD_FIELDS, loaded)))
+
+    def save(self, *args, **kwargs):
+        if self.gym_id is None and self.client_routine_id is not None:
+            self.gym_id = self.client_routine.gym_id
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def insert_new(cls, progresses, batch_size=200):
+        """
+        Insertar las finalizaciones cuya idempotency_key aún no existe.
+
+        Usa INSERT ... ON CONFLICT (idempotency_key) DO NOTHING RETURNING, que solo
+        devuelve las filas insertadas por esta sentencia: si un reenvío concurrente
+        gana la carrera, sus claves no aparecen aquí y no se cuentan dos veces. Como
+        bulk_create, no emite señales. Devuelve {idempotency_key: id}.
+        """
+        progresses = list(progresses)
+        for progress in progresses:
+            progress.updated_at = timezone.now()
+        fields = [cls._meta.get_field(name) for name in (
+            'client_routine', 'workout', 'completed_at', 'notes', 'rating', 'idempotency_key', 'gym', 'updated_at'
+        )]
+        key_field = cls._meta.get_field('idempotency_key')
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field.column) for field in fields)
+        row_sql = f"({', '.join(['%s'] * len(fields))})"
+
+        inserted = {}
+        with connection.cursor() as cursor:
+            for start in range(0, len(progresses), batch_size):
+                batch = progresses[start:start + batch_size]
+                params = [
+                    field.get_db_prep_save(getattr(progress, field.attname), connection)
+                    for progress in batch for field in fields
+                ]
+                cursor.execute(
+                    f"INSERT INTO {quote(cls._meta.db_table)} ({columns}) VALUES {', '.join([row_sql] * len(batch))} "
+                    f"ON CONFLICT ({quote(key_field.column)}) DO NOTHING "
+                    f"RETURNING {quote(cls._meta.pk.column)}, {quote(key_field.column)}",
+                    params
+                )
+                for pk, key in cursor.fetchall():
+                    inserted[key_field.to_python(key)] = pk
+        return inserted
+
+class RoutineAdherence(models.Model):
+    """Resumen de adherencia de una asignación: sesiones programadas frente a completadas"""
+    client_routine = models.OneToOneField(ClientRoutine, on_delete=models.CASCADE, related_name='adherence')
+    scheduled_sessions = models.PositiveIntegerField(default=0)
+    completed_sessions = models.PositiveIntegerField(default=0)
+    adherence_rate = models.FloatField(null=True, blank=True, help_text='Completadas / programadas (máximo 1)')
+    weekly = models.JSONField(default=list, help_text='Últimas semanas: week_start, scheduled, completed')
+    last_completed_at = models.DateTimeField(null=True, blank=True)
+    computed_on = models.DateField()
+
+    def __str__(self):
+        return f"{self.client_routine_id}: {self.completed_sessions}/{self.scheduled_sessions}"
+
+class LeaderboardEntry(models.Model):
+    """Contadores semanales de un cliente para los rankings, globales (sin rutina) o por rutina"""
+    week_start = models.DateField()
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    routine = models.ForeignKey(Routine, on_delete=models.CASCADE, null=True, blank=True)
+    workouts = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    average_rating = models.FloatField(null=True, blank=True)
+    # Copia del gimnasio del cliente: los rankings por gimnasio se leen por índice sin JOIN
+    gym = gym_field()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['week_start', 'client'], condition=models.Q(routine__isnull=True),
+                name='leaderboard_global_unique'
+            ),
+            models.UniqueConstraint(
+                fields=['week_start', 'routine', 'client'], condition=models.Q(routine__isnull=False),
+                name='leaderboard_routine_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['gym', 'week_start', 'routine', '-workouts'], name='leaderboard_gym_workouts_idx'),
+            models.Index(fields=['gym', 'week_start', 'routine', '-average_rating'], name='leaderboard_gym_rating_idx'),
+            # Rankings sin gimnasio (superusuarios o instalación de un solo gimnasio)
+            models.Index(fields=['week_start', 'routine', '-workouts'], name='leaderboard_workouts_idx'),
+            models.Index(fields=['week_start', 'routine', '-average_rating'], name='leaderboard_rating_idx'),
+        ]
+
+class ClientStreak(models.Model):
+    """Racha de semanas consecutivas con al menos un entrenamiento completado"""
+    client = models.OneToOneField(Client, on_delete=models.CASCADE, related_name='streak')
+    current_streak = models.PositiveIntegerField(default=0)
+    longest_streak = models.PositiveIntegerField(default=0)
+    last_week = models.DateField(null=True, blank=True, help_text='Lunes de la última semana con entrenamientos')
+    gym = gym_field()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['gym', '-current_streak', 'last_week'], name='clientstreak_gym_current_idx'),
+            models.Index(fields=['-current_streak', 'last_week'], name='clientstreak_current_idx'),
+        ]
 
 class ProgressMetrics(models.Model):
     client = models.ForeignKey(Client, on_delete=models.CASCADE)
@@ -211,6 +511,20 @@ class ProgressMetrics(models.Model):
     muscle_mass = models.FloatField(null=True, blank=True)
     measurements = models.JSONField(default=dict)
     photos = models.JSONField(default=list, null=True, blank=True)
+    # Copia del gimnasio del cliente para filtrar por tenant sin JOIN
+    gym = gym_field()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['client', 'updated_at'], name='progressmetrics_client_upd_idx'),
+            models.Index(fields=['gym', '-date'], name='progressmetrics_gym_date_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.gym_id is None and self.client_id is not None:
+            self.gym_id = self.client.gym_id
+        super().save(*args, **kwargs)
 
 class Goal(models.Model):
     CATEGORY_CHOICES = [
@@ -229,6 +543,269 @@ class Goal(models.Model):
     deadline = models.DateField()
     is_completed = models.BooleanField(default=False)
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
+    metric = models.CharField(
+        max_length=50, null=True, blank=True,
+        help_text='Métrica de progreso que actualiza current_value: weight, body_fat, muscle_mass o una clave de measurements'
+    )
+    start_value = models.FloatField(null=True, blank=True, help_text='Valor al crear el objetivo; indica si se busca subir o bajar')
+    # Copia del gimnasio del cliente para filtrar por tenant sin JOIN
+    gym = gym_field()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['client', 'updated_at'], name='goal_client_upd_idx'),
+            models.Index(fields=['gym', 'is_completed', 'deadline'], name='goal_gym_pending_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+    def is_reached(self, value):
+        """Si el valor cumple el objetivo (hacia abajo si se partió por encima del objetivo)"""
+        if self.start_value is not None and self.start_value > self.target_value:
+            return value <= self.target_value
+        return value >= self.target_value
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado al cargar, para publicar el evento solo cuando el objetivo pasa a cumplido
+        instance._loaded_is_completed = instance.__dict__.get('is_completed')
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self.start_value is None and self.current_value is not None:
+            self.start_value = self.current_value
+        if self.gym_id is None and self.client_id is not None:
+            self.gym_id = self.client.gym_id
+        super().save(*args, **kwargs)
+
+
+class DataVersion(models.Model):
+    """Contador de versión compartido entre workers para invalidar cachés derivadas de los datos"""
+    name = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+    @classmethod
+    def current(cls, name):
+        """Versión actual de un conjunto de datos (0 si nunca ha cambiado)"""
+        return cls.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls, name):
+        """Incrementar la versión de forma atómica"""
+        updated = cls.objects.filter(name=name).update(version=models.F('version') + 1)
+        if not updated:
+            cls.objects.get_or_create(name=name, defaults={'version': 1})
+
+
+class SyncTombstone(models.Model):
+    """Registro de un borrado para que la sincronización incremental lo propague a los dispositivos"""
+    model = models.CharField(max_length=50, help_text='Colección de /api/sync/ (goals, progress_metrics, ...)')
+    object_id = models.BigIntegerField()
+    client_id = models.BigIntegerField(null=True, blank=True, help_text='Cliente dueño del registro; vacío en el catálogo común')
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['client_id', 'deleted_at'], name='synctombstone_client_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model}:{self.object_id}"
+
+
+def tombstone_client_id(instance):
+    """Cliente al que pertenece un registro sincronizable (None para el catálogo común)"""
+    if isinstance(instance, Client):
+        return instance.pk
+    if isinstance(instance, RoutineProgress):
+        return ClientRoutine.objects.filter(pk=instance.client_routine_id).values_list('client_id', flat=True).first()
+    return getattr(instance, 'client_id', None)
+
+# Colección de /api/sync/ para cada modelo sincronizable
+SYNC_COLLECTIONS = {
+    Client: 'clients',
+    ClientRoutine: 'client_routines',
+    RoutineProgress: 'routine_progress',
+    ProgressMetrics: 'progress_metrics',
+    Goal: 'goals',
+    Routine: 'routines',
+    Workout: 'workouts',
+    WorkoutSet: 'workout_sets',
+    Exercise: 'exercises',
+}
+
+@receiver(post_delete)
+def record_sync_tombstone(sender, instance, **kwargs):
+    """Guardar una lápida al borrar un registro sincronizable"""
+    collection = SYNC_COLLECTIONS.get(sender)
+    if collection:
+        SyncTombstone.objects.create(
+            model=collection,
+            object_id=instance.pk,
+            client_id=tombstone_client_id(instance)
+        )
+
+@receiver(m2m_changed, sender=Routine.workouts.through)
+def touch_routine_workouts(sender, instance, action, reverse, pk_set, **kwargs):
+    """Marcar la rutina como modificada cuando cambian sus workouts"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        routine_ids = pk_set or []
+    else:
+        routine_ids = [instance.pk]
+    Routine.objects.filter(pk__in=routine_ids).update(updated_at=timezone.now())
+
+@receiver(post_save, sender=RoutineProgress)
+def refresh_routine_adherence(sender, instance, **kwargs):
+    """Actualizar la adherencia de la asignación cuando se registra un entrenamiento"""
+    from .analytics import refresh_adherence
+    refresh_adherence([instance.client_routine_id])
+
+@receiver(post_delete, sender=RoutineProgress)
+def refresh_routine_adherence_on_delete(sender, instance, **kwargs):
+    """Actualizar la adherencia tras eliminar un entrenamiento (al confirmar, por si se borra en cascada)"""
+    from .analytics import refresh_adherence
+    client_routine_id = instance.client_routine_id
+    transaction.on_commit(lambda: refresh_adherence([client_routine_id]))
+
+@receiver(post_save, sender=ProgressMetrics)
+def sync_client_goals(sender, instance, **kwargs):
+    """Actualizar los objetivos enlazados a métricas cuando se registra una medición"""
+    from .analytics import sync_goals
+    sync_goals(client_ids=[instance.client_id])
+
+@receiver(post_delete, sender=ProgressMetrics)
+def sync_client_goals_on_delete(sender, instance, **kwargs):
+    """Volver a la medición anterior tras eliminar una (al confirmar, por si se borra en cascada)"""
+    from .analytics import sync_goals
+    client_id = instance.client_id
+    transaction.on_commit(lambda: sync_goals(client_ids=[client_id]))
+
+@receiver(post_save, sender=Goal)
+def sync_linked_goal(sender, instance, **kwargs):
+    """Tomar el último valor de la métrica al crear o enlazar un objetivo"""
+    if instance.metric:
+        from .analytics import sync_goals
+        sync_goals(goal_ids=[instance.pk])
+
+@receiver(post_save, sender=RoutineProgress)
+def record_leaderboard_completion(sender, instance, created, **kwargs):
+    """
+    Actualizar contadores y racha del cliente en O(1) al registrar un entrenamiento.
+
+    Si se edita la fecha, la valoración o la asignación, se descuentan los valores
+    cargados y se suman los nuevos; la racha solo se recalcula si cambia la semana
+    o el cliente.
+    """
+    from .analytics import record_completions
+    from .analytics.leaderboards import week_start
+    current = tuple(getattr(instance, name) for name in RoutineProgress.LEADERBOARD_FIELDS)
+    previous = None if created else instance.loaded_leaderboard_copy()
+    if created:
+        record_completions([instance])
+    elif previous is not None and current != instance._loaded_leaderboard:
+        streaks = (
+            previous.client_routine_id != instance.client_routine_id
+            or week_start(previous.completed_at) != week_start(instance.completed_at)
+        )
+        record_completions([previous], sign=-1, streaks=streaks)
+        record_completions([instance], streaks=streaks)
+    instance._loaded_leaderboard = current
+
+@receiver(post_delete, sender=RoutineProgress)
+def remove_leaderboard_completion(sender, instance, **kwargs):
+    """Descontar el entrenamiento eliminado de los rankings con los valores guardados"""
+    from .analytics import record_completions
+    record_completions([instance.loaded_leaderboard_copy() or instance], sign=-1)
+
+@receiver(post_save, sender=RoutineProgress)
+def publish_workout_completed(sender, instance, created, **kwargs):
+    """Publicar un evento para los paneles de entrenadores al registrar un entrenamiento"""
+    if created:
+        from .events import publish
+        publish(
+            'workout_completed',
+            id=instance.pk,
+            gym_id=instance.gym_id,
+            client_id=instance.client_routine.client_id,
+            client_routine_id=instance.client_routine_id,
+            workout_id=instance.workout_id,
+            completed_at=instance.completed_at
+        )
+
+@receiver(post_save, sender=ProgressMetrics)
+def publish_progress_metrics(sender, instance, created, **kwargs):
+    """Publicar un evento al registrar nuevas métricas de progreso"""
+    if created:
+        from .events import publish
+        publish(
+            'progress_metrics',
+            id=instance.pk,
+            gym_id=instance.gym_id,
+            client_id=instance.client_id,
+            date=instance.date,
+            weight=instance.weight
+        )
+
+@receiver(post_save, sender=Goal)
+def publish_goal_completed(sender, instance, created, **kwargs):
+    """Publicar un evento cuando un objetivo pasa a cumplido"""
+    if instance.is_completed and getattr(instance, '_loaded_is_completed', False) is not True:
+        from .events import publish
+        publish(
+            'goal_completed', id=instance.pk, gym_id=instance.gym_id, client_id=instance.client_id, title=instance.title
+        )
+    instance._loaded_is_completed = instance.is_completed
+
+@receiver(post_save, sender=ClientRoutine)
+def refresh_assignment_adherence(sender, instance, **kwargs):
+    """Recalcular la adherencia cuando cambian los días o fechas de la asignación"""
+    from .analytics import refresh_adherence
+    refresh_adherence([instance.pk])
+
+@receiver([post_save, post_delete], sender=ProgressMetrics)
+@receiver([post_save, post_delete], sender=Client)
+@receiver([post_save, post_delete], sender=ClientRoutine)
+def bump_analytics_version(sender, instance, created=False, update_fields=None, **kwargs):
+    """
+    Invalidar las analíticas de cohortes del gimnasio cuando cambian métricas,
+    asignaciones o la cohorte de un cliente. El contador se incrementa al
+    confirmar, fuera de la transacción de la escritura, y es uno por gimnasio.
+    """
+    if sender is Client and not created and update_fields is not None \
+            and not {'subscription_type', 'join_date'} & set(update_fields):
+        return
+    from .analytics import version_name
+    name = version_name(instance.gym_id)
+    transaction.on_commit(lambda: DataVersion.bump(name))
+
+def apply_client_typeahead(client_id, *args, **kwargs):
+    """
+    Avisar al resto de workers con DataVersion y aplicar el cambio en el
+    typeahead de este. Se llama al confirmar, fuera de la transacción de la
+    escritura; el incremento va antes para que apply vea solo el nuestro.
+    """
+    from .typeahead import get_client_typeahead, VERSION_NAME
+    DataVersion.bump(VERSION_NAME)
+    get_client_typeahead().apply(client_id, *args, **kwargs)
+
+@receiver(post_save, sender=Client)
+def update_client_typeahead(sender, instance, created, update_fields=None, **kwargs):
+    """Mantener el typeahead de clientes de este worker y avisar al resto con DataVersion"""
+    if not created and update_fields is not None and not {'name', 'email', 'phone'} & set(update_fields):
+        return
+    client_id, name, email, phone, gym_id = instance.pk, instance.name, instance.email, instance.phone, instance.gym_id
+    transaction.on_commit(lambda: apply_client_typeahead(client_id, name, email, phone, gym_id=gym_id))
+
+@receiver(post_delete, sender=Client)
+def remove_client_typeahead(sender, instance, **kwargs):
+    """Quitar el cliente borrado del typeahead"""
+    client_id = instance.pk
+    transaction.on_commit(lambda: apply_client_typeahead(client_id, deleted=True))
@@ -0,0 +1,95 @@
+import hashlib
+from functools import cached_property, partial
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+
+class CountedPaginator(Paginator):
+    """Paginator de Django que obtiene el total con una función externa en lugar de COUNT(*)"""
+
+    def __init__(self, object_list, per_page, count_function=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_function = count_function
+
+    @cached_property
+    def count(self):
+        if self.count_function is None:
+            return super().count
+        return self.count_function()
+
+
+class CachedCountPagination(PageNumberPagination):
+    """
+    Paginación para listados muy grandes que evita un COUNT(*) exacto en cada página.
+
+    - Sin filtros (el queryset no tiene WHERE) y en PostgreSQL se usa la estimación
+      de filas de pg_class.reltuples cuando supera PAGINATION_ESTIMATE_THRESHOLD.
+    - En otro caso el total se cachea PAGINATION_COUNT_CACHE_TIMEOUT segundos con
+      una clave derivada de la consulta compilada sin orden ni página: los mismos
+      filtros en cualquier orden, y el mismo alcance por usuario, comparten entrada.
+
+    La respuesta incluye `count_exact`: False si el total es una estimación o viene
+    de la caché. Un ViewSet lo activa con `pagination_class = CachedCountPagination`.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count_exact = True
+        self.django_paginator_class = partial(CountedPaginator, count_function=partial(self.get_count, queryset))
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_count(self, queryset):
+        queryset = queryset.order_by()
+        if not queryset.query.where:
+            estimate = self.estimated_count(queryset)
+            if estimate is not None and estimate >= settings.PAGINATION_ESTIMATE_THRESHOLD:
+                self.count_exact = False
+                return estimate
+
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.sha256(repr((sql, params)).encode()).hexdigest()
+        cache_key = f"pagination:count:{queryset.model._meta.label_lower}:{digest}"
+        count = cache.get(cache_key)
+        if count is not None:
+            self.count_exact = False
+            return count
+
+        count = queryset.count()
+        cache.set(cache_key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def estimated_count(self, queryset):
+        """Filas estimadas de la tabla según las estadísticas de PostgreSQL (None si no hay)"""
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        # reltuples vale -1 si la tabla nunca se ha analizado
+        if row is None or row[0] is None or row[0] < 0:
+            return None
+        return row[0]
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'count_exact': self.count_exact,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['properties']['count_exact'] = {
+            'type': 'boolean',
+            'description': 'False si count es una estimación o un valor cacheado',
+        }
+        return schema
@@ -0,0 +1,15 @@
+from rest_framework.permissions import BasePermission
+
+
+class IsOwner(BasePermission):
+    """Permite el acceso solo a usuarios con rol 'owner' (o superusuarios)"""
+    message = 'Solo los dueños del gimnasio pueden acceder a este recurso.'
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not user or not user.is_authenticated:
+            return False
+        if user.is_superuser:
+            return True
+        profile = getattr(user, 'custom_profile', None)
+        return profile is not None and profile.role == 'owner'
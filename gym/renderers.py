@@ -0,0 +1,27 @@
+from rest_framework.renderers import BaseRenderer
+
+
+class StreamingRenderer(BaseRenderer):
+    """
+    Renderer de negociación para acciones que devuelven StreamingHttpResponse.
+
+    Permite usar `?format=csv` / `?format=ndjson` o el header Accept; el cuerpo
+    lo genera la vista fila a fila, así que render() no se usa para datos.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Solo se llega aquí para respuestas de error (p. ej. 404 o validación)
+        if data is None:
+            return b''
+        return str(data).encode(self.charset)
+
+
+class CSVStreamingRenderer(StreamingRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONStreamingRenderer(StreamingRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
@@ -0,0 +1,116 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+# Alias desde el que se leen las consultas de la petición en curso (None: el primario)
+_read_alias = ContextVar('gym_read_alias', default=None)
+
+# Cookie que mantiene las lecturas de un usuario en el primario justo después de escribir
+PRIMARY_COOKIE = 'gym_read_primary'
+
+
+def replica_alias():
+    """Alias de la réplica configurada, o None si no hay réplica"""
+    return settings.DATABASE_REPLICA or None
+
+
+def current_read_alias():
+    return _read_alias.get()
+
+
+def is_pinned(request):
+    """Si el usuario escribió hace menos de REPLICA_STICKY_SECONDS y debe leer del primario"""
+    return PRIMARY_COOKIE in request.COOKIES
+
+
+def pin_to_primary(response):
+    """Marcar la respuesta de una escritura para que las siguientes lecturas vean lo escrito"""
+    response.set_cookie(
+        PRIMARY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax'
+    )
+
+
+def should_use_replica(request):
+    return replica_alias() is not None and request.method in SAFE_METHODS and not is_pinned(request)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Enviar a la réplica las lecturas hechas dentro del bloque (las escrituras siguen en el primario)"""
+    token = _read_alias.set(replica_alias() if enabled else None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def replica_read_view(view):
+    """Decorador para vistas de función de solo lectura (p. ej. estadísticas) que pueden leer de la réplica"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads(should_use_replica(request)):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """
+    Router de lecturas hacia la réplica (settings.DATABASE_REPLICA).
+
+    Solo se lee de la réplica dentro de replica_reads(), que activan los ViewSets
+    con ReplicaReadViewSetMixin y las vistas con replica_read_view en peticiones
+    GET/HEAD/OPTIONS de usuarios que no han escrito recientemente. Las escrituras
+    van siempre al primario, también las de objetos leídos de la réplica, y las
+    migraciones nunca se aplican en la réplica.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == replica_alias():
+            return False
+        return None
+
+
+class ReplicaReadViewSetMixin:
+    """
+    Resuelve en la réplica las peticiones de lectura de un ViewSet (listados,
+    detalle y acciones GET como las estadísticas). El queryset se fija con
+    .using() para que los listados que se consumen después de la vista
+    (exportaciones en streaming) también lean de la réplica.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads(should_use_replica(request)):
+            return super().dispatch(request, *args, **kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        alias = current_read_alias()
+        return queryset.using(alias) if alias is not None else queryset
+
+
+class ReplicaStickinessMiddleware:
+    """Tras una escritura con éxito, fija las lecturas del usuario al primario durante REPLICA_STICKY_SECONDS"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if replica_alias() is not None and request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(response)
+        return response
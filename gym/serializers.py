@@ -1,14 +1,34 @@
+import re
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from .models import (
     Client, Exercise, Workout, WorkoutSet, Routine, 
-    ClientRoutine, RoutineProgress, ProgressMetrics, Goal
+    ClientRoutine, RoutineProgress, ProgressMetrics, Goal, RoutineAdherence, WEEKDAYS
 )
+from .services import get_presigned_url, unsign_url
+
+
+class PresignedURLField(serializers.URLField):
+    """
+    URL de un archivo en S3 que se devuelve prefirmada (y cacheada) cuando el bucket es privado.
+
+    Al escribir se quita la firma de las URLs de nuestro bucket: un cliente que
+    reenvía lo que leyó guarda la URL estable y no una que caduca (y que además
+    supera el max_length del campo).
+    """
+
+    def to_representation(self, value):
+        return get_presigned_url(super().to_representation(value))
+
+    def to_internal_value(self, data):
+        return unsign_url(super().to_internal_value(data))
 
 class ExerciseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Exercise
-        fields = '__all__'
+        # Las columnas normalizadas solo sirven para buscar
+        exclude = ['search_name', 'search_description']
 
 class WorkoutSetSerializer(serializers.ModelSerializer):
     exercise = ExerciseSerializer(read_only=True)
@@ -49,11 +69,17 @@ class ClientSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
     default_password = serializers.SerializerMethodField()
     age = serializers.ReadOnlyField()
+    profile_image = PresignedURLField(max_length=200, required=False, allow_null=True, allow_blank=True)
+    adherence_rate = serializers.SerializerMethodField()
 
     class Meta:
         model = Client
         fields = '__all__'
 
+    def get_adherence_rate(self, obj):
+        """Adherencia media de las rutinas activas (anotada en el queryset del listado)"""
+        return getattr(obj, 'adherence_rate', None)
+
     def get_default_password(self, obj):
         """Retorna la contraseña por defecto generada"""
         if obj.user:
@@ -120,11 +146,11 @@ class ClientRoutineSerializer(serializers.ModelSerializer):
             return selected_days
         elif isinstance(value, list):
             # Validar que todos los elementos sean días válidos
-            valid_days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
             for day in value:
-                if day not in valid_days:
-                    raise serializers.ValidationError(f"Día inválido: {day}. Días válidos: {', '.join(valid_days)}")
-            return value
+                if day not in WEEKDAYS:
+                    raise serializers.ValidationError(f"Día inválido: {day}. Días válidos: {', '.join(WEEKDAYS)}")
+            # Sin duplicados y en orden de semana, igual que assigned_days_mask (se calcula al guardar)
+            return [day for day in WEEKDAYS if day in value]
         else:
             raise serializers.ValidationError("assigned_days debe ser una lista de días o un objeto con valores booleanos")
 
@@ -153,6 +179,18 @@ class ClientRoutineSerializer(serializers.ModelSerializer):
         
         return data
 
+class ClientRoutineRosterSerializer(serializers.ModelSerializer):
+    """Versión ligera de la asignación para el listado diario de entrenamientos"""
+    client_name = serializers.CharField(source='client.name', read_only=True)
+    routine_name = serializers.CharField(source='routine.name', read_only=True)
+
+    class Meta:
+        model = ClientRoutine
+        fields = [
+            'id', 'client_id', 'client_name', 'routine_id', 'routine_name',
+            'start_date', 'end_date', 'assigned_days'
+        ]
+
 class RoutineProgressSerializer(serializers.ModelSerializer):
     client_routine = ClientRoutineSerializer(read_only=True)
     workout = WorkoutSerializer(read_only=True)
@@ -171,6 +209,27 @@ class RoutineProgressSerializer(serializers.ModelSerializer):
         model = RoutineProgress
         fields = ['id', 'client_routine', 'client_routine_id', 'workout', 'workout_id', 'completed_at', 'notes', 'rating']
 
+class RoutineAdherenceSerializer(serializers.ModelSerializer):
+    client_routine_id = serializers.IntegerField(read_only=True)
+    client_id = serializers.IntegerField(source='client_routine.client_id', read_only=True)
+    routine_id = serializers.IntegerField(source='client_routine.routine_id', read_only=True)
+
+    class Meta:
+        model = RoutineAdherence
+        fields = [
+            'client_routine_id', 'client_id', 'routine_id', 'scheduled_sessions', 'completed_sessions',
+            'adherence_rate', 'weekly', 'last_completed_at', 'computed_on'
+        ]
+
+class WorkoutCompletionSerializer(serializers.Serializer):
+    """Finalización enviada por un dispositivo en la carga masiva (sin consultas a la base de datos)"""
+    idempotency_key = serializers.UUIDField()
+    client_routine_id = serializers.IntegerField()
+    workout_id = serializers.IntegerField()
+    completed_at = serializers.DateTimeField(required=False)
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    rating = serializers.IntegerField(required=False, allow_null=True, min_value=0)
+
 class ProgressMetricsSerializer(serializers.ModelSerializer):
     client = ClientSerializer(read_only=True)
     client_id = serializers.PrimaryKeyRelatedField(
@@ -178,6 +237,7 @@ class ProgressMetricsSerializer(serializers.ModelSerializer):
         source='client',
         write_only=True
     )
+    photos = serializers.ListField(child=PresignedURLField(), required=False, allow_null=True)
 
     class Meta:
         model = ProgressMetrics
@@ -195,6 +255,12 @@ class GoalSerializer(serializers.ModelSerializer):
         model = Goal
         fields = '__all__'
 
+    def validate_metric(self, value):
+        """Validar que la métrica sea una columna de progreso o una clave simple de measurements"""
+        if value and not re.fullmatch(r'[A-Za-z0-9_]+', value):
+            raise serializers.ValidationError("metric solo admite letras, números y guiones bajos.")
+        return value or None
+
 # Serializers para crear/actualizar con relaciones
 class WorkoutSetCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -248,7 +314,7 @@ class RoutineCreateSerializer(serializers.ModelSerializer):
         
         for workout_data in workouts_data:
             sets_data = workout_data.pop('sets')
-            workout = Workout.objects.create(**workout_data)
+            workout = Workout.objects.create(gym_id=routine.gym_id, **workout_data)
             
             # Agregar el workout a la rutina usando la relación many-to-many
             routine.workouts.add(workout)
@@ -274,7 +340,7 @@ class RoutineCreateSerializer(serializers.ModelSerializer):
             # Crear nuevos workouts
             for workout_data in workouts_data:
                 sets_data = workout_data.pop('sets')
-                workout = Workout.objects.create(**workout_data)
+                workout = Workout.objects.create(gym_id=instance.gym_id, **workout_data)
                 
                 # Agregar el workout a la rutina
                 instance.workouts.add(workout)
@@ -296,6 +362,16 @@ class UserProfileSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'date_joined', 'last_login', 'role']
 
+class GymTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Tokens JWT con el claim gym_id del usuario, para resolver el gimnasio sin consultas"""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        profile = getattr(user, 'custom_profile', None)
+        token['gym_id'] = profile.gym_id if profile is not None else None
+        return token
+
 class ProfileImageUploadSerializer(serializers.Serializer):
     """Serializer para subida de imagen de perfil"""
-    profile_image = serializers.ImageField() 
\ No newline at end of file
+    profile_image = serializers.ImageField()
\ No newline at end of file
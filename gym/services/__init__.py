@@ -1,4 +1,12 @@
 from .s3_service import S3Service
-from .file_utils import upload_file_to_s3, delete_file_from_s3, generate_unique_filename
+from .file_utils import (
+    upload_file_to_s3, upload_files_to_s3, delete_file_from_s3, generate_unique_filename
+)
+from .upload_handlers import S3MultipartUploadHandler, S3UploadedFile
+from .presigned_urls import PresignedURLCache, get_presigned_url, get_presigned_url_cache, unsign_url
 
-__all__ = ['S3Service', 'upload_file_to_s3', 'delete_file_from_s3', 'generate_unique_filename']
\ No newline at end of file
+__all__ = [
+    'S3Service', 'upload_file_to_s3', 'upload_files_to_s3', 'delete_file_from_s3', 'generate_unique_filename',
+    'S3MultipartUploadHandler', 'S3UploadedFile',
+    'PresignedURLCache', 'get_presigned_url', 'get_presigned_url_cache', 'unsign_url'
+]
\ No newline at end of file
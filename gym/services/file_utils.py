@@ -1,9 +1,14 @@
 import uuid
 import os
-from typing import Optional
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Tuple
+from django.conf import settings
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from .s3_service import S3Service
 
+logger = logging.getLogger(__name__)
+
 
 def generate_unique_filename(original_filename: str, prefix: str = "") -> str:
     """Generate unique filename with UUID"""
@@ -29,18 +34,39 @@ def upload_file_to_s3(file: InMemoryUploadedFile, folder: str = "uploads") -> Op
     return file_url
 
 
+def upload_files_to_s3(files: List[InMemoryUploadedFile], folder: str = "uploads",
+                       max_workers: int = None) -> List[Tuple[InMemoryUploadedFile, Optional[str]]]:
+    """Upload several files concurrently and return (file, URL) pairs in input order"""
+    if not files:
+        return []
+
+    # boto3 clients are thread-safe, so every worker shares the same one
+    s3_service = S3Service()
+    max_workers = min(max_workers or settings.MEDIA_UPLOAD_MAX_WORKERS, len(files))
+
+    def _upload(file):
+        filename = generate_unique_filename(file.name, f"{folder}/")
+        try:
+            return s3_service.upload_file(
+                file_obj=file,
+                key=filename,
+                content_type=file.content_type
+            )
+        except Exception as e:
+            logger.error(f"Error uploading {file.name} to S3: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        urls = list(executor.map(_upload, files))
+
+    return list(zip(files, urls))
+
+
 def delete_file_from_s3(file_url: str) -> bool:
     """Delete file from S3 using URL"""
-    s3_service = S3Service()
-    
-    # Extract key from URL
-    if file_url:
-        # Handle both custom domain and S3 URLs
-        if s3_service.bucket_name in file_url:
-            key = file_url.split(f"{s3_service.bucket_name}/")[-1]
-        else:
-            key = file_url.split("/")[-1]
-        
-        return s3_service.delete_file(key)
+    # Only delete objects that live in our bucket
+    key = S3Service.get_key_from_url(file_url)
+    if key:
+        return S3Service().delete_file(key)
     
     return False
\ No newline at end of file
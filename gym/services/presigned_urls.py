@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from django.conf import settings
+from .s3_service import S3Service
+
+
+class PresignedURLCache:
+    """
+    LRU cache of presigned GET URLs keyed by object key.
+
+    Each entry is reissued once it gets within `refresh_margin` seconds of its
+    expiry, so callers never receive a URL that is about to stop working while
+    repeated reads of the same object skip the HMAC signing entirely.
+    """
+
+    def __init__(self, max_size: int, expiration: int, refresh_margin: int):
+        self.max_size = max_size
+        self.expiration = expiration
+        self.refresh_margin = min(refresh_margin, expiration // 2)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._s3_service = None
+
+    def _get_s3_service(self) -> S3Service:
+        if self._s3_service is None:
+            self._s3_service = S3Service()
+        return self._s3_service
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a presigned URL for `key`, signing a new one only when needed"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] - self.refresh_margin > now:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        url = self._get_s3_service().generate_presigned_url(key, expiration=self.expiration)
+        if not url:
+            return None
+
+        with self._lock:
+            self._entries[key] = (url, now + self.expiration)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return url
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_presigned_url_cache() -> PresignedURLCache:
+    """Return the per-process presigned URL cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = PresignedURLCache(
+                    max_size=settings.AWS_PRESIGNED_URL_CACHE_SIZE,
+                    expiration=settings.AWS_PRESIGNED_URL_EXPIRATION,
+                    refresh_margin=settings.AWS_PRESIGNED_URL_REFRESH_MARGIN
+                )
+    return _cache
+
+
+def get_presigned_url(file_url: Optional[str]) -> Optional[str]:
+    """Return a readable URL for a stored media URL (presigned when the bucket is private)"""
+    if not file_url or not settings.AWS_QUERYSTRING_AUTH:
+        return file_url
+
+    key = S3Service.get_key_from_url(file_url)
+    if not key:
+        # External URL, not stored in our bucket
+        return file_url
+
+    return get_presigned_url_cache().get(key) or file_url
+
+
+def unsign_url(file_url: Optional[str]) -> Optional[str]:
+    """Return the stored form of a URL from our bucket, dropping any presigned query string"""
+    if not file_url or not S3Service.get_key_from_url(file_url):
+        return file_url
+    return file_url.split('?', 1)[0]
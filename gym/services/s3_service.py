@@ -1,8 +1,9 @@
 import boto3
 import os
+from urllib.parse import unquote
 from django.conf import settings
 from botocore.exceptions import ClientError
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator, List, Union
 import logging
 
 logger = logging.getLogger(__name__)
@@ -46,6 +47,65 @@ class S3Service:
             logger.error(f"Error uploading file to S3: {e}")
             return None
 
+    def create_multipart_upload(self, key: str, content_type: str = None) -> Optional[str]:
+        """Start a multipart upload and return its UploadId"""
+        try:
+            extra_args = {}
+            if content_type:
+                extra_args['ContentType'] = content_type
+
+            response = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=key,
+                **extra_args
+            )
+            return response['UploadId']
+        except ClientError as e:
+            logger.error(f"Error starting multipart upload to S3: {e}")
+            return None
+
+    def upload_part(self, key: str, upload_id: str, part_number: int, data: Union[bytes, bytearray]) -> Optional[str]:
+        """Upload a single part of a multipart upload and return its ETag"""
+        try:
+            response = self.s3_client.upload_part(
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=data
+            )
+            return response['ETag']
+        except ClientError as e:
+            logger.error(f"Error uploading part {part_number} to S3: {e}")
+            return None
+
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: list) -> Optional[str]:
+        """Complete a multipart upload and return the file URL"""
+        try:
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+            return self.get_file_url(key)
+        except ClientError as e:
+            logger.error(f"Error completing multipart upload to S3: {e}")
+            return None
+
+    def abort_multipart_upload(self, key: str, upload_id: str) -> bool:
+        """Abort a multipart upload, discarding the parts already stored"""
+        try:
+            self.s3_client.abort_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id
+            )
+            return True
+        except ClientError as e:
+            logger.error(f"Error aborting multipart upload to S3: {e}")
+            return False
+
     def delete_file(self, key: str) -> bool:
         """Delete file from S3 bucket"""
         try:
@@ -55,6 +115,31 @@ class S3Service:
             logger.error(f"Error deleting file from S3: {e}")
             return False
 
+    def iter_objects(self, prefix: str = "") -> Iterator[Dict[str, Any]]:
+        """Stream the bucket listing page by page (1000 objects per request)"""
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                yield obj
+
+    def delete_files(self, keys: List[str]) -> List[str]:
+        """Delete up to 1000 objects in a single request and return the keys that failed"""
+        if not keys:
+            return []
+        try:
+            response = self.s3_client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+            )
+        except ClientError as e:
+            logger.error(f"Error deleting files from S3: {e}")
+            return list(keys)
+
+        errors = response.get('Errors', [])
+        for error in errors:
+            logger.error(f"Error deleting {error.get('Key')} from S3: {error.get('Message')}")
+        return [error['Key'] for error in errors]
+
     def get_file_url(self, key: str) -> str:
         """Get file URL"""
         if settings.AWS_S3_CUSTOM_DOMAIN:
@@ -66,6 +151,28 @@ class S3Service:
         
         return f"https://{self.bucket_name}.s3.{settings.AWS_S3_REGION_NAME}.amazonaws.com/{key}"
 
+    @staticmethod
+    def get_key_from_url(file_url: str) -> Optional[str]:
+        """Extract the object key from a URL built by get_file_url, or None if it is not ours"""
+        bucket_name = settings.AWS_STORAGE_BUCKET_NAME
+        if not file_url or not bucket_name:
+            return None
+
+        prefixes = []
+        if settings.AWS_S3_CUSTOM_DOMAIN:
+            prefixes.append(f"{settings.AWS_S3_CUSTOM_DOMAIN}/{bucket_name}/")
+        if hasattr(settings, 'AWS_S3_ENDPOINT_URL') and settings.AWS_S3_ENDPOINT_URL:
+            prefixes.append(f"{settings.AWS_S3_ENDPOINT_URL}/{bucket_name}/")
+        prefixes.append(f"https://{bucket_name}.s3.{settings.AWS_S3_REGION_NAME}.amazonaws.com/")
+        prefixes.append(f"https://{bucket_name}.s3.amazonaws.com/")
+
+        # Ignore any query string (e.g. an already presigned URL)
+        path = file_url.split('?', 1)[0]
+        for prefix in prefixes:
+            if path.startswith(prefix):
+                return unquote(path[len(prefix):]) or None
+        return None
+
     def generate_presigned_url(self, key: str, expiration: int = 3600) -> Optional[str]:
         """Generate presigned URL for file access"""
         try:
@@ -0,0 +1,151 @@
+import logging
+from typing import Iterable, Optional
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import (
+    FileUploadHandler, SkipFile, StopFutureHandlers, StopUpload
+)
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+from .s3_service import S3Service
+from .file_utils import generate_unique_filename
+
+logger = logging.getLogger(__name__)
+
+# S3 rejects parts smaller than 5 MB (except the last one)
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+# Slack allowed for multipart boundaries and headers when checking CONTENT_LENGTH
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class S3UploadedFile(UploadedFile):
+    """File already stored in S3; exposes its key and URL instead of content"""
+
+    def __init__(self, name, key, url, content_type, size, charset=None, content_type_extra=None):
+        super().__init__(None, name, content_type, size, charset, content_type_extra)
+        self.key = key
+        self.url = url
+
+    def open(self, mode=None):
+        raise ValueError("S3UploadedFile content lives in S3 and cannot be reopened locally")
+
+    def close(self):
+        pass
+
+
+class S3MultipartUploadHandler(FileUploadHandler):
+    """
+    Stream request chunks directly into an S3 multipart upload.
+
+    Only one part (AWS_S3_MULTIPART_PART_SIZE bytes) is buffered at a time, so
+    memory per upload stays constant regardless of the file size. Size and
+    content type limits are checked before the body is read whenever possible.
+    """
+
+    def __init__(self, request=None, folder: str = "uploads", max_size: Optional[int] = None,
+                 allowed_types: Optional[Iterable[str]] = None):
+        super().__init__(request)
+        self.folder = folder
+        self.max_size = max_size or settings.MEDIA_UPLOAD_MAX_SIZE
+        self.allowed_types = set(allowed_types) if allowed_types else None
+        self.part_size = max(settings.AWS_S3_MULTIPART_PART_SIZE, MIN_PART_SIZE)
+        self.s3_service = None
+        self.error = None
+        self._reset()
+
+    def _reset(self):
+        self.key = None
+        self.upload_id = None
+        self.parts = []
+        self.buffer = bytearray()
+        self.received = 0
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Reject oversized requests before reading a single byte of the body
+        if content_length and content_length > self.max_size + MULTIPART_OVERHEAD:
+            self.error = 'too_large'
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None,
+                 content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+
+        if self.allowed_types is not None and content_type not in self.allowed_types:
+            self.error = 'invalid_type'
+            raise SkipFile()
+
+        if content_length is not None and content_length > self.max_size:
+            self.error = 'too_large'
+            raise StopUpload(connection_reset=True)
+
+        if self.s3_service is None:
+            self.s3_service = S3Service()
+
+        self.key = generate_unique_filename(file_name, f"{self.folder}/")
+        self.upload_id = self.s3_service.create_multipart_upload(self.key, content_type)
+        if not self.upload_id:
+            self.error = 'storage'
+            raise StopUpload(connection_reset=True)
+
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_size:
+            self.error = 'too_large'
+            self.abort()
+            raise StopUpload(connection_reset=True)
+
+        self.buffer.extend(raw_data)
+        if len(self.buffer) >= self.part_size:
+            self._flush_part()
+        return None
+
+    def _flush_part(self):
+        part_number = len(self.parts) + 1
+        # Hand the filled buffer over as-is and start a fresh one, so the part is never copied
+        part, self.buffer = self.buffer, bytearray()
+        etag = self.s3_service.upload_part(self.key, self.upload_id, part_number, part)
+        if not etag:
+            self.error = 'storage'
+            self.abort()
+            raise StopUpload(connection_reset=True)
+        self.parts.append({'PartNumber': part_number, 'ETag': etag})
+
+    def file_complete(self, file_size):
+        if not self.upload_id:
+            return None
+
+        # The last part may be smaller than MIN_PART_SIZE; an empty file still needs one part
+        if self.buffer or not self.parts:
+            self._flush_part()
+
+        url = self.s3_service.complete_multipart_upload(self.key, self.upload_id, self.parts)
+        if not url:
+            self.error = 'storage'
+            self.abort()
+            return None
+
+        uploaded = S3UploadedFile(
+            name=self.file_name,
+            key=self.key,
+            url=url,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra
+        )
+        self._reset()
+        return uploaded
+
+    def upload_interrupted(self):
+        self.abort()
+
+    def abort(self):
+        """Abort the in-flight multipart upload, if any. Safe to call more than once."""
+        if self.upload_id:
+            logger.info(f"Aborting multipart upload for {self.key}")
+            self.s3_service.abort_multipart_upload(self.key, self.upload_id)
+        self._reset()
@@ -0,0 +1,95 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from .models import (
+    Client, Exercise, Workout, WorkoutSet, Routine,
+    ClientRoutine, RoutineProgress, ProgressMetrics, Goal, SyncTombstone
+)
+from .services import get_presigned_url
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_token(moment):
+    """Token opaco de sincronización: microsegundos desde epoch"""
+    return str((moment - EPOCH) // timedelta(microseconds=1))
+
+
+def decode_token(token):
+    """Fecha representada por un token; ValueError si no es válido"""
+    try:
+        return EPOCH + timedelta(microseconds=int(token))
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"token inválido: {token}")
+
+
+def changes_since(client, since=None):
+    """
+    Registros de un cliente modificados o borrados después de `since`.
+
+    Sin `since` (o con un token más antiguo que la retención de lápidas) se
+    devuelve todo y `full` es True: el dispositivo debe reemplazar sus datos.
+    El catálogo (rutinas, workouts, sets y ejercicios) se limita a lo asignado
+    al cliente; una rutina recién asignada o modificada se envía completa.
+    """
+    now = timezone.now()
+    retention = timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    full = since is None or since < now - retention
+
+    def delta(queryset, forced_ids=()):
+        if full:
+            return queryset
+        return queryset.filter(Q(updated_at__gt=since) | Q(pk__in=forced_ids))
+
+    assignments = ClientRoutine.objects.filter(client=client)
+    routines = Routine.objects.filter(pk__in=assignments.values('routine_id'))
+    # Rutinas con cambios propios o en su asignación: su árbol se envía completo
+    changed_routines = set(delta(routines, delta(assignments).values('routine_id')).values_list('pk', flat=True))
+
+    routine_workouts = Routine.workouts.through.objects.filter(routine__in=routines)
+    workouts = Workout.objects.filter(pk__in=routine_workouts.values('workout_id'))
+    changed_workouts = set(delta(
+        workouts, routine_workouts.filter(routine_id__in=changed_routines).values('workout_id')
+    ).values_list('pk', flat=True))
+
+    sets = WorkoutSet.objects.filter(workout__in=workouts)
+    changed_sets = delta(sets, sets.filter(workout_id__in=changed_workouts).values('pk'))
+    exercises = Exercise.objects.filter(pk__in=sets.values('exercise_id'))
+
+    changes = {
+        'clients': list(delta(Client.objects.filter(pk=client.pk)).values()),
+        'client_routines': list(delta(assignments).values()),
+        'routine_progress': list(delta(RoutineProgress.objects.filter(client_routine__client=client)).values()),
+        'progress_metrics': list(delta(ProgressMetrics.objects.filter(client=client)).values()),
+        'goals': list(delta(Goal.objects.filter(client=client)).values()),
+        'routines': list(Routine.objects.filter(pk__in=changed_routines).values()),
+        'routine_workouts': list(
+            routine_workouts.filter(routine_id__in=changed_routines).values('routine_id', 'workout_id')
+        ),
+        'workouts': list(Workout.objects.filter(pk__in=changed_workouts).values()),
+        'workout_sets': list(changed_sets.values()),
+        'exercises': list(delta(exercises, changed_sets.values('exercise_id')).values()),
+    }
+
+    for row in changes['clients']:
+        row['profile_image'] = get_presigned_url(row['profile_image'])
+    for row in changes['progress_metrics']:
+        row['photos'] = [get_presigned_url(url) for url in row['photos'] or []]
+
+    deleted = defaultdict(list)
+    if not full:
+        tombstones = SyncTombstone.objects.filter(deleted_at__gt=since).filter(
+            Q(client_id=client.pk) | Q(client_id__isnull=True)
+        ).values_list('model', 'object_id')
+        for model, object_id in tombstones:
+            deleted[model].append(object_id)
+
+    return {
+        # Solapamiento para no perder filas confirmadas con una marca de tiempo anterior
+        'token': encode_token(now - timedelta(seconds=settings.SYNC_TOKEN_OVERLAP)),
+        'full': full,
+        'changes': changes,
+        'deleted': dict(deleted),
+    }
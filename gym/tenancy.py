@@ -0,0 +1,163 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import QuerySet
+from django_filters import rest_framework as filters
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import serializers
+from rest_framework.exceptions import NotAuthenticated, PermissionDenied
+from .models import Gym
+
+
+def has_gym(model):
+    """Si el modelo pertenece a un gimnasio (tiene la FK `gym`)"""
+    return any(field.name == 'gym' for field in model._meta.concrete_fields)
+
+
+def scope_queryset(queryset, gym_id, gym_field='gym'):
+    """Limitar un queryset al gimnasio indicado (sin gimnasio no se filtra)"""
+    if gym_id is None:
+        return queryset
+    return queryset.filter(**{f'{gym_field}_id': gym_id})
+
+
+def host_cache_key(host):
+    return f'tenancy:host:{host}'
+
+
+def gym_id_for_host(host):
+    """Gimnasio cuyo dominio es `host`; se cachea también la ausencia (0) para no consultar en cada petición"""
+    cache_key = host_cache_key(host)
+    gym_id = cache.get(cache_key)
+    if gym_id is None:
+        gym_id = Gym.objects.filter(domain=host).values_list('id', flat=True).first() or 0
+        cache.set(cache_key, gym_id, settings.TENANT_HOST_CACHE_TIMEOUT)
+    return gym_id or None
+
+
+SINGLE_GYM_CACHE_KEY = 'tenancy:single-gym'
+
+
+def single_gym():
+    """Si la instalación tiene como mucho un gimnasio; se cachea y se olvida al crear o borrar gimnasios"""
+    single = cache.get(SINGLE_GYM_CACHE_KEY)
+    if single is None:
+        single = Gym.objects.all()[:2].count() <= 1
+        cache.set(SINGLE_GYM_CACHE_KEY, single, settings.TENANT_HOST_CACHE_TIMEOUT)
+    return single
+
+
+def allows_unscoped(user):
+    """
+    Si `user` puede trabajar sin gimnasio, es decir, sobre los datos de todos.
+
+    Solo los superusuarios o cualquiera en una instalación de un solo gimnasio:
+    con varios, un anónimo o un miembro del personal sin gimnasio vería los
+    datos de todos.
+    """
+    return bool(user is not None and user.is_superuser) or single_gym()
+
+
+def user_gym_id(user):
+    """Gimnasio del usuario según su CustomUser (None para anónimos y personal sin gimnasio)"""
+    if user is None or not user.is_authenticated:
+        return None
+    profile = getattr(user, 'custom_profile', None)
+    return profile.gym_id if profile is not None else None
+
+
+def resolve_gym(request):
+    """
+    Id del gimnasio (tenant) de una petición ya autenticada.
+
+    Se toma el claim `gym_id` del JWT (firmado al emitir el token, sin consultas)
+    o, si no lo hay, el gimnasio del usuario. Si el host coincide con el dominio
+    de un gimnasio manda el host, y un usuario de otro gimnasio recibe 403 (los
+    superusuarios pueden entrar en cualquiera). None significa sin tenant y no se
+    filtra nada: solo se devuelve a superusuarios o en una instalación de un solo
+    gimnasio; si no, un anónimo recibe 401 y el personal sin gimnasio 403.
+    """
+    user = getattr(request, 'user', None)
+    token = getattr(request, 'auth', None)
+    if token is not None and hasattr(token, 'payload') and 'gym_id' in token:
+        gym_id = token['gym_id']
+    else:
+        gym_id = user_gym_id(user)
+
+    host_gym_id = gym_id_for_host(request.get_host().split(':')[0])
+    if host_gym_id is None:
+        if gym_id is None and not allows_unscoped(user):
+            if user is None or not user.is_authenticated:
+                raise NotAuthenticated()
+            raise PermissionDenied('El usuario no pertenece a ningún gimnasio.')
+        return gym_id
+    if gym_id is not None and gym_id != host_gym_id and not user.is_superuser:
+        raise PermissionDenied('El usuario no pertenece a este gimnasio.')
+    return host_gym_id
+
+
+def scope_related_fields(serializer, gym_id):
+    """Restringir los campos relacionados (también anidados) a objetos del gimnasio"""
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    for field in serializer.fields.values():
+        if isinstance(field, serializers.ManyRelatedField):
+            field = field.child_relation
+        if isinstance(field, serializers.BaseSerializer):
+            scope_related_fields(field, gym_id)
+        elif isinstance(field, serializers.RelatedField) and field.queryset is not None and has_gym(field.queryset.model):
+            field.queryset = field.queryset.filter(gym_id=gym_id)
+
+
+class GymScopedViewSetMixin:
+    """
+    Limita un ViewSet al gimnasio de la petición (request.gym_id).
+
+    get_queryset filtra por `gym_field` ('workout__gym' para modelos sin gimnasio
+    propio), las altas se guardan en el gimnasio y los campos relacionados del
+    serializer solo aceptan objetos del mismo gimnasio. Las acciones deben partir
+    de self.get_queryset() y no de self.queryset.
+    """
+    gym_field = 'gym'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        request.gym_id = resolve_gym(request)
+
+    def get_queryset(self):
+        return scope_queryset(super().get_queryset(), getattr(self.request, 'gym_id', None), self.gym_field)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        gym_id = getattr(self.request, 'gym_id', None)
+        if gym_id is not None:
+            scope_related_fields(serializer, gym_id)
+        return serializer
+
+    def perform_create(self, serializer):
+        gym_id = getattr(self.request, 'gym_id', None)
+        if gym_id is not None and self.gym_field == 'gym':
+            serializer.save(gym_id=gym_id)
+        else:
+            serializer.save()
+
+
+class GymScopedFilterSet(filters.FilterSet):
+    """FilterSet que limita al gimnasio de la petición su queryset y las opciones de sus filtros de modelo"""
+
+    def __init__(self, data=None, queryset=None, *, request=None, **kwargs):
+        gym_id = getattr(request, 'gym_id', None)
+        if gym_id is not None and queryset is not None and has_gym(queryset.model):
+            queryset = scope_queryset(queryset, gym_id)
+        super().__init__(data, queryset, request=request, **kwargs)
+        if gym_id is None:
+            return
+        for filter_ in self.filters.values():
+            # ModelChoiceFilter y ModelMultipleChoiceFilter guardan sus opciones en `queryset`
+            choices = getattr(filter_, 'queryset', None)
+            if isinstance(choices, QuerySet) and has_gym(choices.model):
+                filter_.queryset = scope_queryset(choices, gym_id)
+
+
+class GymFilterBackend(DjangoFilterBackend):
+    """DjangoFilterBackend cuyos FilterSets generados con filterset_fields también se limitan al gimnasio"""
+    filterset_base = GymScopedFilterSet
@@ -1,4 +1,7 @@
-from django.test import TestCase
+from unittest import skipUnless
+from django.conf import settings
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import date
@@ -254,3 +257,1902 @@ class ClientRoutineValidationTest(TestCase):
         serializer = ClientRoutineSerializer(data=data)
         self.assertFalse(serializer.is_valid())
         self.assertIn('assigned_days', serializer.errors)
+
+
+class ProfileImageStreamingUploadTest(TestCase):
+    """Test para verificar la subida en streaming de la imagen de perfil a S3"""
+
+    def setUp(self):
+        from unittest.mock import patch
+        from rest_framework.test import APIClient
+
+        self.client_obj = Client.objects.create(
+            name="Ana Torres",
+            email="ana.torres@test.com",
+            phone="+1234500001",
+            birth_date=date(1992, 3, 10),
+            weight=60.0,
+            height=165.0,
+            join_date=date.today()
+        )
+        self.api = APIClient()
+        patcher = patch('gym.services.upload_handlers.S3Service')
+        self.s3 = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.s3.create_multipart_upload.return_value = 'upload-1'
+        self.s3.upload_part.return_value = '"etag-1"'
+        self.s3.complete_multipart_upload.return_value = 'https://bucket.s3.amazonaws.com/profiles/foto.png'
+
+    def _upload(self, content, content_type='image/png'):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        image = SimpleUploadedFile('foto.png', content, content_type=content_type)
+        return self.api.post(
+            f'/api/clients/{self.client_obj.id}/upload_profile_image/',
+            {'profile_image': image},
+            format='multipart'
+        )
+
+    def test_upload_streams_parts_and_saves_url(self):
+        """Test que la imagen se envía como multipart upload y se guarda la URL"""
+        response = self._upload(b'x' * 1024)
+
+        self.assertEqual(response.status_code, 200)
+        self.s3.upload_part.assert_called_once()
+        # El buffer de la parte se entrega sin copiar y el handler no lo vuelve a tocar
+        self.assertEqual(self.s3.upload_part.call_args.args[3], b'x' * 1024)
+        self.s3.complete_multipart_upload.assert_called_once()
+        self.s3.abort_multipart_upload.assert_not_called()
+        self.client_obj.refresh_from_db()
+        self.assertEqual(self.client_obj.profile_image, 'https://bucket.s3.amazonaws.com/profiles/foto.png')
+
+    def test_upload_over_limit_is_aborted(self):
+        """Test que una subida que supera el límite se aborta y responde 413"""
+        with self.settings(PROFILE_IMAGE_MAX_SIZE=512):
+            response = self._upload(b'x' * 100 * 1024)
+
+        self.assertEqual(response.status_code, 413)
+        self.s3.complete_multipart_upload.assert_not_called()
+        self.client_obj.refresh_from_db()
+        self.assertIsNone(self.client_obj.profile_image)
+
+    def test_upload_rejects_invalid_content_type(self):
+        """Test que un tipo de archivo no permitido no llega a S3"""
+        response = self._upload(b'%PDF-1.4', content_type='application/pdf')
+
+        self.assertEqual(response.status_code, 400)
+        self.s3.create_multipart_upload.assert_not_called()
+
+
+class ProgressPhotosUploadTest(TestCase):
+    """Test para verificar la subida concurrente de fotos de progreso"""
+
+    def test_photos_are_uploaded_and_appended(self):
+        """Test que las fotos válidas se suben y se añaden a la métrica con resultado por archivo"""
+        from unittest.mock import patch
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from rest_framework.test import APIClient
+        from .models import ProgressMetrics
+
+        client = Client.objects.create(
+            name="Luis Rojas",
+            email="luis.rojas@test.com",
+            phone="+1234500002",
+            birth_date=date(1988, 7, 1),
+            weight=82.0,
+            height=180.0,
+            join_date=date.today()
+        )
+        metrics = ProgressMetrics.objects.create(
+            client=client, date=date.today(), weight=82.0, photos=['https://old/photo.png']
+        )
+
+        files = [
+            SimpleUploadedFile('front.png', b'front', content_type='image/png'),
+            SimpleUploadedFile('notes.txt', b'text', content_type='text/plain'),
+            SimpleUploadedFile('side.jpg', b'side', content_type='image/jpeg'),
+        ]
+        with patch('gym.services.file_utils.S3Service') as s3_class:
+            s3_class.return_value.upload_file.side_effect = lambda file_obj, key, content_type: f'https://bucket/{key}'
+            response = APIClient().post(
+                f'/api/progress-metrics/{metrics.id}/photos/', {'photos': files}, format='multipart'
+            )
+
+        self.assertEqual(response.status_code, 207)
+        results = response.data['results']
+        self.assertEqual([result['file'] for result in results], ['front.png', 'notes.txt', 'side.jpg'])
+        self.assertIsNone(results[0]['error'])
+        self.assertIsNotNone(results[1]['error'])
+        self.assertIsNone(results[2]['error'])
+        self.assertEqual(s3_class.return_value.upload_file.call_count, 2)
+
+        metrics.refresh_from_db()
+        self.assertEqual(len(metrics.photos), 3)
+        self.assertEqual(metrics.photos[0], 'https://old/photo.png')
+        self.assertTrue(all(url.startswith('https://bucket/progress/') for url in metrics.photos[1:]))
+
+
+class PresignedURLCacheTest(TestCase):
+    """Test para verificar la caché de URLs prefirmadas"""
+
+    def test_cache_reuses_and_refreshes_signatures(self):
+        """Test que la misma clave se firma una sola vez y se renueva antes de expirar"""
+        from unittest.mock import patch
+        from .services import PresignedURLCache
+
+        cache = PresignedURLCache(max_size=2, expiration=3600, refresh_margin=300)
+        with patch('gym.services.presigned_urls.S3Service') as s3_class, \
+                patch('gym.services.presigned_urls.time.monotonic') as monotonic:
+            s3 = s3_class.return_value
+            s3.generate_presigned_url.side_effect = lambda key, expiration: f'https://signed/{key}?n={s3.generate_presigned_url.call_count}'
+            monotonic.return_value = 1000.0
+
+            first = cache.get('profiles/a.png')
+            for _ in range(20):
+                self.assertEqual(cache.get('profiles/a.png'), first)
+            self.assertEqual(s3.generate_presigned_url.call_count, 1)
+
+            # Dentro del margen de renovación se emite una URL nueva
+            monotonic.return_value = 1000.0 + 3600 - 299
+            self.assertNotEqual(cache.get('profiles/a.png'), first)
+            self.assertEqual(s3.generate_presigned_url.call_count, 2)
+
+            # LRU: al superar max_size se descarta la clave menos usada
+            cache.get('profiles/b.png')
+            cache.get('profiles/c.png')
+            cache.get('profiles/a.png')
+            self.assertEqual(s3.generate_presigned_url.call_count, 5)
+
+    def test_key_is_extracted_only_from_bucket_urls(self):
+        """Test que solo se firman URLs de nuestro bucket"""
+        from .services import S3Service
+
+        with self.settings(AWS_STORAGE_BUCKET_NAME='gym-media', AWS_S3_CUSTOM_DOMAIN=None,
+                           AWS_S3_ENDPOINT_URL=None, AWS_S3_REGION_NAME='us-east-1'):
+            self.assertEqual(
+                S3Service.get_key_from_url('https://gym-media.s3.us-east-1.amazonaws.com/profiles/a%20b.png'),
+                'profiles/a b.png'
+            )
+            self.assertIsNone(S3Service.get_key_from_url('https://cdn.example.com/profiles/a.png'))
+
+    def test_presigned_urls_are_stored_unsigned(self):
+        """Test que una URL prefirmada reenviada por el cliente se guarda sin firma"""
+        from .serializers import ClientSerializer, ProgressMetricsSerializer
+
+        stored = 'https://gym-media.s3.us-east-1.amazonaws.com/profiles/a.png'
+        signed = stored + '?X-Amz-Algorithm=AWS4-HMAC-SHA256&X-Amz-Signature=' + 'f' * 300
+        with self.settings(AWS_STORAGE_BUCKET_NAME='gym-media', AWS_S3_CUSTOM_DOMAIN=None,
+                           AWS_S3_ENDPOINT_URL=None, AWS_S3_REGION_NAME='us-east-1'):
+            serializer = ClientSerializer(data={'profile_image': signed}, partial=True)
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            self.assertEqual(serializer.validated_data['profile_image'], stored)
+
+            serializer = ProgressMetricsSerializer(
+                data={'photos': [signed, 'https://cdn.example.com/a.png?v=2']}, partial=True
+            )
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+            self.assertEqual(serializer.validated_data['photos'], [stored, 'https://cdn.example.com/a.png?v=2'])
+
+
+class GcMediaCommandTest(TestCase):
+    """Test para verificar el recolector de media huérfana"""
+
+    @staticmethod
+    def _object(key, age_hours):
+        from datetime import timedelta
+        return {'Key': key, 'LastModified': timezone.now() - timedelta(hours=age_hours)}
+
+    def test_only_old_unreferenced_objects_are_deleted(self):
+        """Test que solo se eliminan objetos no referenciados y con antigüedad suficiente"""
+        from io import StringIO
+        from unittest.mock import patch
+        from django.core.management import call_command
+        from .models import ProgressMetrics
+        from .services import S3Service
+
+        base = 'https://gym-media.s3.us-east-1.amazonaws.com/'
+        with self.settings(AWS_STORAGE_BUCKET_NAME='gym-media', AWS_S3_CUSTOM_DOMAIN=None,
+                           AWS_S3_ENDPOINT_URL=None, AWS_S3_REGION_NAME='us-east-1'):
+            client = Client.objects.create(
+                name="Eva Ruiz",
+                email="eva.ruiz@test.com",
+                phone="+1234500003",
+                birth_date=date(1995, 2, 2),
+                weight=58.0,
+                height=160.0,
+                join_date=date.today(),
+                profile_image=f'{base}profiles/keep.png'
+            )
+            ProgressMetrics.objects.create(
+                client=client, date=date.today(), weight=58.0, photos=[f'{base}progress/keep.png']
+            )
+
+            listing = {
+                'profiles/': [self._object('profiles/keep.png', 48), self._object('profiles/orphan.png', 48)],
+                'progress/': [self._object('progress/keep.png', 48), self._object('progress/recent.png', 1)],
+            }
+            with patch.object(S3Service, '__init__', return_value=None), \
+                    patch.object(S3Service, 'iter_objects', side_effect=lambda prefix: iter(listing.get(prefix, []))), \
+                    patch.object(S3Service, 'delete_files', return_value=[]) as delete_files:
+                call_command('gc_media', '--dry-run', stdout=StringIO())
+                delete_files.assert_not_called()
+
+                call_command('gc_media', stdout=StringIO())
+                delete_files.assert_called_once_with(['profiles/orphan.png'])
+
+
+class ClientExportTest(TestCase):
+    """Test para verificar las exportaciones en streaming de clientes"""
+
+    def setUp(self):
+        for i, subscription in enumerate(['premium', 'standard', 'premium']):
+            Client.objects.create(
+                name=f"Cliente {i}",
+                email=f"cliente{i}@test.com",
+                phone=f"+12345100{i:02d}",
+                birth_date=date(1990, 1, 1),
+                weight=70.0,
+                height=170.0,
+                join_date=date.today(),
+                subscription_type=subscription
+            )
+
+    def test_csv_export_applies_filters(self):
+        """Test que el CSV se genera en streaming y respeta los filtros del listado"""
+        from rest_framework.test import APIClient
+
+        response = APIClient().get('/api/clients/export/', {'format': 'csv', 'subscription_type': 'premium'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().strip().splitlines()
+        self.assertTrue(lines[0].startswith('id,name,email'))
+        self.assertEqual(len(lines), 3)
+
+    def test_ndjson_credentials_export(self):
+        """Test que las credenciales se exportan como NDJSON con una línea por cliente"""
+        import json
+        from rest_framework.test import APIClient
+
+        with self.assertNumQueries(1):
+            response = APIClient().get('/api/clients/export_credentials/', {'format': 'ndjson'})
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row['username'] for row in rows}, {f"cliente{i}@test.com" for i in range(3)})
+
+
+@skipUnless(connection.vendor == 'postgresql', 'date_trunc y funciones de ventana requieren PostgreSQL')
+class ProgressTimeseriesTest(TestCase):
+    """Test para verificar la serie temporal agregada de métricas"""
+
+    def test_weekly_points_with_moving_average_and_deltas(self):
+        """Test que las métricas se agrupan por semana con media móvil y variaciones"""
+        from rest_framework.test import APIClient
+        from .models import ProgressMetrics
+
+        client = Client.objects.create(
+            name="Sara Gil",
+            email="sara.gil@test.com",
+            phone="+1234500004",
+            birth_date=date(1991, 4, 4),
+            weight=70.0,
+            height=168.0,
+            join_date=date(2024, 1, 1)
+        )
+        # Dos mediciones la semana del 1 de enero y una la semana siguiente
+        for day, weight, waist in [(1, 70.0, 80), (3, 69.0, 'n/a'), (8, 68.0, 78)]:
+            ProgressMetrics.objects.create(
+                client=client, date=date(2024, 1, day), weight=weight, measurements={'waist': waist}
+            )
+
+        api = APIClient()
+        response = api.get('/api/progress-metrics/timeseries/', {'client_id': client.id, 'bucket': 'week', 'window': 2})
+        self.assertEqual(response.status_code, 200)
+        points = response.data['points']
+        self.assertEqual([p['value'] for p in points], [69.5, 68.0])
+        self.assertEqual(points[0]['samples'], 2)
+        self.assertIsNone(points[0]['delta'])
+        self.assertEqual(points[1]['delta'], -1.5)
+        self.assertEqual(points[1]['moving_avg'], 68.75)
+
+        response = api.get('/api/progress-metrics/timeseries/', {'client_id': client.id, 'metric': 'waist'})
+        self.assertEqual([p['value'] for p in response.data['points']], [80.0, 78.0])
+
+
+class CohortAnalyticsTest(TestCase):
+    """Test para verificar las analíticas de cohortes sobre las medidas corporales"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .models import ProgressMetrics
+
+        cache.clear()
+        self.owner = User.objects.create_user(username="owner", password="ownerpass")
+        self.owner.custom_profile.role = 'owner'
+        self.owner.custom_profile.save()
+
+        # Cambio de cintura a 12 semanas: premium -4 y -6, standard -1
+        for i, (subscription, start, later) in enumerate([('premium', 90, 86), ('premium', 100, 94), ('standard', 95, 94)]):
+            client = Client.objects.create(
+                name=f"Cohorte {i}",
+                email=f"cohorte{i}@test.com",
+                phone=f"+12345200{i:02d}",
+                birth_date=date(1990, 1, 1),
+                weight=80.0,
+                height=175.0,
+                join_date=date(2024, 1, 1),
+                subscription_type=subscription
+            )
+            ProgressMetrics.objects.create(client=client, date=date(2024, 1, 1), weight=80.0, measurements={'waist': start})
+            ProgressMetrics.objects.create(client=client, date=date(2024, 2, 1), weight=79.0, measurements={'waist': start - 1})
+            ProgressMetrics.objects.create(client=client, date=date(2024, 3, 26), weight=78.0, measurements={'waist': later})
+
+    def test_waist_change_by_subscription(self):
+        """Test que el cambio medio de cintura se calcula por tipo de suscripción"""
+        from rest_framework.test import APIClient
+
+        api = APIClient()
+        api.force_authenticate(self.owner)
+        response = api.get('/api/analytics/cohorts/', {'metric': 'waist', 'weeks': 12})
+
+        self.assertEqual(response.status_code, 200)
+        cohorts = {c['cohort']: c for c in response.data['cohorts']}
+        self.assertEqual(cohorts['premium']['clients'], 2)
+        self.assertEqual(cohorts['premium']['mean_change'], -5.0)
+        self.assertEqual(cohorts['premium']['min_change'], -6.0)
+        self.assertEqual(cohorts['standard']['mean_change'], -1.0)
+
+    def test_results_are_cached_by_data_version(self):
+        """Test que los resultados se reutilizan hasta que cambian los datos"""
+        from .analytics import cohort_statistics
+        from .models import ProgressMetrics
+
+        first = cohort_statistics(metric='weight', weeks=12)
+        with self.assertNumQueries(1):
+            self.assertEqual(cohort_statistics(metric='weight', weeks=12), first)
+
+        # Editar el nombre de un cliente no cambia sus cohortes
+        client = Client.objects.get(email="cohorte0@test.com")
+        client.name = "Cohorte renombrada"
+        with self.captureOnCommitCallbacks(execute=True):
+            client.save(update_fields=['name'])
+        self.assertEqual(cohort_statistics(metric='weight', weeks=12)['data_version'], first['data_version'])
+
+        # El contador se incrementa al confirmar, no dentro de la transacción de la escritura
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            ProgressMetrics.objects.filter(weight=78.0).first().delete()
+        self.assertEqual(cohort_statistics(metric='weight', weeks=12)['data_version'], first['data_version'])
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(cohort_statistics(metric='weight', weeks=12)['data_version'], first['data_version'])
+
+    def test_only_owners_can_access(self):
+        """Test que los usuarios sin rol owner reciben 403"""
+        from rest_framework.test import APIClient
+
+        guest = User.objects.create_user(username="guest", password="guestpass")
+        api = APIClient()
+        api.force_authenticate(guest)
+
+
+class RoutineAdherenceTest(TestCase):
+    """Test para verificar el cálculo de adherencia de las rutinas asignadas"""
+
+    def setUp(self):
+        from datetime import datetime
+        from .models import Routine, ClientRoutine, RoutineProgress, Workout
+
+        self.client_obj = Client.objects.create(
+            name="Adherencia",
+            email="adherencia@test.com",
+            phone="+1234530000",
+            birth_date=date(1990, 1, 1),
+            weight=80.0,
+            height=175.0,
+            join_date=date(2024, 1, 1)
+        )
+        routine = Routine.objects.create(
+            name="Full body", description="Rutina", frequency="weekly", days_per_week=3, duration=2
+        )
+        workout = Workout.objects.create(
+            name="Día A", description="Workout", estimated_duration=60, difficulty="beginner", category="strength"
+        )
+        # Dos semanas (lunes 1 a domingo 14 de enero) en lunes, miércoles y viernes: 6 sesiones
+        self.assignment = ClientRoutine.objects.create(
+            client=self.client_obj,
+            routine=routine,
+            start_date=date(2024, 1, 1),
+            end_date=date(2024, 1, 14),
+            assigned_days=['monday', 'wednesday', 'friday']
+        )
+        for day in (3, 5, 10):
+            RoutineProgress.objects.create(
+                client_routine=self.assignment,
+                workout=workout,
+                completed_at=timezone.make_aware(datetime(2024, 1, day, 12))
+            )
+
+    def test_scheduled_and_completed_sessions(self):
+        """Test que se cuentan las sesiones programadas y completadas por semana"""
+        from .analytics import refresh_adherence
+        from .models import RoutineAdherence
+
+        refresh_adherence([self.assignment.pk], today=date(2024, 2, 1))
+        adherence = RoutineAdherence.objects.get(client_routine=self.assignment)
+
+        self.assertEqual(adherence.scheduled_sessions, 6)
+        self.assertEqual(adherence.completed_sessions, 3)
+        self.assertEqual(adherence.adherence_rate, 0.5)
+        weeks = {week['week_start']: week for week in adherence.weekly}
+        self.assertEqual(weeks['2024-01-01'], {'week_start': '2024-01-01', 'scheduled': 3, 'completed': 2})
+        self.assertEqual(weeks['2024-01-08'], {'week_start': '2024-01-08', 'scheduled': 3, 'completed': 1})
+        self.assertEqual(weeks['2024-01-29']['scheduled'], 0)
+
+    def test_assignment_without_days_has_no_rate(self):
+        """Test que una asignación sin días asignados no tiene tasa de adherencia"""
+        from .analytics import compute_adherence
+
+        summary = compute_adherence([(1, date(2024, 1, 1), None, 0)], today=date(2024, 2, 1))
+        self.assertEqual(summary[1]['scheduled_sessions'], 0)
+        self.assertIsNone(summary[1]['adherence_rate'])
+
+    def test_clients_sortable_by_adherence(self):
+        """Test que el listado de clientes expone y ordena por adherence_rate"""
+        from rest_framework.test import APIClient
+
+        user = User.objects.create_user(username="staff", password="staffpass")
+        api = APIClient()
+        api.force_authenticate(user)
+        response = api.get('/api/clients/', {'ordering': 'adherence_rate'})
+
+        self.assertEqual(response.status_code, 200)
+        rates = {c['id']: c['adherence_rate'] for c in response.data['results']}
+        self.assertIsNotNone(rates[self.client_obj.id])
+
+
+class ClientFacetsTest(TestCase):
+    """Test para verificar los conteos por opción de filtro del listado de clientes"""
+
+    def setUp(self):
+        from datetime import timedelta
+        from rest_framework.test import APIClient
+        from .models import Routine, ClientRoutine
+
+        today = date.today()
+        routine = Routine.objects.create(
+            name="Rutina", description="Rutina", frequency="weekly", days_per_week=3, duration=4
+        )
+        clients = [
+            ("Premium", 'premium', today + timedelta(days=10), date(2024, 1, 1)),
+            ("Standard", 'standard', today - timedelta(days=1), date(2024, 1, 1)),
+            ("Nuevo", 'premium', None, today),
+        ]
+        for index, (name, subscription_type, subscription_end, join_date) in enumerate(clients):
+            client = Client.objects.create(
+                name=name,
+                email=f"facetas{index}@test.com",
+                phone=f"+12345720{index}",
+                birth_date=date(1990, 1, 1),
+                weight=70.0,
+                height=170.0,
+                join_date=join_date,
+                subscription_type=subscription_type,
+                subscription_end=subscription_end
+            )
+            if index == 0:
+                # Dos asignaciones activas no deben contar dos veces
+                for _ in range(2):
+                    ClientRoutine.objects.create(client=client, routine=routine, start_date=today)
+        self.api = APIClient()
+        self.api.force_authenticate(User.objects.create_user(username="facetas", password="facetaspass"))
+
+    def test_facets_match_filtered_counts(self):
+        """Test que cada faceta coincide con el total del listado filtrado por esa opción"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as plain:
+            self.api.get('/api/clients/', {'filter': 'premium'})
+        with CaptureQueriesContext(connection) as faceted:
+            response = self.api.get('/api/clients/', {'filter': 'premium', 'facets': 1})
+        self.assertEqual(len(faceted), len(plain) + 1)
+
+        facets = response.data['facets']
+        self.assertEqual(response.data['count'], 2)
+        for choice, count in facets.items():
+            listed = self.api.get('/api/clients/', {'filter': choice}).data['count']
+            self.assertEqual(count, listed, choice)
+        self.assertEqual(facets['with-routines'], 1)
+
+    def test_facets_respect_other_filters(self):
+        """Test que las facetas se calculan sobre el resto de filtros activos"""
+        response = self.api.get('/api/clients/', {'subscription_type': 'premium', 'facets': 'true'})
+        facets = response.data['facets']
+        self.assertEqual((facets['all'], facets['premium'], facets['standard'], facets['new']), (2, 2, 0, 1))
+
+
+class RelationshipFilterSemiJoinTest(TestCase):
+    """Test para verificar que los filtros por relaciones usan EXISTS en lugar de JOIN + DISTINCT"""
+
+    def setUp(self):
+        from .models import Routine, ClientRoutine, Workout
+
+        self.clients = [
+            Client.objects.create(
+                name=f"Semi {index}",
+                email=f"semi{index}@test.com",
+                phone=f"+12345730{index}",
+                birth_date=date(1990, 1, 1),
+                weight=70.0,
+                height=170.0,
+                join_date=date(2024, 1, 1)
+            )
+            for index in range(3)
+        ]
+        self.routine = Routine.objects.create(
+            name="Rutina", description="Rutina", frequency="weekly", days_per_week=3, duration=4
+        )
+        self.routine.workouts.set([
+            Workout.objects.create(
+                name=f"Día {category}", description="Workout", estimated_duration=60,
+                difficulty="beginner", category=category
+            )
+            for category in ("strength", "cardio")
+        ])
+        Routine.objects.create(name="Vacía", description="Sin workouts", frequency="weekly", days_per_week=1, duration=1)
+        for _ in range(2):
+            ClientRoutine.objects.create(client=self.clients[0], routine=self.routine, start_date=date(2024, 1, 1))
+        ClientRoutine.objects.create(
+            client=self.clients[1], routine=self.routine, start_date=date(2024, 1, 1), is_active=False
+        )
+
+    def querysets(self):
+        from .filters import ClientFilter, RoutineFilter
+        from .models import Routine
+
+        return {
+            'with-routines': ClientFilter({'filter': 'with-routines'}, queryset=Client.objects.all()).qs,
+            'without-routines': ClientFilter({'filter': 'without-routines'}, queryset=Client.objects.all()).qs,
+            'has_routines': ClientFilter({'has_routines': 'true'}, queryset=Client.objects.all()).qs,
+            'workout_categories': RoutineFilter(
+                {'workout_categories': 'strength,cardio'}, queryset=Routine.objects.all()
+            ).qs,
+        }
+
+    def test_filters_compile_to_exists_without_distinct(self):
+        """Test que la SQL usa EXISTS, no DISTINCT, y no duplica filas"""
+        querysets = self.querysets()
+        for name, queryset in querysets.items():
+            sql = str(queryset.query).upper()
+            self.assertIn('EXISTS', sql, name)
+            self.assertNotIn('DISTINCT', sql, name)
+
+        self.assertEqual(list(querysets['with-routines']), [self.clients[0]])
+        self.assertEqual(list(querysets['has_routines']), [self.clients[0]])
+        self.assertEqual(set(querysets['without-routines']), set(self.clients[1:]))
+        self.assertEqual(list(querysets['workout_categories']), [self.routine])
+
+    @skipUnless(connection.vendor == 'postgresql', 'El plan de EXPLAIN es específico de PostgreSQL')
+    def test_plans_use_semi_joins_on_indexed_foreign_keys(self):
+        """Test que PostgreSQL resuelve los filtros con semi/anti-joins sobre índices de claves foráneas"""
+        with connection.cursor() as cursor:
+            # Con tablas tan pequeñas el planificador preferiría recorridos secuenciales
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        for name, queryset in self.querysets().items():
+            plan = queryset.explain()
+            # EXISTS se resuelve como join (semi/anti join o agregando antes la tabla relacionada), no como SubPlan por fila
+            self.assertNotIn('SubPlan', plan, name)
+            self.assertRegex(plan, r'(Semi|Anti) Join|Group Key: u0\.(client|routine)_id', name)
+            # La tabla relacionada se lee por índice (de la clave foránea o del filtro is_active)
+            self.assertRegex(plan, r'Index (Only )?Scan (using|on) \S*(client|routine)', name)
+            self.assertNotIn('Unique', plan, name)
+
+
+class CombinedCountFilterTest(TestCase):
+    """Test para verificar que los filtros de conteo combinados no inflan los totales"""
+
+    def test_workout_and_client_counts_combined(self):
+        """Test que min/max de workouts y clientes juntos cuentan cada relación por separado"""
+        from .filters import RoutineFilter, WorkoutFilter
+        from .models import Routine, ClientRoutine, Workout, WorkoutSet, Exercise
+
+        routine = Routine.objects.create(
+            name="Rutina", description="Rutina", frequency="weekly", days_per_week=3, duration=4
+        )
+        workouts = [
+            Workout.objects.create(
+                name=f"Día {index}", description="Workout", estimated_duration=60,
+                difficulty="beginner", category="strength"
+            )
+            for index in range(2)
+        ]
+        routine.workouts.set(workouts)
+        for index in range(3):
+            client = Client.objects.create(
+                name=f"Conteo {index}",
+                email=f"conteo{index}@test.com",
+                phone=f"+12345740{index}",
+                birth_date=date(1990, 1, 1),
+                weight=70.0,
+                height=170.0,
+                join_date=date(2024, 1, 1)
+            )
+            ClientRoutine.objects.create(client=client, routine=routine, start_date=date(2024, 1, 1))
+        exercise = Exercise.objects.create(name="Sentadilla", description="Piernas", difficulty="beginner")
+        for reps in (10, 8):
+            WorkoutSet.objects.create(workout=workouts[0], exercise=exercise, reps=reps, weight=40, rest_time=60)
+
+        params = {'min_workouts': 2, 'max_workouts': 2, 'min_clients': 3, 'max_clients': 3, 'workout_count': 2}
+        queryset = RoutineFilter(params, queryset=Routine.objects.all()).qs
+        self.assertEqual(list(queryset), [routine])
+        self.assertEqual((queryset[0].workout_count, queryset[0].client_count), (2, 3))
+        # Una anotación por relación, sin JOIN ni GROUP BY en la consulta principal
+        self.assertEqual(set(queryset.query.annotations), {'workout_count', 'client_count'})
+        self.assertIsNone(queryset.query.group_by)
+        self.assertNotIn('JOIN', str(queryset.query).upper())
+
+        workouts_qs = WorkoutFilter({'exercise_count': 1}, queryset=Workout.objects.all()).qs
+        self.assertEqual(list(workouts_qs), [workouts[0]])
+        empty = RoutineFilter({'workout_count': 0}, queryset=Routine.objects.all()).qs
+        self.assertFalse(empty.exists())
+
+
+class ExerciseSearchTest(TestCase):
+    """Test para verificar la búsqueda sin acentos y el autocompletado de ejercicios"""
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from .models import Exercise
+
+        for name, description in [
+            ("Extensión de cuádriceps", "Aislamiento en máquina"),
+            ("Sentadillas", "Trabaja cuádriceps y glúteos"),
+            ("Press de Banca", "Pecho y tríceps"),
+            ("Cuádriceps en polea", "Variante con cable"),
+        ]:
+            Exercise.objects.create(name=name, description=description, difficulty="beginner")
+        self.api = APIClient()
+        self.api.force_authenticate(User.objects.create_user(username="buscador", password="buscadorpass"))
+
+    def test_search_ignores_accents_and_ranks_name_matches_first(self):
+        """Test que 'CUADRICEPS' encuentra todas las variantes y prioriza el nombre"""
+        response = self.api.get('/api/exercises/search/', {'q': 'CUADRICEPS'})
+        self.assertEqual(response.status_code, 200)
+        names = [exercise['name'] for exercise in response.data['results']]
+        self.assertEqual(names, ["Cuádriceps en polea", "Extensión de cuádriceps", "Sentadillas"])
+        self.assertNotIn('search_name', response.data['results'][0])
+
+        response = self.api.get('/api/exercises/', {'search': 'triceps'})
+        self.assertEqual([exercise['name'] for exercise in response.data['results']], ["Press de Banca"])
+
+    def test_autocomplete_by_prefix(self):
+        """Test que el autocompletado devuelve nombres por prefijo y se actualiza al renombrar"""
+        from .models import Exercise
+
+        response = self.api.get('/api/exercises/autocomplete/', {'q': 'cuá'})
+        self.assertEqual([s['name'] for s in response.data], ["Cuádriceps en polea"])
+
+        exercise = Exercise.objects.get(name="Sentadillas")
+        exercise.name = "Cuadriceps búlgaro"
+        exercise.save(update_fields=['name'])
+        response = self.api.get('/api/exercises/autocomplete/', {'q': 'Cuadri', 'limit': 1})
+        self.assertEqual([s['name'] for s in response.data], ["Cuadriceps búlgaro"])
+
+        self.assertEqual(self.api.get('/api/exercises/autocomplete/', {'q': ' '}).status_code, 400)
+
+
+class ClientTypeaheadTest(TestCase):
+    """Test para verificar el typeahead de clientes en memoria"""
+
+    def setUp(self):
+        from . import typeahead
+
+        # Índice nuevo por test: el del proceso sobreviviría entre tests
+        typeahead._index = None
+        for index, (name, phone) in enumerate([("Juan Pérez", "+1 (234) 555-0001"), ("Ana Juárez", "+1 234 555 0002")]):
+            Client.objects.create(
+                name=name,
+                email=f"recepcion{index}@test.com",
+                phone=phone,
+                birth_date=date(1990, 1, 1),
+                weight=70.0,
+                height=170.0,
+                join_date=date(2024, 1, 1)
+            )
+
+    def new_client(self, name, phone):
+        return Client.objects.create(
+            name=name,
+            email=f"{name.split()[0].lower()}@test.com",
+            phone=phone,
+            birth_date=date(1990, 1, 1),
+            weight=70.0,
+            height=170.0,
+            join_date=date(2024, 1, 1)
+        )
+
+    def test_prefix_matches_on_name_words_email_and_phone(self):
+        """Test que se encuentra por cualquier palabra del nombre sin acentos, email o teléfono"""
+        from .typeahead import ClientTypeahead
+
+        index = ClientTypeahead(resync_interval=3600)
+        index.load()
+        self.assertEqual([c['name'] for c in index.search('JUA')], ["Ana Juárez", "Juan Pérez"])
+        self.assertEqual([c['name'] for c in index.search('pere')], ["Juan Pérez"])
+        self.assertEqual([c['name'] for c in index.search('recepcion1')], ["Ana Juárez"])
+        self.assertEqual(len(index.search('1 234-555', limit=1)), 1)
+        self.assertEqual(index.search('zz'), [])
+
+    def test_other_workers_changes_trigger_resync(self):
+        """Test que un cambio de otro worker (versión distinta) recarga el índice tras el intervalo"""
+        from .models import DataVersion
+        from .typeahead import ClientTypeahead, VERSION_NAME
+
+        index = ClientTypeahead(resync_interval=3600)
+        index.load()
+        # Creado "en otro worker": este índice no recibe la señal, solo ve la versión,
+        # que se incrementa al confirmar y no dentro de la transacción de la escritura
+        with self.captureOnCommitCallbacks(execute=True):
+            self.new_client("Julia Soto", "+1 234 555 0003")
+            self.assertEqual(DataVersion.current(VERSION_NAME), index.version)
+        self.assertEqual(DataVersion.current(VERSION_NAME), index.version + 1)
+        self.assertEqual(len(index.search('julia')), 0)
+
+        index.resync_interval = 0
+        self.assertEqual([c['name'] for c in index.search('julia')], ["Julia Soto"])
+
+    @override_settings(TYPEAHEAD_RESYNC_INTERVAL=3600)
+    def test_endpoint_follows_local_changes_without_queries(self):
+        """Test que el endpoint responde sin consultas y refleja altas, cambios y borrados del worker"""
+        from rest_framework.test import APIClient
+
+        api = APIClient()
+        api.force_authenticate(User.objects.create_user(username="recepcion", password="recepcionpass"))
+        self.assertEqual(len(api.get('/api/clients/typeahead/', {'q': 'ju'}).data), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            julia = self.new_client("Julia Soto", "+1 234 555 0003")
+        with self.captureOnCommitCallbacks(execute=True):
+            julia.name = "Julieta Soto"
+            julia.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Client.objects.get(name="Ana Juárez").delete()
+
+        with self.assertNumQueries(0):
+            response = api.get('/api/clients/typeahead/', {'q': 'ju'})
+        self.assertEqual([c['name'] for c in response.data], ["Juan Pérez", "Julieta Soto"])
+        self.assertEqual(api.get('/api/clients/typeahead/', {'q': ''}).status_code, 400)
+
+
+class SubscriptionStatusTest(TestCase):
+    """Test para verificar el estado de suscripción precalculado"""
+
+    def test_status_on_save_and_daily_refresh(self):
+        """Test que el estado se calcula al guardar y el proceso diario lo avanza con UPDATEs por conjuntos"""
+        from datetime import timedelta
+        from .filters import ClientFilter
+
+        today = timezone.localdate()
+        ends = {'sin-fin': None, 'lejos': today + timedelta(days=45), 'pronto': today + timedelta(days=5),
+                'vencido': today - timedelta(days=1)}
+        clients = {}
+        for index, (name, end) in enumerate(ends.items()):
+            clients[name] = Client.objects.create(
+                name=name,
+                email=f"suscripcion{index}@test.com",
+                phone=f"+12345750{index}",
+                birth_date=date(1990, 1, 1),
+                weight=70.0,
+                height=170.0,
+                join_date=date(2024, 1, 1),
+                subscription_end=end
+            )
+        self.assertEqual(
+            {name: client.subscription_status for name, client in clients.items()},
+            {'sin-fin': 'active', 'lejos': 'active', 'pronto': 'expiring', 'vencido': 'expired'}
+        )
+
+        # Veinte días después: 'lejos' pasa a por expirar y 'pronto' a expirado
+        with self.assertNumQueries(5):
+            updated = Client.refresh_subscription_statuses(today=today + timedelta(days=20))
+        self.assertEqual(updated, 2)
+        statuses = dict(Client.objects.values_list('name', 'subscription_status'))
+        self.assertEqual((statuses['lejos'], statuses['pronto']), ('expiring', 'expired'))
+
+        # Renovar con save(update_fields) recalcula el estado
+        renewed = clients['vencido']
+        renewed.subscription_end = today + timedelta(days=365)
+        renewed.save(update_fields=['subscription_end'])
+        renewed.refresh_from_db()
+        self.assertEqual(renewed.subscription_status, 'active')
+
+        active = ClientFilter({'subscription_status': 'active'}, queryset=Client.objects.all()).qs
+        self.assertEqual(set(active.values_list('name', flat=True)), {'sin-fin', 'lejos', 'vencido'})
+        self.assertIn('subscription_status', str(active.query))
+
+
+class CachedCountPaginationTest(TestCase):
+    """Test para verificar la paginación con total cacheado o estimado"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+        from .models import ProgressMetrics
+
+        cache.clear()
+        self.client_obj = Client.objects.create(
+            name="Paginado",
+            email="paginado@test.com",
+            phone="+1234576000",
+            birth_date=date(1990, 1, 1),
+            weight=70.0,
+            height=170.0,
+            join_date=date(2024, 1, 1)
+        )
+        for day in range(1, 6):
+            ProgressMetrics.objects.create(client=self.client_obj, date=date(2024, 1, day), weight=70 - day)
+        self.api = APIClient()
+        self.api.force_authenticate(User.objects.create_user(username="paginado", password="paginadopass"))
+
+    def test_filtered_count_is_cached_by_filters(self):
+        """Test que el COUNT se reutiliza para los mismos filtros aunque cambien el orden o la página"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        params = {'client': self.client_obj.id, 'date': '2024-01-02'}
+        with CaptureQueriesContext(connection) as first:
+            response = self.api.get('/api/progress-metrics/', params)
+        self.assertEqual((response.data['count'], response.data['count_exact']), (1, True))
+
+        with CaptureQueriesContext(connection) as second:
+            response = self.api.get('/api/progress-metrics/', {'date': '2024-01-02', 'client': self.client_obj.id, 'ordering': 'weight'})
+        self.assertEqual((response.data['count'], response.data['count_exact']), (1, False))
+        self.assertTrue(any('COUNT(' in query['sql'].upper() for query in first.captured_queries))
+        self.assertFalse(any('COUNT(' in query['sql'].upper() for query in second.captured_queries))
+
+        response = self.api.get('/api/progress-metrics/', {'client': self.client_obj.id})
+        self.assertEqual((response.data['count'], response.data['count_exact']), (5, True))
+
+    @skipUnless(connection.vendor == 'postgresql', 'reltuples es una estadística de PostgreSQL')
+    @override_settings(PAGINATION_ESTIMATE_THRESHOLD=0)
+    def test_unfiltered_list_uses_table_estimate(self):
+        """Test que un listado sin filtros usa la estimación de pg_class"""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE gym_progressmetrics')
+        response = self.api.get('/api/progress-metrics/')
+        self.assertFalse(response.data['count_exact'])
+        self.assertEqual(len(response.data['results']), 5)
+
+
+class ClientRoutineTodayTest(TestCase):
+    """Test para verificar el listado de asignaciones programadas por día"""
+
+    def setUp(self):
+        from .models import Routine, ClientRoutine
+
+        routine = Routine.objects.create(
+            name="Rutina", description="Rutina", frequency="weekly", days_per_week=3, duration=4
+        )
+        schedules = [
+            (['monday', 'wednesday', 'friday'], True, None),
+            (['tuesday', 'thursday'], True, None),
+            (['monday'], False, None),
+            (['monday'], True, date(2024, 1, 1)),
+        ]
+        for i, (days, is_active, end_date) in enumerate(schedules):
+            client = Client.objects.create(
+                name=f"Hoy {i}",
+                email=f"hoy{i}@test.com",
+                phone=f"+12345400{i:02d}",
+                birth_date=date(1990, 1, 1),
+                weight=70.0,
+                height=170.0,
+                join_date=date(2023, 1, 1)
+            )
+            ClientRoutine.objects.create(
+                client=client, routine=routine, start_date=date(2023, 1, 1),
+                end_date=end_date, is_active=is_active, assigned_days=days
+            )
+
+        from rest_framework.test import APIClient
+        self.api = APIClient()
+        self.api.force_authenticate(User.objects.create_user(username="trainer", password="trainerpass"))
+
+    def test_mask_is_kept_in_sync(self):
+        """Test que assigned_days_mask refleja assigned_days al guardar"""
+        from .models import ClientRoutine
+
+        assignment = ClientRoutine.objects.get(client__name="Hoy 1")
+        self.assertEqual(assignment.assigned_days_mask, 0b1010)
+        assignment.assigned_days = ['sunday']
+        assignment.save(update_fields=['assigned_days'])
+        assignment.refresh_from_db()
+        self.assertEqual(assignment.assigned_days_mask, 0b1000000)
+
+    def test_roster_for_date(self):
+        """Test que solo se listan asignaciones activas, vigentes y con ese día asignado"""
+        # 2024-06-03 es lunes
+        response = self.api.get('/api/client-routines/today/', {'date': '2024-06-03'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['client_name'] for r in response.data['results']], ["Hoy 0"])
+
+    def test_roster_by_weekday(self):
+        """Test que con weekday se ignoran las fechas de la asignación"""
+        response = self.api.get('/api/client-routines/today/', {'weekday': 'monday'})
+        self.assertEqual([r['client_name'] for r in response.data['results']], ["Hoy 0", "Hoy 3"])
+
+        response = self.api.get('/api/client-routines/today/', {'weekday': 'someday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_impossible_date_returns_400(self):
+        """Test que una fecha bien formada pero inexistente devuelve 400 y no 500"""
+        response = self.api.get('/api/client-routines/today/', {'date': '2025-02-30'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.data)
+
+
+class GoalSyncTest(TestCase):
+    """Test para verificar la sincronización de objetivos con las métricas de progreso"""
+
+    def setUp(self):
+        from .models import Goal, ProgressMetrics
+
+        self.client_obj = Client.objects.create(
+            name="Objetivos",
+            email="objetivos@test.com",
+            phone="+1234560000",
+            birth_date=date(1990, 1, 1),
+            weight=90.0,
+            height=180.0,
+            join_date=date(2024, 1, 1)
+        )
+        ProgressMetrics.objects.create(client=self.client_obj, date=date(2024, 1, 1), weight=90.0, measurements={'waist': 100})
+        self.weight_goal = Goal.objects.create(
+            client=self.client_obj, title="Bajar a 85 kg", description="", target_value=85.0,
+            current_value=90.0, unit="kg", deadline=date(2024, 6, 1), category='weight', metric='weight'
+        )
+        self.waist_goal = Goal.objects.create(
+            client=self.client_obj, title="Cintura 95", description="", target_value=95.0,
+            current_value=0.0, start_value=100.0, unit="cm", deadline=date(2024, 6, 1),
+            category='custom', metric='waist'
+        )
+
+    def test_goals_follow_latest_metric(self):
+        """Test que al registrar una medición se actualizan valor y cumplimiento"""
+        from .models import ProgressMetrics
+
+        self.waist_goal.refresh_from_db()
+        self.assertEqual(self.waist_goal.current_value, 100.0)
+
+        ProgressMetrics.objects.create(client=self.client_obj, date=date(2024, 2, 1), weight=84.5, measurements={'waist': 97})
+        # Una medición antigua no sustituye a la más reciente
+        ProgressMetrics.objects.create(client=self.client_obj, date=date(2024, 1, 15), weight=88.0)
+
+        self.weight_goal.refresh_from_db()
+        self.waist_goal.refresh_from_db()
+        self.assertEqual(self.weight_goal.current_value, 84.5)
+        self.assertTrue(self.weight_goal.is_completed)
+        self.assertEqual(self.waist_goal.current_value, 97.0)
+        self.assertFalse(self.waist_goal.is_completed)
+
+    def test_sync_goals_command(self):
+        """Test que el comando reconcilia los objetivos desincronizados"""
+        from django.core.management import call_command
+        from io import StringIO
+        from .models import Goal
+
+        Goal.objects.filter(pk=self.weight_goal.pk).update(current_value=0.0, is_completed=True)
+        out = StringIO()
+        call_command('sync_goals', stdout=out)
+
+        self.weight_goal.refresh_from_db()
+        self.assertEqual(self.weight_goal.current_value, 90.0)
+        self.assertFalse(self.weight_goal.is_completed)
+        self.assertIn('Objetivos actualizados: 1', out.getvalue())
+
+
+class WorkoutCompletionBulkTest(TestCase):
+    """Test para verificar la carga masiva idempotente de entrenamientos completados"""
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from .models import Routine, ClientRoutine, Workout
+
+        client = Client.objects.create(
+            name="Kiosco",
+            email="kiosco@test.com",
+            phone="+1234570000",
+            birth_date=date(1990, 1, 1),
+            weight=70.0,
+            height=170.0,
+            join_date=date(2024, 1, 1)
+        )
+        routine = Routine.objects.create(
+            name="Rutina", description="Rutina", frequency="weekly", days_per_week=3, duration=4
+        )
+        self.workout = Workout.objects.create(
+            name="Día A", description="Workout", estimated_duration=60, difficulty="beginner", category="strength"
+        )
+        self.assignment = ClientRoutine.objects.create(
+            client=client, routine=routine, start_date=date(2024, 1, 1), assigned_days=['monday']
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(User.objects.create_user(username="kiosk", password="kioskpass"))
+
+    def completion(self, key, **overrides):
+        data = {
+            'idempotency_key': key,
+            'client_routine_id': self.assignment.id,
+            'workout_id': self.workout.id,
+            'completed_at': '2024-01-08T10:00:00Z',
+        }
+        data.update(overrides)
+        return data
+
+    def test_replayed_completions_are_not_duplicated(self):
+        """Test que reenviar el mismo lote no crea registros nuevos"""
+        from uuid import uuid4
+        from .models import RoutineProgress
+
+        keys = [str(uuid4()) for _ in range(3)]
+        payload = {'completions': [self.completion(key) for key in keys]}
+
+        response = self.api.post('/api/routine-progress/bulk/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 3)
+
+        response = self.api.post('/api/routine-progress/bulk/', payload, format='json')
+        self.assertEqual(response.data['created'], 0)
+        self.assertEqual(response.data['duplicates'], 3)
+        self.assertEqual(RoutineProgress.objects.count(), 3)
+        self.assertEqual(self.assignment.adherence.completed_sessions, 3)
+
+    def test_concurrent_replay_is_not_counted_twice(self):
+        """Test que una clave insertada por otra petición en plena carrera se informa como duplicada"""
+        from unittest.mock import patch
+        from uuid import UUID, uuid4
+        from .models import LeaderboardEntry, RoutineProgress
+
+        raced, fresh = str(uuid4()), str(uuid4())
+        insert_new = RoutineProgress.insert_new.__func__
+
+        def racing_insert(cls, progresses, **kwargs):
+            # Otra petición con la misma clave confirma justo antes que esta
+            winner = RoutineProgress.objects.create(
+                client_routine=self.assignment, workout=self.workout,
+                completed_at=timezone.now(), idempotency_key=UUID(raced)
+            )
+            self.winner_id = winner.id
+            return insert_new(cls, progresses, **kwargs)
+
+        payload = {'completions': [self.completion(raced), self.completion(fresh)]}
+        with patch.object(RoutineProgress, 'insert_new', classmethod(racing_insert)), \
+                patch('gym.views.publish') as publish:
+            response = self.api.post('/api/routine-progress/bulk/', payload, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['created'], response.data['duplicates']), (1, 1))
+        self.assertEqual(response.data['results'][0]['status'], 'duplicate')
+        self.assertEqual(response.data['results'][0]['id'], self.winner_id)
+        self.assertEqual(publish.call_count, 1)
+        self.assertEqual(RoutineProgress.objects.count(), 2)
+        # El ganador sumó su entrenamiento al crearse; esta petición solo suma el suyo
+        week = LeaderboardEntry.objects.filter(client=self.assignment.client, routine__isnull=True)
+        self.assertEqual(sum(week.values_list('workouts', flat=True)), 2)
+
+    def test_invalid_items_are_reported_per_item(self):
+        """Test que los elementos inválidos no impiden registrar el resto"""
+        from uuid import uuid4
+
+        payload = {'completions': [
+            self.completion(str(uuid4())),
+            self.completion(str(uuid4()), workout_id=999999),
+            self.completion('no-es-un-uuid'),
+        ]}
+        # Validación, inserción y adherencia fijas; rankings y racha por fila afectada (aquí creadas por primera vez)
+        with self.assertNumQueries(25):
+            response = self.api.post('/api/routine-progress/bulk/', payload, format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([r['status'] for r in response.data['results']], ['created', 'invalid', 'invalid'])
+        self.assertIn('workout_id', response.data['results'][1]['errors'])
+
+
+class LeaderboardTest(TestCase):
+    """Test para verificar los rankings semanales y las rachas incrementales"""
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from .models import Routine, ClientRoutine, Workout
+
+        self.workout = Workout.objects.create(
+            name="Día A", description="Workout", estimated_duration=60, difficulty="beginner", category="strength"
+        )
+        routine = Routine.objects.create(
+            name="Rutina", description="Rutina", frequency="weekly", days_per_week=3, duration=4
+        )
+        self.assignments = []
+        for index, name in enumerate(["Ana", "Luis"]):
+            client = Client.objects.create(
+                name=name,
+                email=f"ranking{index}@test.com",
+                phone=f"+12345710{index}",
+                birth_date=date(1990, 1, 1),
+                weight=70.0,
+                height=170.0,
+                join_date=date(2024, 1, 1)
+            )
+            self.assignments.append(ClientRoutine.objects.create(
+                client=client, routine=routine, start_date=date(2024, 1, 1), assigned_days=['monday']
+            ))
+        self.api = APIClient()
+        self.api.force_authenticate(User.objects.create_user(username="ranking", password="rankingpass"))
+
+    def complete(self, assignment, day, rating=None):
+        from datetime import datetime, timezone as dt_timezone
+        from .models import RoutineProgress
+
+        return RoutineProgress.objects.create(
+            client_routine=assignment,
+            workout=self.workout,
+            completed_at=datetime(day.year, day.month, day.day, 12, tzinfo=dt_timezone.utc),
+            rating=rating
+        )
+
+    def test_counters_and_streaks_are_incremental(self):
+        """Test que cada entrenamiento actualiza contadores, media y racha, y que un rebuild da lo mismo"""
+        from .analytics import leaderboard, rebuild_leaderboards
+        from .models import ClientStreak, LeaderboardEntry
+
+        ana, luis = self.assignments
+        self.complete(ana, date(2024, 1, 8), rating=4)
+        self.complete(ana, date(2024, 1, 10), rating=5)
+        self.complete(ana, date(2024, 1, 15))
+        self.complete(luis, date(2024, 1, 9), rating=3)
+
+        week, entries = leaderboard('workouts', week=date(2024, 1, 11))
+        self.assertEqual(week, date(2024, 1, 8))
+        self.assertEqual([(e['client_name'], e['workouts']) for e in entries], [("Ana", 2), ("Luis", 1)])
+        self.assertEqual(entries[0]['average_rating'], 4.5)
+
+        streak = ClientStreak.objects.get(client=ana.client)
+        self.assertEqual((streak.current_streak, streak.longest_streak), (2, 2))
+
+        # Un entrenamiento atrasado recalcula la racha desde el historial
+        self.complete(ana, date(2024, 1, 1))
+        streak.refresh_from_db()
+        self.assertEqual((streak.current_streak, streak.last_week), (3, date(2024, 1, 15)))
+
+        entries = LeaderboardEntry.objects.order_by('week_start', 'client_id', 'routine_id').values_list(
+            'week_start', 'client_id', 'routine_id', 'workouts', 'rating_sum', 'rating_count', 'average_rating'
+        )
+        snapshot = list(entries)
+        rebuild_leaderboards()
+        self.assertEqual(list(entries.all()), snapshot)
+
+    def test_edited_completion_moves_counters_and_delete_removes_them(self):
+        """Test que editar la fecha o la valoración mueve los contadores y que borrar después no los deja negativos"""
+        from .analytics import rebuild_leaderboards
+        from .models import ClientStreak, LeaderboardEntry
+
+        ana = self.assignments[0]
+        self.complete(ana, date(2024, 1, 8), rating=4)
+        progress = self.complete(ana, date(2024, 1, 15), rating=2)
+
+        response = self.api.patch(
+            f'/api/routine-progress/{progress.id}/', {'completed_at': '2024-01-09T12:00:00Z', 'rating': 5}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        entries = LeaderboardEntry.objects.order_by('week_start', 'client_id', 'routine_id').values_list(
+            'week_start', 'client_id', 'routine_id', 'workouts', 'rating_sum', 'rating_count', 'average_rating'
+        )
+        snapshot = list(entries)
+        self.assertEqual(
+            [(week, workouts, rating_sum) for week, _, routine, workouts, rating_sum, _, _ in snapshot if routine is None],
+            [(date(2024, 1, 8), 2, 9), (date(2024, 1, 15), 0, 0)]
+        )
+        streak = ClientStreak.objects.get(client=ana.client)
+        self.assertEqual((streak.current_streak, streak.last_week), (1, date(2024, 1, 8)))
+
+        # Cambiar solo la valoración no toca la semana ni la racha
+        self.assertEqual(self.api.patch(
+            f'/api/routine-progress/{progress.id}/', {'rating': 3}, format='json'
+        ).status_code, 200)
+        self.assertEqual(self.api.delete(f'/api/routine-progress/{progress.id}/').status_code, 204)
+        snapshot = list(entries.filter(workouts__gt=0))
+        self.assertEqual([(week, workouts, rating_sum) for week, _, routine, workouts, rating_sum, _, _ in snapshot
+                          if routine is None], [(date(2024, 1, 8), 1, 4)])
+        rebuild_leaderboards()
+        self.assertEqual(list(entries.all()), snapshot)
+
+    def test_deleting_a_completion_is_discounted(self):
+        """Test que eliminar un entrenamiento descuenta el contador y corta la racha"""
+        from .models import ClientStreak, LeaderboardEntry
+
+        ana = self.assignments[0]
+        self.complete(ana, date(2024, 1, 8), rating=4)
+        last = self.complete(ana, date(2024, 1, 15), rating=2)
+        last.delete()
+
+        entry = LeaderboardEntry.objects.get(client=ana.client, week_start=date(2024, 1, 15), routine__isnull=True)
+        self.assertEqual((entry.workouts, entry.rating_count, entry.average_rating), (0, 0, None))
+        self.assertEqual(ClientStreak.objects.get(client=ana.client).current_streak, 1)
+
+    def test_leaderboard_endpoint(self):
+        """Test del endpoint de rankings por rutina y por racha"""
+        ana, luis = self.assignments
+        self.complete(ana, date(2024, 1, 8))
+        self.complete(luis, date(2024, 1, 8))
+        self.complete(luis, date(2024, 1, 9))
+
+        response = self.api.get('/api/leaderboards/', {'week': '2024-01-08', 'routine_id': ana.routine_id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([e['client_name'] for e in response.data['entries']], ["Luis", "Ana"])
+
+        response = self.api.get('/api/leaderboards/', {'metric': 'streak', 'week': '2024-01-10', 'limit': 1})
+        self.assertEqual(len(response.data['entries']), 1)
+
+        response = self.api.get('/api/leaderboards/', {'metric': 'speed'})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.api.get('/api/leaderboards/', {'week': '2025-02-30'})
+        self.assertEqual(response.status_code, 400)
+
+
+class DeltaSyncTest(TestCase):
+    """Test para verificar la sincronización incremental por token"""
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from .models import Routine, ClientRoutine, Workout, Goal
+
+        self.client_obj = Client.objects.create(
+            name="Sync Cliente",
+            email="sync@test.com",
+            phone="+1234580000",
+            birth_date=date(1990, 1, 1),
+            weight=70.0,
+            height=170.0,
+            join_date=date(2024, 1, 1)
+        )
+        self.other = Client.objects.create(
+            name="Otro Cliente",
+            email="otro@test.com",
+            phone="+1234580001",
+            birth_date=date(1990, 1, 1),
+            weight=70.0,
+            height=170.0,
+            join_date=date(2024, 1, 1)
+        )
+        self.routine = Routine.objects.create(
+            name="Rutina", description="Rutina", frequency="weekly", days_per_week=3, duration=4
+        )
+        self.workout = Workout.objects.create(
+            name="Día A", description="Workout", estimated_duration=60, difficulty="beginner", category="strength"
+        )
+        self.routine.workouts.add(self.workout)
+        ClientRoutine.objects.create(
+            client=self.client_obj, routine=self.routine, start_date=date(2024, 1, 1), assigned_days=['monday']
+        )
+        self.goal = Goal.objects.create(
+            client=self.client_obj, title="Objetivo", description="", target_value=10, current_value=0,
+            unit="km", deadline=date(2024, 6, 1), category='endurance'
+        )
+        Goal.objects.create(
+            client=self.other, title="Ajeno", description="", target_value=10, current_value=0,
+            unit="km", deadline=date(2024, 6, 1), category='endurance'
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.client_obj.user)
+
+    def sync(self, token=None):
+        response = self.api.get('/api/sync/', {'since': token} if token else {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_full_then_incremental_sync(self):
+        """Test que tras la sincronización completa solo llegan los cambios y borrados"""
+        from datetime import timedelta
+        from .models import Goal
+
+        first = self.sync()
+        self.assertTrue(first['full'])
+        self.assertEqual([g['title'] for g in first['changes']['goals']], ["Objetivo"])
+        self.assertEqual([w['id'] for w in first['changes']['workouts']], [self.workout.id])
+
+        # Simular que la sincronización anterior terminó antes de los cambios
+        Goal.objects.update(updated_at=timezone.now() - timedelta(minutes=5))
+        token = str(int(first['token']) - 60_000_000)
+        deleted_id = self.goal.id
+        self.goal.delete()
+        new_goal = Goal.objects.create(
+            client=self.client_obj, title="Nuevo", description="", target_value=5, current_value=0,
+            unit="km", deadline=date(2024, 6, 1), category='endurance'
+        )
+
+        second = self.sync(token)
+        self.assertFalse(second['full'])
+        self.assertEqual([g['id'] for g in second['changes']['goals']], [new_goal.id])
+        self.assertEqual(second['deleted']['goals'], [deleted_id])
+
+    def test_invalid_token(self):
+        """Test que un token inválido devuelve 400"""
+        response = self.api.get('/api/sync/', {'since': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+class EventStreamTest(TestCase):
+    """Test para verificar el pub/sub de eventos y el stream SSE"""
+
+    def test_slow_subscriber_drops_oldest_events(self):
+        """Test que la cola de cada suscriptor está acotada y descarta los eventos más antiguos"""
+        import asyncio
+        from .events import EventBroker
+
+        async def scenario():
+            broker = EventBroker()
+            subscription = broker.subscribe(event_types=['workout_completed'], maxsize=2)
+            for i in range(3):
+                broker.dispatch({'type': 'workout_completed', 'id': i})
+            broker.dispatch({'type': 'progress_metrics', 'id': 99})
+            await asyncio.sleep(0)
+            received = [(await subscription.get(timeout=1))['id'] for _ in range(2)]
+            return received, subscription.dropped
+
+        self.assertEqual(asyncio.run(scenario()), ([1, 2], 1))
+
+    # Con PostgreSQL los eventos van por NOTIFY, que solo se entrega al confirmar de verdad
+    # (nunca dentro de un TestCase): se prueba el stream con el broker del proceso
+    @override_settings(EVENTS_PG_CHANNEL='')
+    async def test_stream_delivers_committed_completions(self):
+        """Test que un entrenamiento registrado llega como evento SSE a un entrenador"""
+        from asgiref.sync import sync_to_async
+        from rest_framework_simplejwt.tokens import AccessToken
+        from .models import Routine, ClientRoutine, Workout, RoutineProgress
+
+        def setup():
+            trainer = User.objects.create_user(username="coach", password="coachpass")
+            trainer.custom_profile.role = 'trainer'
+            trainer.custom_profile.save()
+            client = Client.objects.create(
+                name="Eventos", email="eventos@test.com", phone="+1234590000",
+                birth_date=date(1990, 1, 1), weight=70.0, height=170.0, join_date=date(2024, 1, 1)
+            )
+            routine = Routine.objects.create(
+                name="Rutina", description="Rutina", frequency="weekly", days_per_week=3, duration=4
+            )
+            workout = Workout.objects.create(
+                name="Día A", description="Workout", estimated_duration=60, difficulty="beginner", category="strength"
+            )
+            assignment = ClientRoutine.objects.create(
+                client=client, routine=routine, start_date=date(2024, 1, 1), assigned_days=['monday']
+            )
+            return str(AccessToken.for_user(trainer)), assignment, workout
+
+        def complete(assignment, workout):
+            with self.captureOnCommitCallbacks(execute=True):
+                return RoutineProgress.objects.create(
+                    client_routine=assignment, workout=workout, completed_at=timezone.now()
+                )
+
+        token, assignment, workout = await sync_to_async(setup)()
+        self.assertEqual((await self.async_client.get('/api/events/')).status_code, 401)
+
+        response = await self.async_client.get('/api/events/', {'token': token, 'types': 'workout_completed'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+
+        progress = await sync_to_async(complete)(assignment, workout)
+        event = (await anext(stream)).decode()
+        await stream.aclose()
+
+        self.assertIn('event: workout_completed\n', event)
+        self.assertIn(f'"id": {progress.id}', event)
+        self.assertIn(f'"client_id": {assignment.client_id}', event)
+
+
+@override_settings(ALLOWED_HOSTS=['.gymnow.test', 'testserver'])
+class GymTenancyTest(TestCase):
+    """Test para verificar que cada gimnasio solo ve y modifica sus propios datos"""
+
+    def setUp(self):
+        from django.core.cache import cache
+        from .models import Gym, Exercise
+
+        cache.clear()
+        self.gym_a = Gym.objects.create(name="Centro", slug="centro", domain="centro.gymnow.test")
+        self.gym_b = Gym.objects.create(name="Norte", slug="norte")
+        self.clients = {}
+        self.exercises = {}
+        for index, gym in enumerate([self.gym_a, self.gym_b]):
+            self.clients[gym.slug] = Client.objects.create(
+                gym=gym,
+                name=f"Cliente {gym.name}",
+                email=f"tenant{index}@test.com",
+                phone=f"+12345740{index}",
+                birth_date=date(1990, 1, 1),
+                weight=70.0,
+                height=170.0,
+                join_date=date(2024, 1, 1)
+            )
+            self.exercises[gym.slug] = Exercise.objects.create(
+                gym=gym, name=f"Sentadilla {gym.name}", description="Piernas", difficulty="beginner"
+            )
+
+    def tearDown(self):
+        from django.core.cache import cache
+
+        # El rollback del test no lanza post_delete: olvidar los gimnasios cacheados
+        cache.clear()
+
+    def staff_user(self, username, gym):
+        user = User.objects.create_user(username=username, password=f"{username}pass")
+        CustomUser.objects.filter(user=user).update(role='trainer', gym=gym)
+        # Recargar: el perfil cacheado al crear el usuario aún no tiene gimnasio
+        return User.objects.get(pk=user.pk)
+
+    def test_jwt_claim_scopes_lists_and_creates(self):
+        """Test que el token lleva gym_id y los listados y altas quedan en ese gimnasio"""
+        from rest_framework.test import APIClient
+        from rest_framework_simplejwt.tokens import AccessToken
+        from .models import Exercise
+
+        self.staff_user("entrenador", self.gym_b)
+        api = APIClient()
+        tokens = api.post('/api/token/', {'username': 'entrenador', 'password': 'entrenadorpass'}).data
+        self.assertEqual(AccessToken(tokens['access'])['gym_id'], self.gym_b.id)
+
+        api.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        response = api.get('/api/clients/')
+        self.assertEqual([c['id'] for c in response.data['results']], [self.clients['norte'].id])
+        self.assertEqual(api.get(f"/api/clients/{self.clients['centro'].id}/").status_code, 404)
+
+        response = api.post('/api/exercises/', {
+            'name': 'Remo', 'description': 'Espalda', 'difficulty': 'beginner',
+            'muscle_groups': [], 'equipment': [], 'instructions': []
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Exercise.objects.get(pk=response.data['id']).gym_id, self.gym_b.id)
+
+    def test_host_resolves_gym_and_rejects_other_gyms(self):
+        """Test que el dominio del gimnasio resuelve el tenant y rechaza usuarios de otro gimnasio"""
+        from rest_framework.test import APIClient
+
+        api = APIClient()
+        response = api.get('/api/exercises/', HTTP_HOST='centro.gymnow.test')
+        self.assertEqual([e['id'] for e in response.data['results']], [self.exercises['centro'].id])
+
+        api.force_authenticate(self.staff_user("intruso", self.gym_b))
+        self.assertEqual(api.get('/api/exercises/', HTTP_HOST='centro.gymnow.test').status_code, 403)
+
+    def test_requests_without_gym_are_rejected_with_several_gyms(self):
+        """Test que sin gimnasio solo los superusuarios ven los datos de todos cuando hay varios gimnasios"""
+        from asgiref.sync import async_to_sync
+        from django.test import RequestFactory
+        from rest_framework.test import APIClient
+        from rest_framework_simplejwt.tokens import AccessToken
+        from .views import authenticate_event_stream
+
+        api = APIClient()
+        self.assertEqual(api.get('/api/clients/').status_code, 401)
+        self.assertEqual(api.get('/api/leaderboards/').status_code, 401)
+
+        trainer = self.staff_user("sin_gimnasio", None)
+        api.force_authenticate(trainer)
+        self.assertEqual(api.get('/api/clients/').status_code, 403)
+        request = RequestFactory().get('/api/events/', {'token': str(AccessToken.for_user(trainer))})
+        self.assertFalse(async_to_sync(authenticate_event_stream)(request)[1])
+
+        api.force_authenticate(User.objects.create_superuser("raiz", "raiz@test.com", "raizpass"))
+        response = api.get('/api/clients/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_timeseries_of_other_gym_client_is_not_found(self):
+        """Test que la serie temporal no lee métricas de clientes de otro gimnasio"""
+        from rest_framework.test import APIClient
+
+        api = APIClient()
+        api.force_authenticate(self.staff_user("entrenador", self.gym_a))
+        response = api.get('/api/progress-metrics/timeseries/', {'client_id': self.clients['norte'].id})
+        self.assertEqual(response.status_code, 404)
+
+    def test_cohort_analytics_are_computed_per_gym(self):
+        """Test que las cohortes de un dueño solo incluyen clientes de su gimnasio"""
+        from datetime import timedelta
+        from rest_framework.test import APIClient
+        from .models import CustomUser, ProgressMetrics
+
+        for loss, gym in ((2.0, self.gym_a), (6.0, self.gym_b)):
+            client = self.clients[gym.slug]
+            ProgressMetrics.objects.create(client=client, date=date(2024, 1, 1), weight=80.0)
+            ProgressMetrics.objects.create(client=client, date=date(2024, 1, 1) + timedelta(weeks=12), weight=80.0 - loss)
+
+        api = APIClient()
+        for username, gym, change in (("duena_centro", self.gym_a, -2.0), ("duena_norte", self.gym_b, -6.0)):
+            owner = self.staff_user(username, gym)
+            CustomUser.objects.filter(user=owner).update(role='owner')
+            api.force_authenticate(User.objects.get(pk=owner.pk))
+            response = api.get('/api/analytics/cohorts/', {'metric': 'weight', 'weeks': 12})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([(c['clients'], c['mean_change']) for c in response.data['cohorts']], [(1, change)])
+
+    def test_leaderboards_store_and_filter_by_gym(self):
+        """Test que los contadores y rachas guardan el gimnasio del cliente y los rankings filtran por él"""
+        from rest_framework.test import APIClient
+        from .analytics import rebuild_leaderboards
+        from .models import Routine, ClientRoutine, Workout, RoutineProgress, LeaderboardEntry, ClientStreak
+
+        for gym in (self.gym_a, self.gym_b):
+            routine = Routine.objects.create(
+                gym=gym, name="Base", description="Rutina", frequency="weekly", days_per_week=3, duration=4
+            )
+            workout = Workout.objects.create(
+                gym=gym, name="Día A", description="Workout", estimated_duration=60,
+                difficulty="beginner", category="strength"
+            )
+            assignment = ClientRoutine.objects.create(
+                client=self.clients[gym.slug], routine=routine, start_date=date(2024, 1, 1)
+            )
+            RoutineProgress.objects.create(client_routine=assignment, workout=workout, completed_at=timezone.now())
+
+        def gyms():
+            return (
+                sorted(LeaderboardEntry.objects.values_list('client__gym_id', 'gym_id').distinct()),
+                sorted(ClientStreak.objects.values_list('client__gym_id', 'gym_id')),
+            )
+
+        expected = [(self.gym_a.id, self.gym_a.id), (self.gym_b.id, self.gym_b.id)]
+        self.assertEqual(gyms(), (expected, expected))
+        rebuild_leaderboards()
+        self.assertEqual(gyms(), (expected, expected))
+
+        api = APIClient()
+        api.force_authenticate(self.staff_user("entrenador", self.gym_b))
+        for metric in ('workouts', 'streak'):
+            response = api.get('/api/leaderboards/', {'metric': metric})
+            self.assertEqual([e['client_id'] for e in response.data['entries']], [self.clients['norte'].id])
+
+    def test_related_objects_and_filters_are_scoped(self):
+        """Test que no se pueden referenciar ni filtrar por objetos de otro gimnasio"""
+        from rest_framework.test import APIClient
+        from .models import Routine, ClientRoutine
+
+        routine = Routine.objects.create(
+            gym=self.gym_a, name="Base", description="Rutina", frequency="weekly", days_per_week=3, duration=4
+        )
+        assignment = ClientRoutine.objects.create(
+            client=self.clients['centro'], routine=routine, start_date=date(2024, 1, 1)
+        )
+        self.assertEqual(assignment.gym_id, self.gym_a.id)
+
+        api = APIClient()
+        api.force_authenticate(self.staff_user("entrenador", self.gym_a))
+        response = api.get('/api/client-routines/', {'client': self.clients['norte'].id})
+        self.assertEqual(response.status_code, 400)
+        response = api.get('/api/client-routines/', {'client': self.clients['centro'].id})
+        self.assertEqual([a['id'] for a in response.data['results']], [assignment.id])
+
+        response = api.get('/api/clients/', {'facets': '1'})
+        self.assertEqual(response.data['facets']['all'], 1)
+
+        sets = [{'exercise': self.exercises['norte'].id, 'reps': 10, 'weight': 20, 'rest_time': 60}]
+        response = api.post('/api/workouts/', {
+            'name': 'Día A', 'description': 'Piernas', 'estimated_duration': 45,
+            'difficulty': 'beginner', 'category': 'strength', 'sets': sets
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('sets', response.data)
+
+
+    def test_bulk_completion_keys_from_other_gyms_are_not_exposed(self):
+        """Test que una clave de idempotencia usada en otro gimnasio no devuelve su registro"""
+        from uuid import uuid4
+        from rest_framework.test import APIClient
+        from .models import Routine, ClientRoutine, Workout, RoutineProgress
+
+        assignments = {}
+        workouts = {}
+        for gym in (self.gym_a, self.gym_b):
+            routine = Routine.objects.create(
+                gym=gym, name="Base", description="Rutina", frequency="weekly", days_per_week=3, duration=4
+            )
+            workouts[gym.slug] = Workout.objects.create(
+                gym=gym, name="Día A", description="Workout", estimated_duration=60,
+                difficulty="beginner", category="strength"
+            )
+            assignments[gym.slug] = ClientRoutine.objects.create(
+                client=self.clients[gym.slug], routine=routine, start_date=date(2024, 1, 1)
+            )
+        key = uuid4()
+        foreign = RoutineProgress.objects.create(
+            client_routine=assignments['norte'], workout=workouts['norte'],
+            completed_at=timezone.now(), idempotency_key=key
+        )
+
+        api = APIClient()
+        api.force_authenticate(self.staff_user("entrenador", self.gym_a))
+        response = api.post('/api/routine-progress/bulk/', {'completions': [{
+            'idempotency_key': str(key),
+            'client_routine_id': assignments['centro'].id,
+            'workout_id': workouts['centro'].id,
+        }]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['duplicates'], 1)
+        self.assertIsNone(response.data['results'][0]['id'])
+        self.assertEqual(RoutineProgress.objects.get(idempotency_key=key).pk, foreign.pk)
+
+@override_settings(DATABASE_REPLICA='replica', REPLICA_STICKY_SECONDS=5)
+class ReplicaRouterTest(TestCase):
+    """Test para verificar el enrutado de lecturas a la réplica y la fijación al primario tras escribir"""
+
+    def test_router_decisions(self):
+        """Test que solo se lee de la réplica dentro de replica_reads y que se escribe siempre en el primario"""
+        from django.db import router
+        from .models import Exercise
+        from .routers import replica_reads
+
+        exercise = Exercise(name="Remo", description="Espalda", difficulty="beginner")
+        exercise._state.db = 'replica'
+        self.assertEqual(router.db_for_read(Exercise), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Exercise), 'replica')
+            self.assertEqual(router.db_for_write(Exercise, instance=exercise), 'default')
+        self.assertEqual(router.db_for_read(Exercise), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'gym'))
+        self.assertTrue(router.allow_migrate('default', 'gym'))
+
+    def test_writes_pin_reads_to_primary(self):
+        """Test que una escritura devuelve la cookie que mantiene las lecturas en el primario"""
+        from django.test import RequestFactory
+        from rest_framework.test import APIClient
+        from .routers import PRIMARY_COOKIE, should_use_replica
+
+        api = APIClient()
+        response = api.post('/api/exercises/', {
+            'name': 'Remo', 'description': 'Espalda', 'difficulty': 'beginner',
+            'muscle_groups': [], 'equipment': [], 'instructions': []
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.cookies[PRIMARY_COOKIE]['max-age'], 5)
+
+        factory = RequestFactory()
+        self.assertTrue(should_use_replica(factory.get('/api/exercises/')))
+        factory.cookies[PRIMARY_COOKIE] = '1'
+        self.assertFalse(should_use_replica(factory.get('/api/exercises/')))
+        self.assertFalse(should_use_replica(factory.post('/api/exercises/')))
+
+
+@skipUnless('replica' in settings.DATABASES, 'requiere un alias replica (p. ej. TEST MIRROR del primario)')
+@override_settings(DATABASE_REPLICA='replica')
+class ReadReplicaIntegrationTest(TransactionTestCase):
+    """Test de extremo a extremo con dos alias de base de datos"""
+    # Sin alias replica la clase se omite, pero Django valida sus bases de datos igualmente
+    databases = {'default', 'replica'} & set(settings.DATABASES)
+
+    def test_viewset_reads_use_replica_until_user_writes(self):
+        """Test que un GET lee de la réplica y, tras escribir, el mismo usuario lee del primario"""
+        from django.db import connections
+        from django.test.utils import CaptureQueriesContext
+        from rest_framework.test import APIClient
+
+        api = APIClient()
+        payload = {
+            'name': 'Remo', 'description': 'Espalda', 'difficulty': 'beginner',
+            'muscle_groups': [], 'equipment': [], 'instructions': []
+        }
+        other = APIClient()
+        self.assertEqual(other.post('/api/exercises/', payload, format='json').status_code, 201)
+
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            response = api.get('/api/exercises/')
+        self.assertEqual(response.data['count'], 1)
+        self.assertTrue(replica_queries.captured_queries)
+
+        self.assertEqual(api.post('/api/exercises/', payload, format='json').status_code, 201)
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            response = api.get('/api/exercises/')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(replica_queries.captured_queries, [])
+
+
+    def test_streaming_export_reads_from_replica(self):
+        """Test que la exportación en streaming lee de la réplica aunque se consuma tras la vista"""
+        from django.db import connections
+        from django.test.utils import CaptureQueriesContext
+        from rest_framework.test import APIClient
+
+        Client.objects.create(
+            name="Exportado", email="exportado@test.com", phone="+1234573100",
+            birth_date=date(1990, 1, 1), weight=70.0, height=170.0, join_date=date(2024, 1, 1)
+        )
+        api = APIClient()
+        api.force_authenticate(User.objects.create_user(username="exportador", password="exportadorpass"))
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            response = api.get('/api/clients/export/', {'format': 'ndjson'})
+            body = b''.join(response.streaming_content)
+        self.assertIn(b'Exportado', body)
+        self.assertTrue(any('gym_client' in query['sql'] for query in replica_queries.captured_queries))
+
+    def test_adherence_refresh_is_read_from_primary(self):
+        """Test que la adherencia recalculada en un GET se relee del primario y no de la réplica"""
+        from datetime import timedelta
+        from django.db import connections
+        from django.test.utils import CaptureQueriesContext
+        from rest_framework.test import APIClient
+        from .models import ClientRoutine, Routine, RoutineAdherence
+
+        client = Client.objects.create(
+            name="Constante", email="constante@test.com", phone="+1234573101",
+            birth_date=date(1990, 1, 1), weight=70.0, height=170.0, join_date=date(2024, 1, 1)
+        )
+        routine = Routine.objects.create(
+            name="Rutina", description="Rutina", frequency="weekly", days_per_week=3, duration=4
+        )
+        assignment = ClientRoutine.objects.create(
+            client=client, routine=routine, start_date=date(2024, 1, 1), assigned_days=['monday']
+        )
+        RoutineAdherence.objects.filter(client_routine=assignment).update(
+            computed_on=timezone.localdate() - timedelta(days=1)
+        )
+
+        api = APIClient()
+        with CaptureQueriesContext(connections['replica']) as replica_queries:
+            response = api.get(f'/api/client-routines/{assignment.id}/adherence/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['computed_on'], str(timezone.localdate()))
+        adherence_reads = [q for q in replica_queries.captured_queries if 'gym_routineadherence' in q['sql']]
+        # Solo la comprobación inicial del resumen va a la réplica
+        self.assertEqual(len(adherence_reads), 1)
+
+@override_settings(SQL_INSTRUMENTATION=True, SQL_QUERY_BUDGETS={})
+class SqlInstrumentationTest(TestCase):
+    """Test para verificar la instrumentación SQL por petición"""
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        self.api = APIClient()
+        self.api.force_authenticate(User.objects.create_user(username="medido", password="medidopass"))
+        Client.objects.create(
+            name="Medido",
+            email="medido@test.com",
+            phone="+1234573000",
+            birth_date=date(1990, 1, 1),
+            weight=70.0,
+            height=170.0,
+            join_date=date(2024, 1, 1)
+        )
+
+    def test_server_timing_and_log_per_endpoint(self):
+        """Test que se emiten Server-Timing y una línea JSON con el ViewSet, la acción y las consultas"""
+        import json
+        import re
+
+        with self.assertLogs('gym.sql', 'INFO') as logs:
+            response = self.api.get('/api/exercises/by_difficulty/')
+        queries = int(re.search(r'db;desc="(\d+) queries";dur=[\d.]+', response['Server-Timing']).group(1))
+        self.assertIn('db-slowest;dur=', response['Server-Timing'])
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((record['endpoint'], record['action']), ('ExerciseViewSet.by_difficulty', 'by_difficulty'))
+        self.assertEqual(record['queries'], queries)
+        self.assertGreater(queries, 0)
+        self.assertTrue(record['slowest_sql'])
+
+        with self.assertLogs('gym.sql', 'INFO') as logs:
+            self.api.get('/api/leaderboards/')
+        self.assertEqual(json.loads(logs.records[-1].getMessage())['endpoint'], 'leaderboards')
+
+    def test_budgets_log_or_raise(self):
+        """Test que un presupuesto superado se registra o, con action 'raise', lanza una excepción"""
+        from .instrumentation import QueryBudgetExceeded
+
+        with override_settings(SQL_QUERY_BUDGETS={'ClientViewSet.list': {'queries': 1}}):
+            with self.assertLogs('gym.sql', 'WARNING') as logs:
+                self.assertEqual(self.api.get('/api/clients/').status_code, 200)
+            self.assertIn('ClientViewSet.list superó su presupuesto (queries)', logs.output[-1])
+
+        with override_settings(SQL_QUERY_BUDGETS={'*': {'queries': 0, 'action': 'raise'}}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.api.get('/api/exercises/')
+
+    @override_settings(SQL_INSTRUMENTATION=False)
+    def test_disabled_by_default(self):
+        """Test que sin SQL_INSTRUMENTATION no se añade la cabecera"""
+        from rest_framework.test import APIClient
+
+        api = APIClient()
+        self.assertNotIn('Server-Timing', api.get('/api/exercises/'))
+
+
+class BenchmarkHarnessTest(TestCase):
+    """Test para verificar el banco de pruebas de rendimiento de los endpoints"""
+
+    def setUp(self):
+        from .benchmarks import seed_benchmark_data
+
+        self.gym, self.user = seed_benchmark_data(20)
+
+    def test_seed_is_proportional_and_reset(self):
+        """Test que los datos generados son proporcionales a la escala y se borran por completo"""
+        from .benchmarks import reset_benchmark_data
+        from .models import ClientRoutine, Goal, Gym, ProgressMetrics, RoutineAdherence, RoutineProgress
+
+        clients = Client.objects.filter(gym=self.gym)
+        self.assertEqual(clients.count(), 20)
+        self.assertEqual(ClientRoutine.objects.filter(gym=self.gym).count(), 25)
+        self.assertEqual(RoutineProgress.objects.filter(gym=self.gym).count(), 120)
+        self.assertEqual(ProgressMetrics.objects.filter(gym=self.gym).count(), 80)
+        self.assertEqual(Goal.objects.filter(gym=self.gym).count(), 20)
+        self.assertEqual(RoutineAdherence.objects.filter(client_routine__gym=self.gym).count(), 20)
+        for client in clients:
+            self.assertEqual(client.subscription_status, Client.compute_subscription_status(client.subscription_end))
+
+        reset_benchmark_data()
+        self.assertFalse(Gym.objects.filter(pk=self.gym.pk).exists())
+        self.assertFalse(Client.objects.filter(email__endswith='@bench.test').exists())
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+
+    def test_targets_cover_every_router_action(self):
+        """Test que se miden el listado, el detalle y todas las acciones GET de cada ViewSet"""
+        from .benchmarks import benchmark_targets
+        from .urls import router
+
+        sample, targets = benchmark_targets(self.gym)
+        names = {name for name, method, path, payload in targets}
+        for prefix, viewset, basename in router.registry:
+            self.assertIn(f'{viewset.__name__}.list', names)
+            self.assertIn(f'{viewset.__name__}.retrieve', names)
+            for extra in viewset.get_extra_actions():
+                if 'get' in extra.mapping:
+                    self.assertIn(f'{viewset.__name__}.{extra.__name__}', names)
+
+    def test_run_and_compare_to_baseline(self):
+        """Test que se registran latencias, consultas y tamaños, y que se detectan las regresiones"""
+        import copy
+        from .benchmarks import compare_to_baseline, run_benchmark
+
+        only = {'ClientViewSet.list', 'ExerciseViewSet.search', 'RoutineProgressViewSet.bulk', 'leaderboards'}
+        results = run_benchmark(self.gym, self.user, iterations=3, warmup=1, only=only)
+        self.assertEqual(set(results['endpoints']), only)
+        for result in results['endpoints'].values():
+            self.assertEqual(result['status'], 200)
+            self.assertGreater(result['queries'], 0)
+            self.assertGreater(result['bytes'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(compare_to_baseline(results, results), [])
+
+        baseline = copy.deepcopy(results)
+        baseline['endpoints']['ClientViewSet.list']['queries'] -= 1
+        # Por debajo de la mitad menos 10 ms supera siempre el umbral relativo y el mínimo de min_latency_ms
+        baseline['endpoints']['leaderboards']['p50_ms'] = results['endpoints']['leaderboards']['p50_ms'] / 2 - 10
+        baseline['endpoints']['ExerciseViewSet.search']['status'] = 500
+        regressions = compare_to_baseline(results, baseline)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('ClientViewSet.list: consultas'))
+        self.assertTrue(regressions[1].startswith('leaderboards: p50_ms'))
+
+        # Con otro motor no se comparan latencias
+        baseline['vendor'] = 'otro'
+        self.assertEqual(len(compare_to_baseline(results, baseline)), 1)
+
+    def test_erroring_endpoints_are_excluded_from_baseline(self):
+        """Test que los endpoints con 5xx no se guardan en la línea base y se listan por nombre"""
+        import os
+        import tempfile
+        from .benchmarks import compare_to_baseline, load_baseline, save_baseline
+
+        ok = {'method': 'GET', 'status': 200, 'p50_ms': 1.0, 'p99_ms': 2.0, 'queries': 3, 'bytes': 100}
+        results = {'vendor': 'postgresql', 'iterations': 3, 'endpoints': {
+            'ClientViewSet.list': ok, 'ClientViewSet.statistics': {**ok, 'status': 500}
+        }}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            self.assertEqual(save_baseline(path, '1k', results), ['ClientViewSet.statistics'])
+            baseline = load_baseline(path)['1k']
+        self.assertEqual(list(baseline['endpoints']), ['ClientViewSet.list'])
+        self.assertEqual(baseline['excluded'], ['ClientViewSet.statistics'])
+        self.assertEqual(compare_to_baseline(results, baseline), [])
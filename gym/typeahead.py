@@ -0,0 +1,158 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from django.conf import settings
+from django.db import DatabaseError
+from .models import Client, DataVersion, normalize_search
+
+logger = logging.getLogger(__name__)
+
+# Nombre del contador de DataVersion que invalida los índices de todos los workers
+VERSION_NAME = 'clients'
+
+
+def client_keys(name, email, phone):
+    """Claves de búsqueda de un cliente: nombre completo, cada palabra, email y dígitos del teléfono"""
+    keys = set()
+    name = normalize_search(name).strip()
+    if name:
+        keys.add(name)
+        keys.update(name.split())
+    if email:
+        keys.add(email.strip().casefold())
+    digits = re.sub(r'\D', '', phone or '')
+    if digits:
+        keys.add(digits)
+    return keys
+
+
+def normalize_query(query):
+    """Prefijo buscado, normalizado igual que las claves (un teléfono con formato se reduce a dígitos)"""
+    query = normalize_search(query).strip()
+    if query and re.fullmatch(r'[\d\s()+.-]+', query):
+        return re.sub(r'\D', '', query)
+    return query
+
+
+class ClientTypeahead:
+    """
+    Índice de prefijos en memoria del proceso sobre nombre, email y teléfono de los clientes.
+
+    Las claves se guardan en una lista ordenada de tuplas (clave, client_id): una
+    búsqueda es un bisect hasta el primer prefijo y un recorrido de las entradas
+    que empiezan por él, sin consultas a la base de datos. Cada cliente guarda su
+    gimnasio para limitar las sugerencias al de la petición. Los cambios de este
+    worker se aplican con las señales de Client; los de otros workers se detectan
+    comparando la versión 'clients' de DataVersion, como mucho una vez cada
+    TYPEAHEAD_RESYNC_INTERVAL segundos, y provocan una recarga completa.
+    """
+
+    def __init__(self, resync_interval=1.0, chunk_size=2000):
+        self.resync_interval = resync_interval
+        self.chunk_size = chunk_size
+        self.version = None
+        self._keys = []
+        self._clients = {}
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+
+    def load(self):
+        """Reconstruir el índice completo recorriendo los clientes por bloques"""
+        version = DataVersion.current(VERSION_NAME)
+        keys = []
+        clients = {}
+        rows = Client.objects.order_by().values_list('id', 'name', 'email', 'phone', 'gym_id')
+        for client_id, name, email, phone, gym_id in rows.iterator(chunk_size=self.chunk_size):
+            clients[client_id] = {'id': client_id, 'name': name, 'email': email, 'phone': phone, 'gym_id': gym_id}
+            keys.extend((key, client_id) for key in client_keys(name, email, phone))
+        keys.sort()
+        with self._lock:
+            self._keys = keys
+            self._clients = clients
+            self.version = version
+            self._checked_at = time.monotonic()
+
+    def ensure_current(self):
+        """Recargar si el índice está vacío o si otro worker cambió clientes"""
+        now = time.monotonic()
+        if self.version is not None and now - self._checked_at < self.resync_interval:
+            return
+        with self._lock:
+            if self.version is not None and now - self._checked_at < self.resync_interval:
+                return
+            if self.version is None or DataVersion.current(VERSION_NAME) != self.version:
+                self.load()
+            else:
+                self._checked_at = now
+
+    def _remove(self, client_id):
+        entry = self._clients.pop(client_id, None)
+        if entry is None:
+            return
+        for key in client_keys(entry['name'], entry['email'], entry['phone']):
+            index = bisect_left(self._keys, (key, client_id))
+            if index < len(self._keys) and self._keys[index] == (key, client_id):
+                del self._keys[index]
+
+    def apply(self, client_id, name=None, email=None, phone=None, deleted=False, gym_id=None):
+        """Aplicar el alta, modificación o borrado de un cliente hecho por este worker"""
+        with self._lock:
+            if self.version is None:
+                # Aún no cargado: la primera búsqueda leerá el estado completo
+                return
+            self._remove(client_id)
+            if not deleted:
+                self._clients[client_id] = {'id': client_id, 'name': name, 'email': email, 'phone': phone, 'gym_id': gym_id}
+                for key in client_keys(name, email, phone):
+                    insort(self._keys, (key, client_id))
+            # Si solo ha cambiado nuestra escritura no hace falta recargar
+            current = DataVersion.current(VERSION_NAME)
+            if current == self.version + 1:
+                self.version = current
+
+    def search(self, query, limit=10, gym_id=None):
+        """Clientes (del gimnasio `gym_id`, si se indica) cuyo nombre o alguna palabra, email o teléfono empieza por `query`"""
+        prefix = normalize_query(query)
+        if not prefix:
+            return []
+        self.ensure_current()
+        with self._lock:
+            found = {}
+            index = bisect_left(self._keys, (prefix,))
+            while index < len(self._keys) and len(found) < limit:
+                key, client_id = self._keys[index]
+                if not key.startswith(prefix):
+                    break
+                client = self._clients[client_id]
+                if gym_id is None or client['gym_id'] == gym_id:
+                    found.setdefault(client_id, client)
+                index += 1
+        return sorted(found.values(), key=lambda client: (client['name'], client['id']))
+
+    def __len__(self):
+        return len(self._clients)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_client_typeahead():
+    """Índice de typeahead de este proceso"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ClientTypeahead(resync_interval=settings.TYPEAHEAD_RESYNC_INTERVAL)
+    return _index
+
+
+def warm_client_typeahead():
+    """Cargar el índice al arrancar el servidor para que la primera búsqueda no pague la carga"""
+    try:
+        get_client_typeahead().load()
+    except DatabaseError as e:
+        # Sin base de datos disponible (p. ej. antes de migrar): se cargará en la primera búsqueda
+        logger.warning(f"No se pudo precargar el typeahead de clientes: {e}")
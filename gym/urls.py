@@ -3,7 +3,8 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     ClientViewSet, ExerciseViewSet, WorkoutViewSet, WorkoutSetViewSet,
     RoutineViewSet, ClientRoutineViewSet, RoutineProgressViewSet,
-    ProgressMetricsViewSet, GoalViewSet, client_login, user_profile
+    ProgressMetricsViewSet, GoalViewSet, client_login, user_profile, cohort_analytics, sync,
+    event_stream, leaderboards
 )
 
 router = DefaultRouter()
@@ -21,4 +22,8 @@ urlpatterns = [
     path('api/', include(router.urls)),
     path('api/client-login/', client_login, name='client_login'),
     path('api/user-profile/', user_profile, name='user_profile'),
+    path('api/analytics/cohorts/', cohort_analytics, name='cohort_analytics'),
+    path('api/leaderboards/', leaderboards, name='leaderboards'),
+    path('api/sync/', sync, name='sync'),
+    path('api/events/', event_stream, name='event_stream'),
 ] 
\ No newline at end of file
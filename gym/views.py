@@ -1,47 +1,114 @@
+import asyncio
+import csv
+import json
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
-from django.db import models
+from django.http import StreamingHttpResponse, JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.conf import settings
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
 from django.contrib.auth import authenticate
-from django_filters.rest_framework import DjangoFilterBackend
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from .filters import ClientFilter, RoutineFilter, ExerciseFilter, WorkoutFilter, GoalFilter
+from .analytics import (
+    progress_timeseries, cohort_statistics, refresh_adherence, record_completions, leaderboard,
+    METRIC_COLUMNS, BUCKETS, GROUP_BY_CHOICES, LEADERBOARD_METRICS
+)
+from .pagination import CachedCountPagination
+from .permissions import IsOwner
+from .routers import ReplicaReadViewSetMixin, replica_read_view, replica_reads
+from .renderers import CSVStreamingRenderer, NDJSONStreamingRenderer
+from .sync import changes_since, decode_token
+from .events import broker, ensure_listener, publish, EVENT_TYPES
+from .tenancy import (
+    GymFilterBackend, GymScopedViewSetMixin, allows_unscoped, resolve_gym, scope_queryset, user_gym_id
+)
+from .typeahead import get_client_typeahead
+from .filters import ClientFilter, RoutineFilter, ExerciseFilter, WorkoutFilter, GoalFilter, search_exercises
 from .models import (
-    Client, Exercise, Workout, WorkoutSet, Routine, 
-    ClientRoutine, RoutineProgress, ProgressMetrics, Goal
+    normalize_search, Client, Exercise, Workout, WorkoutSet, Routine, 
+    ClientRoutine, RoutineProgress, ProgressMetrics, Goal, RoutineAdherence, WEEKDAYS
 )
 from .serializers import (
     ClientSerializer, ExerciseSerializer, WorkoutSerializer, WorkoutSetSerializer,
     RoutineSerializer, ClientRoutineSerializer, RoutineProgressSerializer,
     ProgressMetricsSerializer, GoalSerializer, WorkoutCreateSerializer, RoutineCreateSerializer,
-    UserProfileSerializer, ProfileImageUploadSerializer
+    UserProfileSerializer, ProfileImageUploadSerializer, RoutineAdherenceSerializer,
+    ClientRoutineRosterSerializer, WorkoutCompletionSerializer, GymTokenObtainPairSerializer
+)
+from .services import (
+    upload_file_to_s3, upload_files_to_s3, delete_file_from_s3, S3MultipartUploadHandler,
+    get_presigned_url
 )
-from .services import upload_file_to_s3, delete_file_from_s3
 
 # Create your views here.
 
-class ClientViewSet(viewsets.ModelViewSet):
+class Echo:
+    """Pseudo-buffer para csv.writer: devuelve cada línea en lugar de acumularla"""
+
+    def write(self, value):
+        return value
+
+
+def stream_rows(rows, fieldnames, export_format, filename):
+    """Construye una StreamingHttpResponse CSV o NDJSON a partir de un iterador de dicts"""
+    if export_format == 'ndjson':
+        content = (json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows)
+        response = StreamingHttpResponse(content, content_type='application/x-ndjson')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.ndjson"'
+        return response
+
+    writer = csv.DictWriter(Echo(), fieldnames=fieldnames)
+
+    def content():
+        yield writer.writeheader()
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(content(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+class ClientViewSet(ReplicaReadViewSetMixin, GymScopedViewSetMixin, viewsets.ModelViewSet):
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filter_backends = [GymFilterBackend, filters.OrderingFilter]
     filterset_class = ClientFilter
-    ordering_fields = ['name', 'join_date', 'birth_date', 'weight', 'height']
+    ordering_fields = ['name', 'join_date', 'birth_date', 'weight', 'height', 'adherence_rate']
     ordering = ['-join_date']  # Más reciente primero
 
+    def get_queryset(self):
+        """Anotar la adherencia media de las rutinas activas para poder mostrarla y ordenar por ella"""
+        adherence = RoutineAdherence.objects.filter(
+            client_routine__client=models.OuterRef('pk'),
+            client_routine__is_active=True
+        ).values('client_routine__client').annotate(
+            average=models.Avg('adherence_rate')
+        ).values('average')
+        return super().get_queryset().annotate(
+            adherence_rate=models.Subquery(adherence[:1], output_field=models.FloatField())
+        )
+
     @swagger_auto_schema(
         operation_description="Lista de clientes con ordenamiento configurable",
         manual_parameters=[
             openapi.Parameter(
                 'ordering',
                 openapi.IN_QUERY,
-                description="Campo de ordenamiento. Usar '-' para orden descendente. Ejemplos: 'name', '-join_date', 'weight'",
+                description="Campo de ordenamiento. Usar '-' para orden descendente. Ejemplos: 'name', '-join_date', 'weight', 'adherence_rate'",
                 type=openapi.TYPE_STRING,
-                enum=['name', '-name', 'join_date', '-join_date', 'birth_date', '-birth_date', 'weight', '-weight', 'height', '-height']
+                enum=['name', '-name', 'join_date', '-join_date', 'birth_date', '-birth_date', 'weight', '-weight', 'height', '-height', 'adherence_rate', '-adherence_rate']
             ),
             openapi.Parameter(
                 'search',
@@ -54,11 +121,58 @@ class ClientViewSet(viewsets.ModelViewSet):
                 openapi.IN_QUERY,
                 description="Número de página",
                 type=openapi.TYPE_INTEGER
+            ),
+            openapi.Parameter(
+                'facets',
+                openapi.IN_QUERY,
+                description="Con 1 se incluye 'facets': número de clientes de cada opción de 'filter' "
+                            "aplicando el resto de filtros activos",
+                type=openapi.TYPE_BOOLEAN
             )
         ]
     )
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get('facets') in ('1', 'true', 'True'):
+            response.data['facets'] = self.facet_counts(request)
+        return response
+
+    def facet_counts(self, request):
+        """Conteos para las insignias de `filter`: todos los filtros activos salvo el propio `filter`"""
+        params = request.query_params.copy()
+        params.pop('filter', None)
+        filterset = ClientFilter(params, queryset=Client.objects.all(), request=request)
+        return ClientFilter.facet_counts(filterset.qs)
+
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Sugerencias de clientes para recepción: nombre (o cualquier palabra), email o teléfono "
+                              "que empieza por q. Se resuelve en memoria, sin consultar la base de datos.",
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, description="Primeros caracteres", type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Sugerencias (1-20, por defecto 10)", type=openapi.TYPE_INTEGER)
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def typeahead(self, request):
+        """Búsqueda por prefijo sobre el índice en memoria del worker"""
+        query = request.query_params.get('q', '')
+        if not query.strip():
+            return Response(
+                {'error': 'El parámetro q es requerido'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= 20:
+            return Response(
+                {'error': 'limit debe ser un entero entre 1 y 20'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(get_client_typeahead().search(query, limit=limit, gym_id=request.gym_id))
 
     @action(detail=True, methods=['get'])
     def progress(self, request, pk=None):
@@ -108,7 +222,7 @@ class ClientViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def all_credentials(self, request):
         """Obtener las credenciales de acceso de todos los clientes"""
-        clients = self.get_queryset().filter(user__isnull=False)
+        clients = self.get_queryset().filter(user__isnull=False).select_related('user')
         credentials_list = []
         
         for client in clients:
@@ -124,39 +238,127 @@ class ClientViewSet(viewsets.ModelViewSet):
         
         return Response(credentials_list)
 
+    EXPORT_CHUNK_SIZE = 2000
+    EXPORT_FIELDS = [
+        'id', 'name', 'email', 'phone', 'username', 'birth_date', 'age', 'weight', 'height',
+        'join_date', 'subscription_type', 'subscription_start', 'subscription_end',
+        'emergency_contact', 'medical_conditions'
+    ]
+    CREDENTIALS_EXPORT_FIELDS = [
+        'client_id', 'client_name', 'username', 'email', 'default_password', 'age', 'birth_date'
+    ]
+
+    def iter_export_queryset(self, queryset):
+        """Recorre el queryset filtrado sin paginación, por bloques y con cursor de servidor"""
+        return self.filter_queryset(queryset).select_related('user').iterator(
+            chunk_size=self.EXPORT_CHUNK_SIZE
+        )
+
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Exportar el listado de clientes en streaming (CSV o NDJSON). "
+                              "Admite los mismos filtros y ordenamiento que el listado.",
+        manual_parameters=[
+            openapi.Parameter(
+                'format',
+                openapi.IN_QUERY,
+                description="Formato de exportación",
+                type=openapi.TYPE_STRING,
+                enum=['csv', 'ndjson']
+            )
+        ]
+    )
+    @action(detail=False, methods=['get'], renderer_classes=[CSVStreamingRenderer, NDJSONStreamingRenderer])
+    def export(self, request):
+        """Exportar clientes en streaming sin cargar el listado completo en memoria"""
+        # El queryset se construye aquí, dentro de dispatch, para que quede fijado a la réplica
+        clients = self.iter_export_queryset(self.get_queryset())
+
+        def rows():
+            for client in clients:
+                yield {
+                    'id': client.id,
+                    'name': client.name,
+                    'email': client.email,
+                    'phone': client.phone,
+                    'username': client.user.username if client.user else None,
+                    'birth_date': client.birth_date,
+                    'age': client.age,
+                    'weight': client.weight,
+                    'height': client.height,
+                    'join_date': client.join_date,
+                    'subscription_type': client.subscription_type,
+                    'subscription_start': client.subscription_start,
+                    'subscription_end': client.subscription_end,
+                    'emergency_contact': client.emergency_contact,
+                    'medical_conditions': client.medical_conditions
+                }
+
+        return stream_rows(rows(), self.EXPORT_FIELDS, request.accepted_renderer.format, 'clients')
+
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Exportar las credenciales de acceso de los clientes en streaming (CSV o NDJSON). "
+                              "Admite los mismos filtros que el listado.",
+        manual_parameters=[
+            openapi.Parameter(
+                'format',
+                openapi.IN_QUERY,
+                description="Formato de exportación",
+                type=openapi.TYPE_STRING,
+                enum=['csv', 'ndjson']
+            )
+        ]
+    )
+    @action(detail=False, methods=['get'], renderer_classes=[CSVStreamingRenderer, NDJSONStreamingRenderer])
+    def export_credentials(self, request):
+        """Exportar credenciales de todos los clientes en streaming"""
+        clients = self.iter_export_queryset(self.get_queryset().filter(user__isnull=False))
+
+        def rows():
+            for client in clients:
+                yield {
+                    'client_id': client.id,
+                    'client_name': client.name,
+                    'username': client.user.username,
+                    'email': client.user.email,
+                    'default_password': client.generate_default_password(),
+                    'age': client.age,
+                    'birth_date': client.birth_date
+                }
+
+        return stream_rows(rows(), self.CREDENTIALS_EXPORT_FIELDS, request.accepted_renderer.format, 'credentials')
+
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """Obtener estadísticas de los clientes"""
         from django.db.models import Avg, Count, Min, Max
-        from django.utils import timezone
         
-        total_clients = Client.objects.count()
-        active_subscriptions = Client.objects.filter(
-            models.Q(subscription_end__isnull=True) | 
-            models.Q(subscription_end__gt=timezone.now().date())
-        ).count()
+        clients = self.get_queryset()
+        total_clients = clients.count()
+        active_subscriptions = clients.filter(subscription_status__in=['active', 'expiring']).count()
         
         # Estadísticas por tipo de suscripción
-        subscription_stats = Client.objects.values('subscription_type').annotate(
+        subscription_stats = clients.values('subscription_type').annotate(
             count=Count('id')
         )
         
         # Estadísticas de edad
-        age_stats = Client.objects.aggregate(
+        age_stats = clients.aggregate(
             avg_age=Avg('age'),
             min_age=Min('age'),
             max_age=Max('age')
         )
         
         # Estadísticas de peso
-        weight_stats = Client.objects.aggregate(
+        weight_stats = clients.aggregate(
             avg_weight=Avg('weight'),
             min_weight=Min('weight'),
             max_weight=Max('weight')
         )
         
         # Clientes por mes de registro
-        monthly_registrations = Client.objects.extra(
+        monthly_registrations = clients.extra(
             select={'month': "EXTRACT(month FROM join_date)"}
         ).values('month').annotate(count=Count('id')).order_by('month')
         
@@ -207,48 +409,64 @@ class ClientViewSet(viewsets.ModelViewSet):
         """Subir imagen de perfil del cliente a S3"""
         client = self.get_object()
         
-        if 'profile_image' not in request.FILES:
+        # Validar tipo de archivo y tamaño mientras se recibe, sin cargar la imagen en memoria
+        handler = S3MultipartUploadHandler(
+            request,
+            folder="profiles",
+            max_size=settings.PROFILE_IMAGE_MAX_SIZE,
+            allowed_types=['image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'image/webp']
+        )
+        request.upload_handlers = [handler]
+        
+        try:
+            file = request.FILES.get('profile_image')
+        finally:
+            # Si el cliente se desconecta a mitad de la subida, descartar las partes ya enviadas
+            handler.abort()
+        
+        if handler.error == 'too_large':
             return Response(
-                {'error': 'Se requiere el archivo profile_image'}, 
-                status=status.HTTP_400_BAD_REQUEST
+                {'error': f'La imagen supera el tamaño máximo de {settings.PROFILE_IMAGE_MAX_SIZE // (1024 * 1024)} MB'}, 
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
             )
         
-        file = request.FILES['profile_image']
-        
-        # Validar tipo de archivo
-        allowed_types = ['image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'image/webp']
-        if file.content_type not in allowed_types:
+        if handler.error == 'invalid_type':
             return Response(
                 {'error': 'Tipo de archivo no permitido. Use JPG, PNG, GIF o WebP'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Eliminar imagen anterior si existe
-        if client.profile_image:
-            delete_file_from_s3(client.profile_image)
-        
-        # Subir nueva imagen
-        file_url = upload_file_to_s3(file, folder="profiles")
-        
-        if not file_url:
+        if handler.error == 'storage':
             return Response(
                 {'error': 'Error al subir la imagen'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
         
+        if file is None:
+            return Response(
+                {'error': 'Se requiere el archivo profile_image'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        file_url = file.url
+        
+        # Eliminar imagen anterior una vez que la nueva ya está almacenada
+        if client.profile_image:
+            delete_file_from_s3(client.profile_image)
+        
         # Actualizar cliente
         client.profile_image = file_url
-        client.save(update_fields=['profile_image'])
+        client.save(update_fields=['profile_image', 'updated_at'])
         
         return Response({
-            'profile_image': file_url,
+            'profile_image': get_presigned_url(file_url),
             'message': 'Imagen de perfil actualizada exitosamente'
         })
 
-class ExerciseViewSet(viewsets.ModelViewSet):
+class ExerciseViewSet(ReplicaReadViewSetMixin, GymScopedViewSetMixin, viewsets.ModelViewSet):
     queryset = Exercise.objects.all()
     serializer_class = ExerciseSerializer
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filter_backends = [GymFilterBackend, filters.OrderingFilter]
     filterset_class = ExerciseFilter
     ordering_fields = ['name', 'difficulty']
     ordering = ['name']
@@ -284,7 +502,7 @@ class ExerciseViewSet(viewsets.ModelViewSet):
     def by_difficulty(self, request):
         """Obtener ejercicios por nivel de dificultad"""
         difficulty = request.query_params.get('difficulty', 'beginner')
-        exercises = self.queryset.filter(difficulty=difficulty)
+        exercises = self.get_queryset().filter(difficulty=difficulty)
         serializer = self.get_serializer(exercises, many=True)
         return Response(serializer.data)
 
@@ -292,13 +510,68 @@ class ExerciseViewSet(viewsets.ModelViewSet):
     def by_muscle_group(self, request):
         """Obtener ejercicios por grupo muscular"""
         muscle_group = request.query_params.get('muscle_group', '')
-        exercises = self.queryset.filter(muscle_groups__contains=[muscle_group])
+        exercises = self.get_queryset().filter(muscle_groups__contains=[muscle_group])
         serializer = self.get_serializer(exercises, many=True)
         return Response(serializer.data)
 
-class WorkoutViewSet(viewsets.ModelViewSet):
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Búsqueda sin acentos en nombre y descripción ('cuadriceps' encuentra 'Cuádriceps'). "
+                              "Las coincidencias en el nombre aparecen antes que las de la descripción.",
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, description="Texto a buscar", type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('page', openapi.IN_QUERY, description="Número de página", type=openapi.TYPE_INTEGER)
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Buscar ejercicios ordenados por relevancia"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'El parámetro q es requerido'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        exercises = search_exercises(self.get_queryset(), query)
+        page = self.paginate_queryset(exercises)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Nombres de ejercicios que empiezan por q (sin acentos), resueltos con el índice de prefijo",
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, description="Prefijo del nombre", type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Sugerencias (1-20, por defecto 10)", type=openapi.TYPE_INTEGER)
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Sugerencias de nombres de ejercicio por prefijo"""
+        prefix = normalize_search(request.query_params.get('q', '')).strip()
+        if not prefix:
+            return Response(
+                {'error': 'El parámetro q es requerido'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= 20:
+            return Response(
+                {'error': 'limit debe ser un entero entre 1 y 20'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Ordenar por la columna indexada permite leer solo las primeras entradas del índice
+        suggestions = self.get_queryset().filter(search_name__startswith=prefix).order_by('search_name', 'id')
+        return Response(list(suggestions.values('id', 'name')[:limit]))
+
+class WorkoutViewSet(ReplicaReadViewSetMixin, GymScopedViewSetMixin, viewsets.ModelViewSet):
     queryset = Workout.objects.all()
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filter_backends = [GymFilterBackend, filters.OrderingFilter]
     filterset_class = WorkoutFilter
     ordering_fields = ['name', 'difficulty', 'estimated_duration']
     ordering = ['name']
@@ -347,14 +620,15 @@ class WorkoutViewSet(viewsets.ModelViewSet):
     def by_category(self, request):
         """Obtener workouts por categoría"""
         category = request.query_params.get('category', 'strength')
-        workouts = self.queryset.filter(category=category)
+        workouts = self.get_queryset().filter(category=category)
         serializer = self.get_serializer(workouts, many=True)
         return Response(serializer.data)
 
-class WorkoutSetViewSet(viewsets.ModelViewSet):
+class WorkoutSetViewSet(ReplicaReadViewSetMixin, GymScopedViewSetMixin, viewsets.ModelViewSet):
     queryset = WorkoutSet.objects.all()
     serializer_class = WorkoutSetSerializer
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    gym_field = 'workout__gym'
+    filter_backends = [GymFilterBackend, filters.OrderingFilter]
     filterset_fields = ['workout', 'exercise', 'completed']
     ordering_fields = ['reps', 'weight', 'rest_time']
     ordering = ['-id']  # Más reciente primero
@@ -380,10 +654,10 @@ class WorkoutSetViewSet(viewsets.ModelViewSet):
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
-class RoutineViewSet(viewsets.ModelViewSet):
+class RoutineViewSet(ReplicaReadViewSetMixin, GymScopedViewSetMixin, viewsets.ModelViewSet):
     queryset = Routine.objects.all()
     serializer_class = RoutineSerializer
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filter_backends = [GymFilterBackend, filters.OrderingFilter]
     filterset_class = RoutineFilter
     ordering_fields = ['name', 'duration', 'days_per_week', 'frequency']
     ordering = ['name']
@@ -432,7 +706,7 @@ class RoutineViewSet(viewsets.ModelViewSet):
     def by_frequency(self, request):
         """Obtener rutinas por frecuencia"""
         frequency = request.query_params.get('frequency', 'weekly')
-        routines = self.queryset.filter(frequency=frequency)
+        routines = self.get_queryset().filter(frequency=frequency)
         serializer = self.get_serializer(routines, many=True)
         return Response(serializer.data)
 
@@ -441,36 +715,37 @@ class RoutineViewSet(viewsets.ModelViewSet):
         """Obtener estadísticas de las rutinas"""
         from django.db.models import Avg, Count, Min, Max
         
-        total_routines = Routine.objects.count()
+        routines = self.get_queryset()
+        total_routines = routines.count()
         
         # Estadísticas por frecuencia
-        frequency_stats = Routine.objects.values('frequency').annotate(
+        frequency_stats = routines.values('frequency').annotate(
             count=Count('id')
         )
         
         # Estadísticas de duración
-        duration_stats = Routine.objects.aggregate(
+        duration_stats = routines.aggregate(
             avg_duration=Avg('duration'),
             min_duration=Min('duration'),
             max_duration=Max('duration')
         )
         
         # Estadísticas de días por semana
-        days_stats = Routine.objects.aggregate(
+        days_stats = routines.aggregate(
             avg_days=Avg('days_per_week'),
             min_days=Min('days_per_week'),
             max_days=Max('days_per_week')
         )
         
         # Rutinas por número de workouts
-        workout_count_stats = Routine.objects.annotate(
+        workout_count_stats = routines.annotate(
             workout_count=Count('workouts')
         ).values('workout_count').annotate(
             routine_count=Count('id')
         ).order_by('workout_count')
         
         # Rutinas más populares (con más clientes asignados)
-        popular_routines = Routine.objects.annotate(
+        popular_routines = routines.annotate(
             client_count=Count('client_routines')
         ).order_by('-client_count')[:10]
         
@@ -493,10 +768,10 @@ class RoutineViewSet(viewsets.ModelViewSet):
             'popular_routines': popular_routines_data
         })
 
-class ClientRoutineViewSet(viewsets.ModelViewSet):
+class ClientRoutineViewSet(ReplicaReadViewSetMixin, GymScopedViewSetMixin, viewsets.ModelViewSet):
     queryset = ClientRoutine.objects.all()
     serializer_class = ClientRoutineSerializer
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filter_backends = [GymFilterBackend, filters.OrderingFilter]
     filterset_fields = ['client', 'routine', 'is_active', 'start_date']
     ordering_fields = ['start_date', 'end_date']
     ordering = ['-start_date']
@@ -594,6 +869,136 @@ class ClientRoutineViewSet(viewsets.ModelViewSet):
         serializer = RoutineProgressSerializer(progress, many=True)
         return Response(serializer.data)
 
+    @swagger_auto_schema(
+        operation_description="Asignaciones activas programadas para un día (por defecto hoy). "
+                              "Con 'weekday' se listan todas las activas de ese día de la semana, sin filtrar por fechas.",
+        manual_parameters=[
+            openapi.Parameter(
+                'date',
+                openapi.IN_QUERY,
+                description="Fecha (YYYY-MM-DD). Por defecto: hoy",
+                type=openapi.TYPE_STRING,
+                format='date'
+            ),
+            openapi.Parameter(
+                'weekday',
+                openapi.IN_QUERY,
+                description="Día de la semana",
+                type=openapi.TYPE_STRING,
+                enum=['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+            ),
+            openapi.Parameter(
+                'page',
+                openapi.IN_QUERY,
+                description="Número de página",
+                type=openapi.TYPE_INTEGER
+            )
+        ],
+        responses={200: ClientRoutineRosterSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'])
+    def today(self, request):
+        """Clientes que entrenan hoy (o en la fecha/día indicado)"""
+        queryset = self.filter_queryset(self.get_queryset()).filter(is_active=True)
+
+        weekday = request.query_params.get('weekday')
+        if weekday:
+            if weekday not in WEEKDAYS:
+                return Response(
+                    {'error': f"weekday inválido. Opciones: {', '.join(WEEKDAYS)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            day_index = WEEKDAYS.index(weekday)
+        else:
+            day = timezone.localdate()
+            if request.query_params.get('date'):
+                try:
+                    day = parse_date(request.query_params['date'])
+                except ValueError:
+                    # Fecha bien formada pero imposible (p. ej. 2025-02-30)
+                    day = None
+                if day is None:
+                    return Response(
+                        {'error': 'date debe tener formato YYYY-MM-DD'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+            day_index = day.weekday()
+            queryset = queryset.filter(start_date__lte=day).filter(
+                models.Q(end_date__isnull=True) | models.Q(end_date__gte=day)
+            )
+
+        # Predicado de bits sobre assigned_days_mask (índice is_active, assigned_days_mask)
+        queryset = queryset.alias(
+            scheduled=models.F('assigned_days_mask').bitand(1 << day_index)
+        ).filter(scheduled__gt=0).select_related('client', 'routine').order_by('client__name', 'id')
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = ClientRoutineRosterSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = ClientRoutineRosterSerializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def adherence(self, request, pk=None):
+        """Obtener la adherencia de una rutina de cliente (sesiones programadas frente a completadas)"""
+        client_routine = self.get_object()
+        adherence = RoutineAdherence.objects.filter(client_routine=client_routine).first()
+        # Las sesiones programadas crecen cada día: recalcular si el resumen es de un día anterior
+        if adherence is None or adherence.computed_on < timezone.localdate():
+            # Recalcular y releer en el primario: la réplica aún no tiene el resumen recién escrito
+            with replica_reads(False):
+                refresh_adherence([client_routine.pk])
+                adherence = RoutineAdherence.objects.get(client_routine=client_routine)
+        serializer = RoutineAdherenceSerializer(adherence)
+        return Response(serializer.data)
+
+    @swagger_auto_schema(
+        operation_description="Adherencia de las rutinas de clientes, de menor a mayor. "
+                              "Acepta los mismos filtros que el listado (client, routine, is_active, start_date).",
+        manual_parameters=[
+            openapi.Parameter(
+                'max_rate',
+                openapi.IN_QUERY,
+                description="Solo asignaciones con adherencia menor o igual a este valor (0-1)",
+                type=openapi.TYPE_NUMBER
+            ),
+            openapi.Parameter(
+                'page',
+                openapi.IN_QUERY,
+                description="Número de página",
+                type=openapi.TYPE_INTEGER
+            )
+        ],
+        responses={200: RoutineAdherenceSerializer(many=True)}
+    )
+    @action(detail=False, methods=['get'], url_path='adherence')
+    def adherence_report(self, request):
+        """Listado de adherencia, con las asignaciones menos cumplidas primero"""
+        assignments = self.filter_queryset(self.get_queryset())
+        queryset = RoutineAdherence.objects.filter(
+            client_routine__in=assignments.values('pk')
+        ).select_related('client_routine').order_by(
+            models.F('adherence_rate').asc(nulls_last=True), 'client_routine_id'
+        )
+
+        max_rate = request.query_params.get('max_rate')
+        if max_rate is not None:
+            try:
+                queryset = queryset.filter(adherence_rate__lte=float(max_rate))
+            except ValueError:
+                return Response(
+                    {'error': 'max_rate debe ser un número'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = RoutineAdherenceSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = RoutineAdherenceSerializer(queryset, many=True)
+        return Response(serializer.data)
+
     @action(detail=True, methods=['post'])
     def complete_workout(self, request, pk=None):
         """Marcar un workout como completado"""
@@ -603,10 +1008,11 @@ class ClientRoutineViewSet(viewsets.ModelViewSet):
         rating = request.data.get('rating', None)
         
         try:
-            workout = Workout.objects.get(id=workout_id)
+            workout = scope_queryset(Workout.objects.all(), request.gym_id).get(id=workout_id)
             progress = RoutineProgress.objects.create(
                 client_routine=client_routine,
                 workout=workout,
+                completed_at=timezone.now(),
                 notes=notes,
                 rating=rating
             )
@@ -618,10 +1024,11 @@ class ClientRoutineViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-class RoutineProgressViewSet(viewsets.ModelViewSet):
+class RoutineProgressViewSet(ReplicaReadViewSetMixin, GymScopedViewSetMixin, viewsets.ModelViewSet):
     queryset = RoutineProgress.objects.all()
     serializer_class = RoutineProgressSerializer
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    pagination_class = CachedCountPagination
+    filter_backends = [GymFilterBackend, filters.OrderingFilter]
     filterset_fields = ['client_routine', 'workout', 'completed_at']
     ordering_fields = ['completed_at', 'rating']
     ordering = ['-completed_at']
@@ -647,10 +1054,159 @@ class RoutineProgressViewSet(viewsets.ModelViewSet):
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
-class ProgressMetricsViewSet(viewsets.ModelViewSet):
+    @swagger_auto_schema(
+        operation_description="Registrar en bloque entrenamientos completados (dispositivos offline). "
+                              "Cada elemento lleva una idempotency_key generada por el dispositivo: "
+                              "reenviar el mismo elemento devuelve 'duplicate' en lugar de crear otro registro.",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['completions'],
+            properties={
+                'completions': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        required=['idempotency_key', 'client_routine_id', 'workout_id'],
+                        properties={
+                            'idempotency_key': openapi.Schema(type=openapi.TYPE_STRING, format='uuid'),
+                            'client_routine_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                            'workout_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                            'completed_at': openapi.Schema(type=openapi.TYPE_STRING, format='date-time', description='Por defecto: ahora'),
+                            'notes': openapi.Schema(type=openapi.TYPE_STRING),
+                            'rating': openapi.Schema(type=openapi.TYPE_INTEGER),
+                        }
+                    )
+                )
+            }
+        )
+    )
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Registrar varias finalizaciones en una sola transacción, de forma idempotente"""
+        completions = request.data.get('completions')
+        if not isinstance(completions, list) or not completions:
+            return Response(
+                {'error': 'completions debe ser una lista no vacía'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(completions) > settings.WORKOUT_COMPLETIONS_MAX_ITEMS:
+            return Response(
+                {'error': f'Se permiten como máximo {settings.WORKOUT_COMPLETIONS_MAX_ITEMS} elementos por solicitud'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Validar el formato de cada elemento sin tocar la base de datos
+        results = []
+        items = []
+        for index, item in enumerate(completions):
+            serializer = WorkoutCompletionSerializer(data=item)
+            if serializer.is_valid():
+                items.append((index, serializer.validated_data))
+                results.append(None)
+            else:
+                results.append({
+                    'index': index,
+                    'idempotency_key': item.get('idempotency_key') if isinstance(item, dict) else None,
+                    'status': 'invalid',
+                    'errors': serializer.errors
+                })
+
+        # Una consulta por tabla para validar referencias y detectar reenvíos
+        workout_ids = set(scope_queryset(Workout.objects.all(), request.gym_id).filter(
+            id__in={data['workout_id'] for _, data in items}
+        ).values_list('id', flat=True))
+        assignment_rows = scope_queryset(ClientRoutine.objects.all(), request.gym_id).filter(
+            id__in={data['client_routine_id'] for _, data in items}
+        ).values_list('id', 'client_id', 'routine_id', 'gym_id')
+        client_routines = {pk: (client_id, routine_id) for pk, client_id, routine_id, _ in assignment_rows}
+        assignment_gyms = {pk: gym_id for pk, _, _, gym_id in assignment_rows}
+        gym_progress = scope_queryset(RoutineProgress.objects.all(), request.gym_id)
+        existing = dict(gym_progress.filter(
+            idempotency_key__in=[data['idempotency_key'] for _, data in items]
+        ).values_list('idempotency_key', 'id'))
+
+        now = timezone.now()
+        pending = {}
+        pending_indexes = {}
+        for index, data in items:
+            key = data['idempotency_key']
+            result = {'index': index, 'idempotency_key': str(key)}
+            if data['workout_id'] not in workout_ids:
+                result.update(status='invalid', errors={'workout_id': ['Workout no encontrado']})
+            elif data['client_routine_id'] not in client_routines:
+                result.update(status='invalid', errors={'client_routine_id': ['Rutina de cliente no encontrada']})
+            elif key in existing or key in pending:
+                result.update(status='duplicate')
+            else:
+                result.update(status='created')
+                pending_indexes[key] = index
+                pending[key] = RoutineProgress(
+                    client_routine_id=data['client_routine_id'],
+                    gym_id=assignment_gyms[data['client_routine_id']],
+                    workout_id=data['workout_id'],
+                    completed_at=data.get('completed_at') or now,
+                    notes=data.get('notes'),
+                    rating=data.get('rating'),
+                    idempotency_key=key
+                )
+            results[index] = result
+
+        created = {}
+        if pending:
+            with transaction.atomic():
+                # Solo cuenta lo que inserta esta petición: un reenvío concurrente con la misma clave queda como duplicado
+                inserted = RoutineProgress.insert_new(pending.values())
+                created = {key: progress for key, progress in pending.items() if key in inserted}
+                # La inserción no emite post_save: actualizar la adherencia una vez por asignación
+                if created:
+                    refresh_adherence({progress.client_routine_id for progress in created.values()})
+                    record_completions(created.values(), assignments=client_routines)
+            existing.update(inserted)
+            lost = [key for key in pending if key not in inserted]
+            if lost:
+                # Una clave usada en otro gimnasio también es un duplicado, pero sin revelar su id
+                existing.update(gym_progress.filter(
+                    idempotency_key__in=lost
+                ).values_list('idempotency_key', 'id'))
+                for key in lost:
+                    results[pending_indexes[key]]['status'] = 'duplicate'
+
+        for index, data in items:
+            if results[index]['status'] != 'invalid':
+                results[index]['id'] = existing.get(data['idempotency_key'])
+
+        # Tampoco se emiten los eventos de los paneles: publicarlos aquí
+        for key, progress in created.items():
+            publish(
+                'workout_completed',
+                id=existing.get(key),
+                gym_id=progress.gym_id,
+                client_id=client_routines[progress.client_routine_id][0],
+                client_routine_id=progress.client_routine_id,
+                workout_id=progress.workout_id,
+                completed_at=progress.completed_at
+            )
+
+        invalid = sum(1 for result in results if result['status'] == 'invalid')
+        if not invalid:
+            response_status = status.HTTP_200_OK
+        elif invalid < len(results):
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+
+        return Response({
+            'created': sum(1 for result in results if result['status'] == 'created'),
+            'duplicates': sum(1 for result in results if result['status'] == 'duplicate'),
+            'invalid': invalid,
+            'results': results
+        }, status=response_status)
+
+class ProgressMetricsViewSet(ReplicaReadViewSetMixin, GymScopedViewSetMixin, viewsets.ModelViewSet):
     queryset = ProgressMetrics.objects.all()
     serializer_class = ProgressMetricsSerializer
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    pagination_class = CachedCountPagination
+    filter_backends = [GymFilterBackend, filters.OrderingFilter]
     filterset_fields = ['client', 'date']
     ordering_fields = ['date', 'weight', 'body_fat', 'muscle_mass']
     ordering = ['-date']
@@ -686,14 +1242,181 @@ class ProgressMetricsViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        progress = self.queryset.filter(client_id=client_id).order_by('-date')
+        progress = self.get_queryset().filter(client_id=client_id).order_by('-date')
         serializer = self.get_serializer(progress, many=True)
         return Response(serializer.data)
 
-class GoalViewSet(viewsets.ModelViewSet):
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Serie temporal agregada de una métrica de un cliente para gráficas. "
+                              "Devuelve un punto por periodo con media, mínimo, máximo, media móvil y variaciones.",
+        manual_parameters=[
+            openapi.Parameter('client_id', openapi.IN_QUERY, description="ID del cliente", type=openapi.TYPE_INTEGER, required=True),
+            openapi.Parameter(
+                'metric',
+                openapi.IN_QUERY,
+                description="weight, body_fat, muscle_mass o cualquier clave de measurements (p. ej. waist)",
+                type=openapi.TYPE_STRING
+            ),
+            openapi.Parameter('bucket', openapi.IN_QUERY, description="Periodo de agregación", type=openapi.TYPE_STRING, enum=['day', 'week', 'month']),
+            openapi.Parameter('start', openapi.IN_QUERY, description="Fecha inicial (YYYY-MM-DD)", type=openapi.TYPE_STRING, format='date'),
+            openapi.Parameter('end', openapi.IN_QUERY, description="Fecha final (YYYY-MM-DD)", type=openapi.TYPE_STRING, format='date'),
+            openapi.Parameter('window', openapi.IN_QUERY, description="Puntos de la media móvil (por defecto 3)", type=openapi.TYPE_INTEGER)
+        ]
+    )
+    @action(detail=False, methods=['get'])
+    def timeseries(self, request):
+        """Obtener la serie temporal agregada de una métrica de progreso"""
+        client_id = request.query_params.get('client_id')
+        metric = request.query_params.get('metric', 'weight')
+        bucket = request.query_params.get('bucket', 'week')
+        
+        if not client_id or not client_id.isdigit():
+            return Response(
+                {'error': 'client_id es requerido'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if bucket not in BUCKETS:
+            return Response(
+                {'error': f"bucket inválido. Valores válidos: {', '.join(BUCKETS)}"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if not metric or len(metric) > 50:
+            return Response(
+                {'error': f"metric inválida. Use {', '.join(METRIC_COLUMNS)} o una clave de measurements"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            start = parse_date(request.query_params.get('start') or '')
+            end = parse_date(request.query_params.get('end') or '')
+            window = int(request.query_params.get('window', 3))
+            if (request.query_params.get('start') and not start) or (request.query_params.get('end') and not end):
+                raise ValueError
+        except ValueError:
+            return Response(
+                {'error': 'start/end deben tener formato YYYY-MM-DD y window debe ser un entero'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # El cliente tiene que ser del gimnasio de la petición; el SQL también filtra por gimnasio
+        if not scope_queryset(Client.objects.all(), request.gym_id).filter(pk=client_id).exists():
+            return Response(
+                {'error': 'Cliente no encontrado'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        points = progress_timeseries(
+            client_id=int(client_id),
+            gym_id=request.gym_id,
+            metric=metric,
+            bucket=bucket,
+            start=start,
+            end=end,
+            window=min(max(window, 1), 52)
+        )
+        
+        return Response({
+            'client_id': int(client_id),
+            'metric': metric,
+            'bucket': bucket,
+            'points': points
+        })
+
+    @swagger_auto_schema(
+        method='post',
+        operation_description="Subir varias fotos de progreso (frente, perfil, espalda) a S3 de forma concurrente "
+                              "y añadir sus URLs a la métrica. Responde con el resultado de cada archivo.",
+        manual_parameters=[
+            openapi.Parameter(
+                'photos',
+                openapi.IN_FORM,
+                description="Foto de progreso. Repetir el campo para enviar varias",
+                type=openapi.TYPE_FILE,
+                required=True
+            )
+        ],
+        responses={
+            200: "Todas las fotos subidas exitosamente",
+            207: "Algunas fotos no se pudieron subir",
+            400: "Error en la solicitud",
+            404: "Métrica no encontrada",
+            500: "Error al subir las fotos"
+        }
+    )
+    @action(detail=True, methods=['post'], parser_classes=[MultiPartParser, FormParser])
+    def photos(self, request, pk=None):
+        """Subir fotos de progreso a S3 y añadirlas a la métrica"""
+        metrics = self.get_object()
+        files = request.FILES.getlist('photos')
+        
+        if not files:
+            return Response(
+                {'error': 'Se requiere al menos un archivo en photos'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if len(files) > settings.PROGRESS_PHOTOS_MAX_FILES:
+            return Response(
+                {'error': f'Se permiten como máximo {settings.PROGRESS_PHOTOS_MAX_FILES} fotos por solicitud'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Validar tipo de archivo antes de subir nada
+        allowed_types = ['image/jpeg', 'image/jpg', 'image/png', 'image/gif', 'image/webp']
+        # Un resultado por archivo en el orden de envío, para que el cliente pueda asociarlos
+        results = [None] * len(files)
+        valid_indexes = []
+        for index, file in enumerate(files):
+            if file.content_type in allowed_types:
+                valid_indexes.append(index)
+            else:
+                results[index] = {
+                    'file': file.name,
+                    'url': None,
+                    'error': 'Tipo de archivo no permitido. Use JPG, PNG, GIF o WebP'
+                }
+        valid_files = [files[index] for index in valid_indexes]
+        
+        # Subir en paralelo: la latencia total se acerca a la de una sola subida
+        uploaded_urls = []
+        uploads = upload_files_to_s3(valid_files, folder="progress")
+        for index, (file, url) in zip(valid_indexes, uploads):
+            results[index] = {
+                'file': file.name,
+                'url': get_presigned_url(url),
+                'error': None if url else 'Error al subir la imagen'
+            }
+            if url:
+                uploaded_urls.append(url)
+        
+        # Añadir todas las URLs en una sola actualización atómica
+        if uploaded_urls:
+            with transaction.atomic():
+                metrics = ProgressMetrics.objects.select_for_update().get(pk=metrics.pk)
+                metrics.photos = (metrics.photos or []) + uploaded_urls
+                metrics.save(update_fields=['photos', 'updated_at'])
+        
+        if len(uploaded_urls) == len(files):
+            response_status = status.HTTP_200_OK
+        elif uploaded_urls:
+            response_status = status.HTTP_207_MULTI_STATUS
+        elif valid_files:
+            response_status = status.HTTP_500_INTERNAL_SERVER_ERROR
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        
+        return Response({
+            'photos': [get_presigned_url(url) for url in metrics.photos or []],
+            'results': results
+        }, status=response_status)
+
+class GoalViewSet(ReplicaReadViewSetMixin, GymScopedViewSetMixin, viewsets.ModelViewSet):
     queryset = Goal.objects.all()
     serializer_class = GoalSerializer
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filter_backends = [GymFilterBackend, filters.OrderingFilter]
     filterset_class = GoalFilter
     ordering_fields = ['deadline', 'target_value', 'current_value']
     ordering = ['deadline']  # Más urgente primero (deadline ascendente)
@@ -737,8 +1460,14 @@ class GoalViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        if goal.metric:
+            return Response(
+                {'error': f"El objetivo se sincroniza automáticamente con la métrica '{goal.metric}'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         goal.current_value = current_value
-        goal.is_completed = current_value >= goal.target_value
+        goal.is_completed = goal.is_reached(current_value)
         goal.save()
         
         serializer = self.get_serializer(goal)
@@ -747,14 +1476,14 @@ class GoalViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def completed(self, request):
         """Obtener objetivos completados"""
-        goals = self.queryset.filter(is_completed=True)
+        goals = self.get_queryset().filter(is_completed=True)
         serializer = self.get_serializer(goals, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def pending(self, request):
         """Obtener objetivos pendientes"""
-        goals = self.queryset.filter(is_completed=False)
+        goals = self.get_queryset().filter(is_completed=False)
         serializer = self.get_serializer(goals, many=True)
         return Response(serializer.data)
 
@@ -790,8 +1519,8 @@ def client_login(request):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    # Generar tokens JWT
-    refresh = RefreshToken.for_user(user)
+    # Generar tokens JWT (con el claim gym_id)
+    refresh = GymTokenObtainPairSerializer.get_token(user)
     
     return Response({
         'access_token': str(refresh.access_token),
@@ -836,3 +1565,285 @@ def user_profile(request):
             {'error': f'Error al obtener información del usuario: {str(e)}'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter(
+            'metric',
+            openapi.IN_QUERY,
+            description="weight, body_fat, muscle_mass o cualquier clave de measurements (p. ej. waist)",
+            type=openapi.TYPE_STRING
+        ),
+        openapi.Parameter('weeks', openapi.IN_QUERY, description="Semanas desde la primera medición (por defecto 12)", type=openapi.TYPE_INTEGER),
+        openapi.Parameter(
+            'group_by',
+            openapi.IN_QUERY,
+            description="Dimensión de la cohorte",
+            type=openapi.TYPE_STRING,
+            enum=list(GROUP_BY_CHOICES)
+        )
+    ],
+    responses={
+        200: 'Estadísticas por cohorte',
+        400: 'Parámetros inválidos',
+        403: 'Solo para dueños del gimnasio'
+    },
+    operation_description="Compara el cambio de una métrica tras N semanas entre cohortes de clientes "
+                          "(tipo de suscripción, mes de alta o rutina activa). Solo para dueños.",
+    operation_summary="Analíticas de cohortes"
+)
+@api_view(['GET'])
+@permission_classes([IsOwner])
+@replica_read_view
+def cohort_analytics(request):
+    """Endpoint con estadísticas por cohorte del cambio en las medidas corporales"""
+    metric = request.query_params.get('metric', 'weight')
+    group_by = request.query_params.get('group_by', 'subscription_type')
+    
+    if group_by not in GROUP_BY_CHOICES:
+        return Response(
+            {'error': f"group_by inválido. Valores válidos: {', '.join(GROUP_BY_CHOICES)}"}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        weeks = int(request.query_params.get('weeks', 12))
+    except ValueError:
+        return Response(
+            {'error': 'weeks debe ser un entero'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if weeks < 0 or not metric or len(metric) > 50:
+        return Response(
+            {'error': 'Parámetros inválidos'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return Response(cohort_statistics(metric=metric, weeks=weeks, group_by=group_by, gym_id=resolve_gym(request)))
+
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter(
+            'metric',
+            openapi.IN_QUERY,
+            description="Métrica del ranking",
+            type=openapi.TYPE_STRING,
+            enum=list(LEADERBOARD_METRICS)
+        ),
+        openapi.Parameter('week', openapi.IN_QUERY, description="Cualquier día de la semana (YYYY-MM-DD, por defecto hoy)", type=openapi.TYPE_STRING),
+        openapi.Parameter('routine_id', openapi.IN_QUERY, description="Ranking de una rutina (no aplica a streak)", type=openapi.TYPE_INTEGER),
+        openapi.Parameter('limit', openapi.IN_QUERY, description="Número de posiciones (1-100, por defecto 10)", type=openapi.TYPE_INTEGER)
+    ],
+    responses={
+        200: 'Ranking de la semana',
+        400: 'Parámetros inválidos'
+    },
+    operation_description="Top de clientes de la semana por entrenamientos completados, valoración media "
+                          "o racha actual de semanas consecutivas, global o por rutina.",
+    operation_summary="Rankings semanales"
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_read_view
+def leaderboards(request):
+    """Endpoint con los rankings semanales mantenidos de forma incremental"""
+    metric = request.query_params.get('metric', 'workouts')
+    if metric not in LEADERBOARD_METRICS:
+        return Response(
+            {'error': f"metric inválido. Valores válidos: {', '.join(LEADERBOARD_METRICS)}"}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    week = request.query_params.get('week')
+    if week:
+        try:
+            week = parse_date(week)
+        except ValueError:
+            # Fecha bien formada pero imposible (p. ej. 2025-02-30)
+            week = None
+        if week is None:
+            return Response(
+                {'error': 'Formato de week inválido. Use YYYY-MM-DD'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    
+    routine_id = request.query_params.get('routine_id')
+    try:
+        routine_id = int(routine_id) if routine_id else None
+        limit = int(request.query_params.get('limit', 10))
+    except ValueError:
+        return Response(
+            {'error': 'routine_id y limit deben ser enteros'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not 1 <= limit <= 100:
+        return Response(
+            {'error': 'limit debe estar entre 1 y 100'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    week_start, entries = leaderboard(
+        metric=metric, week=week, routine_id=routine_id, limit=limit, gym_id=resolve_gym(request)
+    )
+    return Response({
+        'metric': metric,
+        'week_start': week_start,
+        'routine_id': routine_id,
+        'entries': entries
+    })
+
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter(
+            'since',
+            openapi.IN_QUERY,
+            description="Token devuelto por la sincronización anterior. Sin token se devuelven todos los datos",
+            type=openapi.TYPE_STRING
+        ),
+        openapi.Parameter(
+            'client_id',
+            openapi.IN_QUERY,
+            description="Solo entrenadores y dueños: cliente a sincronizar",
+            type=openapi.TYPE_INTEGER
+        )
+    ],
+    responses={
+        200: openapi.Response(
+            description="Cambios desde el token: registros modificados por colección, ids borrados y nuevo token"
+        )
+    },
+    operation_summary="Sincronización incremental"
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync(request):
+    """Endpoint de sincronización incremental para la app del cliente"""
+    user = request.user
+    client = getattr(user, 'client_profile', None)
+    
+    client_id = request.query_params.get('client_id')
+    if client_id:
+        profile = getattr(user, 'custom_profile', None)
+        if not user.is_superuser and (profile is None or profile.role not in ('trainer', 'owner')):
+            return Response(
+                {'error': 'Solo entrenadores y dueños pueden sincronizar otro cliente'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        clients = scope_queryset(Client.objects.all(), resolve_gym(request))
+        client = clients.filter(pk=client_id).first() if client_id.isdigit() else None
+        if client is None:
+            return Response(
+                {'error': 'Cliente no encontrado'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+    
+    if client is None:
+        return Response(
+            {'error': 'El usuario no tiene un cliente asociado'}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    since = request.query_params.get('since')
+    try:
+        since = decode_token(since) if since else None
+    except ValueError:
+        return Response(
+            {'error': 'Token de sincronización inválido'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return Response(changes_since(client, since))
+
+
+@sync_to_async
+def authenticate_event_stream(request):
+    """Usuario del token JWT (cabecera Authorization o ?token=, ya que EventSource no envía cabeceras), si puede suscribirse y su gimnasio"""
+    authentication = JWTAuthentication()
+    try:
+        result = authentication.authenticate(request)
+        if result is None and request.GET.get('token'):
+            user = authentication.get_user(authentication.get_validated_token(request.GET['token']))
+        else:
+            user = result[0] if result else None
+    except (InvalidToken, AuthenticationFailed):
+        return None, False, None
+    
+    if user is None:
+        return None, False, None
+    profile = getattr(user, 'custom_profile', None)
+    gym_id = user_gym_id(user)
+    allowed = user.is_superuser or (profile is not None and profile.role in ('trainer', 'owner'))
+    # Sin gimnasio se reciben los eventos de todos: solo superusuarios o con un único gimnasio
+    allowed = allowed and (gym_id is not None or allows_unscoped(user))
+    return user, allowed, gym_id
+
+
+async def event_stream(request):
+    """
+    Stream SSE con los entrenamientos completados, objetivos cumplidos y nuevas métricas.
+    
+    Parámetros: types (lista separada por comas) y client_id para filtrar.
+    Requiere un servidor ASGI (uvicorn); bajo WSGI cada conexión bloquearía un worker.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': 'El stream de eventos requiere un servidor ASGI'}, 
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+    
+    user, allowed, gym_id = await authenticate_event_stream(request)
+    if user is None:
+        return JsonResponse({'error': 'Autenticación requerida'}, status=status.HTTP_401_UNAUTHORIZED)
+    if not allowed:
+        return JsonResponse(
+            {'error': 'Solo entrenadores y dueños de un gimnasio pueden suscribirse a los eventos'}, 
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    event_types = [t for t in request.GET.get('types', '').split(',') if t]
+    if any(t not in EVENT_TYPES for t in event_types):
+        return JsonResponse(
+            {'error': f"types inválido. Opciones: {', '.join(EVENT_TYPES)}"}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    client_id = request.GET.get('client_id')
+    if client_id and not client_id.isdigit():
+        return JsonResponse({'error': 'client_id debe ser un entero'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    ensure_listener()
+    # El personal de un gimnasio solo recibe los eventos de su gimnasio
+    subscription = broker.subscribe(
+        event_types=event_types, client_id=int(client_id) if client_id else None, gym_id=gym_id
+    )
+    
+    async def events():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await subscription.get(timeout=settings.EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comentario SSE para mantener viva la conexión a través de proxies
+                    yield ': keepalive\n\n'
+                    continue
+                
+                if subscription.dropped:
+                    yield f"event: dropped\ndata: {json.dumps({'count': subscription.dropped})}\n\n"
+                    subscription.dropped = 0
+                
+                data = {key: value for key, value in event.items() if key not in ('type', 'event_id')}
+                yield f"id: {event['event_id']}\nevent: {event['type']}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
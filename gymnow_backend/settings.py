@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 from datetime import timedelta
+import json
 import os
 from dotenv import load_dotenv
 
@@ -57,6 +58,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # Debe ir antes de CommonMiddleware
+    'gym.instrumentation.QueryInstrumentationMiddleware',  # Mide todo lo que hay debajo (SQL_INSTRUMENTATION)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,6 +66,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'gym.routers.ReplicaStickinessMiddleware',
 ]
 
 # Configuración de CORS
@@ -145,6 +148,21 @@ DATABASES = {
     }
 }
 
+# Réplica de lectura opcional: con DB_REPLICA_HOST las lecturas GET de los ViewSets y de las
+# estadísticas van a la réplica (gym.routers.ReplicaRouter)
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['gym.routers.ReplicaRouter']
+DATABASE_REPLICA = 'replica' if 'replica' in DATABASES else None
+# Segundos que las lecturas de un usuario siguen en el primario después de escribir
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -204,6 +222,8 @@ SIMPLE_JWT = {
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # Incluye el claim gym_id para resolver el gimnasio sin consultas
+    'TOKEN_OBTAIN_SERIALIZER': 'gym.serializers.GymTokenObtainPairSerializer',
 }
 
 # AWS S3 Configuration
@@ -214,3 +234,60 @@ AWS_S3_REGION_NAME = os.getenv('AWS_S3_REGION_NAME', 'us-east-1')
 AWS_S3_CUSTOM_DOMAIN = os.getenv('AWS_S3_CUSTOM_DOMAIN')
 AWS_S3_ENDPOINT_URL = os.getenv('AWS_S3_CUSTOM_DOMAIN')
 AWS_DEFAULT_ACL = os.getenv('AWS_DEFAULT_ACL', 'private')
+
+# Subidas en streaming a S3 (multipart). Cada subida mantiene en memoria como máximo una parte.
+AWS_S3_MULTIPART_PART_SIZE = int(os.getenv('AWS_S3_MULTIPART_PART_SIZE', 8 * 1024 * 1024))
+MEDIA_UPLOAD_MAX_SIZE = int(os.getenv('MEDIA_UPLOAD_MAX_SIZE', 100 * 1024 * 1024))
+PROFILE_IMAGE_MAX_SIZE = int(os.getenv('PROFILE_IMAGE_MAX_SIZE', 10 * 1024 * 1024))
+
+# Subidas concurrentes (fotos de progreso)
+MEDIA_UPLOAD_MAX_WORKERS = int(os.getenv('MEDIA_UPLOAD_MAX_WORKERS', 4))
+PROGRESS_PHOTOS_MAX_FILES = int(os.getenv('PROGRESS_PHOTOS_MAX_FILES', 10))
+
+# URLs prefirmadas para leer media privada. Se cachean por clave y se renuevan antes de expirar.
+AWS_QUERYSTRING_AUTH = os.getenv('AWS_QUERYSTRING_AUTH', str(AWS_DEFAULT_ACL == 'private')).lower() == 'true'
+AWS_PRESIGNED_URL_EXPIRATION = int(os.getenv('AWS_PRESIGNED_URL_EXPIRATION', 3600))
+AWS_PRESIGNED_URL_REFRESH_MARGIN = int(os.getenv('AWS_PRESIGNED_URL_REFRESH_MARGIN', 300))
+AWS_PRESIGNED_URL_CACHE_SIZE = int(os.getenv('AWS_PRESIGNED_URL_CACHE_SIZE', 10000))
+
+# Analíticas: los resultados se cachean por versión de datos (DataVersion)
+ANALYTICS_CACHE_TIMEOUT = int(os.getenv('ANALYTICS_CACHE_TIMEOUT', 3600))
+
+# Adherencia: número de semanas recientes incluidas en el desglose semanal
+ADHERENCE_WEEKS = int(os.getenv('ADHERENCE_WEEKS', 12))
+
+# Carga masiva de entrenamientos completados (dispositivos offline)
+WORKOUT_COMPLETIONS_MAX_ITEMS = int(os.getenv('WORKOUT_COMPLETIONS_MAX_ITEMS', 500))
+
+# Sincronización incremental (/api/sync/): las lápidas de borrado se conservan estos días;
+# un token más antiguo provoca una sincronización completa
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv('SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+SYNC_TOKEN_OVERLAP = int(os.getenv('SYNC_TOKEN_OVERLAP', 5))
+
+# Eventos en tiempo real (SSE en /api/events/, requiere servidor ASGI).
+# Con PostgreSQL los eventos se reparten entre workers con LISTEN/NOTIFY en este canal.
+EVENTS_PG_CHANNEL = os.getenv('EVENTS_PG_CHANNEL', 'gym_events')
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 100))
+EVENTS_HEARTBEAT_SECONDS = int(os.getenv('EVENTS_HEARTBEAT_SECONDS', 15))
+
+# Typeahead de clientes en memoria de cada worker: segundos entre comprobaciones de la
+# versión compartida (DataVersion) para recargar cambios hechos por otros workers
+TYPEAHEAD_RESYNC_INTERVAL = float(os.getenv('TYPEAHEAD_RESYNC_INTERVAL', 1.0))
+
+# Días antes de subscription_end en los que un cliente pasa a 'expiring'
+SUBSCRIPTION_EXPIRING_DAYS = int(os.getenv('SUBSCRIPTION_EXPIRING_DAYS', 30))
+
+# Paginación con total cacheado (CachedCountPagination): segundos que se reutiliza un COUNT
+# y filas a partir de las cuales un listado sin filtros usa la estimación de PostgreSQL
+PAGINATION_COUNT_CACHE_TIMEOUT = int(os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', 30))
+PAGINATION_ESTIMATE_THRESHOLD = int(os.getenv('PAGINATION_ESTIMATE_THRESHOLD', 100000))
+
+# Multi-gimnasio: segundos que se cachea la resolución de un host a su gimnasio (Gym.domain)
+TENANT_HOST_CACHE_TIMEOUT = int(os.getenv('TENANT_HOST_CACHE_TIMEOUT', 300))
+
+# Instrumentación SQL por petición: cabecera Server-Timing y log 'gym.sql' con consultas y tiempo en BD.
+# SQL_QUERY_BUDGETS (JSON): {"ClientViewSet.list": {"queries": 10, "db_ms": 200}, "*": {"queries": 50}};
+# al superarse se registra un aviso o, con SQL_BUDGET_ACTION=raise (o "action" en el presupuesto), se lanza un error
+SQL_INSTRUMENTATION = os.getenv('SQL_INSTRUMENTATION', 'False').lower() == 'true'
+SQL_QUERY_BUDGETS = json.loads(os.getenv('SQL_QUERY_BUDGETS', '{}'))
+SQL_BUDGET_ACTION = os.getenv('SQL_BUDGET_ACTION', 'log')
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gymnow_backend.settings')
 
 application = get_wsgi_application()
+
+# Precargar el typeahead de clientes de este proceso
+from gym.typeahead import warm_client_typeahead  # noqa: E402
+
+warm_client_typeahead()